@@ -1,19 +1,42 @@
 import io
 import os
+import re
 import sys
 import json
 import gzip
+import time
 import shutil
 import hashlib
 import logging
 import argparse
+import subprocess
+import mmap
+import tempfile
 import orjson
+from array import array
+from bisect import bisect_left
 import requests
 from pathlib import Path
 from datetime import datetime
+from functools import partial
 from collections import defaultdict
+from contextlib import contextmanager
+from itertools import accumulate
 from multiprocessing import Pool, cpu_count, Manager
 
+try:
+    from isal import igzip
+except ImportError:
+    igzip = None
+
+try:
+    from zlib_ng import gzip_ng
+except ImportError:
+    gzip_ng = None
+
+# File processor of each worker process, set once by DataCiteDataFileProcessor.init_worker
+_file_processor = None
+
 
 class LoggerSetup:
     LOGGER_NAME = 'datacite_datafile_parser'
@@ -45,6 +68,10 @@ class ArgumentConfig:
         self.processes = None
         self.from_file = None
         self.doi_column = None
+        self.targets = None
+        self.decompression = None
+        self.shard_size = None
+        self.shard_dir = None
 
     @classmethod
     def parse_arguments(cls):
@@ -62,6 +89,15 @@ class ArgumentConfig:
                             help='Logging level (INFO, DEBUG, etc.).')
         parser.add_argument('-n', '--processes', type=int, default=None,
                             help='Number of processes to use (default: number of CPU cores - 1).')
+        parser.add_argument('-z', '--decompression', choices=GzipDecompressor.BACKENDS, default='auto',
+                            help='Gzip decompression backend (default: auto, the first available '
+                                 'of zlib-ng, isal and gzip).')
+        parser.add_argument('--shard-size', type=int, default=0, metavar='MB',
+                            help='Split files larger than MB megabytes into shards of about that size that '
+                                 'are processed in parallel (default: 0, no sharding).')
+        parser.add_argument('--shard-dir',
+                            help='Directory for the recompressed copies of sharded files '
+                                 '(default: OUTPUT_DIR/.shards).')
 
         mode_group = parser.add_mutually_exclusive_group(required=True)
         mode_group.add_argument('-a', '--all', action='store_true',
@@ -72,6 +108,10 @@ class ArgumentConfig:
                                 help='Process only records for the given repositories/client ID(s).')
         mode_group.add_argument('-f', '--from-file',
                                 help='CSV file containing DOIs to filter by')
+        mode_group.add_argument('-t', '--targets',
+                                help='JSON file of named filter expressions (DOI lists, providers, clients, '
+                                     'resourceTypeGeneral, publicationYear range, state), each written to '
+                                     'OUTPUT_DIR/<name> from a single scan')
 
         parser.add_argument('-d', '--doi-column',
                             help='Column name in CSV containing DOIs (required with --from-file)')
@@ -93,12 +133,16 @@ class ArgumentConfig:
         config.cache_dir = args.cache_dir
         config.log_level = args.log_level
         config.processes = args.processes
+        config.decompression = args.decompression
+        config.shard_size = args.shard_size
+        config.shard_dir = args.shard_dir or str(Path(args.output_dir) / '.shards')
 
         config.all = args.all
         config.providers = args.providers if args.providers else []
         config.clients = args.clients if args.clients else []
         config.from_file = args.from_file
         config.doi_column = args.doi_column
+        config.targets = args.targets
 
         config.sort_rtg_only = args.sort_rtg_only
         config.sort_provider_client_rtg = args.sort_provider_client_and_rtg
@@ -227,6 +271,9 @@ class FileWriter:
             except Exception as e:
                 self.logger.error(f"Error writing to {filepath}: {str(e)}")
 
+        self.discard_batch()
+
+    def discard_batch(self):
         self.record_buffers.clear()
         self.buffer_count = 0
 
@@ -405,87 +452,863 @@ class DataCiteAPIClient:
         return all_clients
 
 
-class BatchGzipReader:
-    def __init__(self, filepath, chunk_size=2**24):
-        self.filepath = filepath
-        self.logger = logging.getLogger('datacite.batch_reader')
-        self.chunk_size = chunk_size
+class GzipDecompressor:
+    """Opens gzip files for reading through a selectable decompression backend.
 
-    def __iter__(self):
-        buffer = bytearray()
+    'isal' and 'zlib-ng' use the python-isal and zlib-ng bindings when they
+    are installed, 'pigz' streams the output of a `pigz -dc` subprocess and
+    'gzip' is the stdlib module. 'auto' picks the first available of zlib-ng,
+    isal and gzip.
+    """
+
+    BACKENDS = ('auto', 'isal', 'zlib-ng', 'pigz', 'gzip')
+    AUTO_ORDER = ('zlib-ng', 'isal', 'gzip')
+
+    def __init__(self, backend='auto'):
+        """Initialize the decompressor.
+
+        Args:
+            backend (str): One of BACKENDS
+
+        Raises:
+            ValueError: If the backend is unknown or not available
+        """
+        self.backend = self.resolve(backend)
+
+    @staticmethod
+    def is_available(backend):
+        if backend == 'isal':
+            return igzip is not None
+        if backend == 'zlib-ng':
+            return gzip_ng is not None
+        if backend == 'pigz':
+            return shutil.which('pigz') is not None
+        return backend == 'gzip'
+
+    @classmethod
+    def resolve(cls, backend):
+        """Resolve 'auto' and check that the requested backend can be used.
+
+        Returns:
+            str: Name of the backend that will be used
+        """
+        if backend == 'auto':
+            return next(name for name in cls.AUTO_ORDER if cls.is_available(name))
+        if backend not in cls.BACKENDS:
+            raise ValueError(f"Unknown decompression backend: {backend}")
+        if not cls.is_available(backend):
+            raise ValueError(f"Decompression backend '{backend}' is not installed")
+        return backend
+
+    @contextmanager
+    def open(self, filepath, offset=0):
+        """Open a gzip file for binary reading with the selected backend.
+
+        Args:
+            filepath: Path to the gzip file
+            offset (int): Byte offset of the gzip member to start reading at
+
+        Yields:
+            A binary file-like object returning decompressed bytes
+        """
+        if self.backend == 'pigz':
+            yield from self._open_pigz(filepath, offset)
+            return
+
+        gzip_module = {'isal': igzip, 'zlib-ng': gzip_ng}.get(self.backend, gzip)
+        with open(filepath, 'rb') as raw_file:
+            raw_file.seek(offset)
+            with gzip_module.open(raw_file, 'rb') as gz_file:
+                yield gz_file
+
+    def _open_pigz(self, filepath, offset):
+        with open(filepath, 'rb', buffering=0) as raw_file:
+            raw_file.seek(offset)
+            process = subprocess.Popen(
+                ['pigz', '-dc'],
+                stdin=raw_file,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        try:
+            yield process.stdout
+        except BaseException:
+            process.kill()
+            raise
+        else:
+            # Stopping before the end (e.g. at the end of a shard) is not an error
+            stopped_early = bool(process.stdout.read(1))
+            if stopped_early:
+                process.kill()
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            process.wait()
+
+        if process.returncode != 0 and not stopped_early:
+            raise OSError(
+                f"pigz exited with status {process.returncode}: "
+                f"{stderr.decode(errors='replace').strip()}"
+            )
+
+
+class RecordPrefilter:
+    """Cheap check run on the raw bytes of a line before it is parsed.
+
+    A line is rejected only when it cannot be a findable record, or, when
+    scope ids are given, cannot mention any of them as a JSON string. Every
+    line that passes still goes through the full checks after parsing, so
+    false positives (e.g. a nested "state" key) only cost a parse. Lines with
+    \\u00XX escapes, which could spell out a key, value or id, always pass.
+    """
+
+    FINDABLE_STATE = re.compile(rb'"state"\s*:\s*"findable"')
+    ASCII_ESCAPE = re.compile(rb'\\u00[2-7]')
+
+    def __init__(self, scope_ids=None, findable_only=True):
+        """Initialize the prefilter.
+
+        Args:
+            scope_ids (iterable, optional): Provider/client ids of which at
+                least one must appear in a line for it to be kept
+            findable_only (bool): Reject lines that cannot be findable records
+        """
+        self.findable_only = findable_only
+        self.scope_pattern = None
+        if scope_ids:
+            alternatives = b'|'.join(re.escape(str(scope_id).encode()) for scope_id in scope_ids)
+            self.scope_pattern = re.compile(b'"(?:' + alternatives + b')"')
+
+    def might_keep(self, line):
+        if (not self.findable_only or self.FINDABLE_STATE.search(line)) and (
+            self.scope_pattern is None or self.scope_pattern.search(line)
+        ):
+            return True
+        return self.ASCII_ESCAPE.search(line) is not None
+
+
+class FileShard:
+    """A run of gzip members of a sharded data file, processed as one task.
+
+    Attributes:
+        source (str): Original data file
+        path (str): Recompressed copy of the source holding the members
+        offset (int): Byte offset of the first member in path
+        size (int): Compressed size of the members in bytes
+        length (int): Decompressed size of the members in bytes
+        number (int): 1-based number of the shard within the source
+        count (int): Number of shards the source is split into
+        fingerprint (dict): Fingerprint of the source the copy was made from
+    """
+
+    def __init__(self, source, path, offset, size, length, number, count, fingerprint):
+        self.source = source
+        self.path = path
+        self.offset = offset
+        self.size = size
+        self.length = length
+        self.number = number
+        self.count = count
+        self.fingerprint = fingerprint
+
+    @property
+    def name(self):
+        return f"{Path(self.source).name} [shard {self.number}/{self.count}]"
+
+
+class FileSharder:
+    """Splits large .jsonl.gz files into shards that workers process in parallel.
+
+    A gzip stream can only be decompressed from its start, so a pre-pass
+    recompresses every large file into a cached copy made of independently
+    decompressible gzip members that end on line boundaries (as in BGZF),
+    with an index of each member's offset and compressed and decompressed
+    size. Consecutive members are grouped into shards of about shard_size
+    compressed bytes. Cached copies are reused while the size and
+    modification time of their source are unchanged.
+    """
+
+    INDEX_VERSION = 1
+    CACHE_FILE = re.compile(r'([0-9a-f]{40})\.(?:jsonl\.gz|json|jsonl\.tmp|json\.tmp)')
+
+    def __init__(self, directory, shard_size, member_size=2**24, decompressor=None):
+        """Initialize the sharder.
+
+        Args:
+            directory (str): Directory holding the recompressed copies and indexes
+            shard_size (int): Files larger than this many bytes are sharded,
+                into shards of about this compressed size
+            member_size (int): Decompressed size of each gzip member in bytes
+            decompressor (GzipDecompressor, optional): Backend used to read sources
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.member_size = member_size
+        self.decompressor = decompressor or GzipDecompressor()
+        self.logger = logging.getLogger('datacite.file_sharder')
+
+    @staticmethod
+    def task_name(task):
+        return task.name if isinstance(task, FileShard) else Path(task).name
+
+    @staticmethod
+    def task_size(task):
+        return task.size if isinstance(task, FileShard) else os.path.getsize(task)
+
+    @staticmethod
+    def compress_member(data):
+        gzip_module = gzip_ng or igzip or gzip
+        return gzip_module.compress(data, compresslevel=1)
+
+    def needs_sharding(self, filepath):
+        return os.path.getsize(filepath) > self.shard_size
+
+    def _digest(self, filepath):
+        return hashlib.sha1(str(Path(filepath).resolve()).encode('utf-8')).hexdigest()
+
+    def _paths(self, filepath):
+        name = self._digest(filepath)
+        return self.directory / f'{name}.jsonl.gz', self.directory / f'{name}.json'
+
+    def load_index(self, filepath):
+        """Return the index of a file's cached copy, or None if it is missing or stale."""
+        _, index_path = self._paths(filepath)
+        try:
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        stat = os.stat(filepath)
+        fingerprint = index.get('fingerprint', {})
+        if (index.get('version') != self.INDEX_VERSION
+                or fingerprint.get('size') != stat.st_size
+                or fingerprint.get('mtime_ns') != stat.st_mtime_ns):
+            return None
+        return index
+
+    def build(self, filepath):
+        """Recompress a file into line-aligned gzip members and write its index.
+
+        Errors are logged and leave the file without a cached copy, so it is
+        processed unsharded.
+
+        Returns:
+            str: The source file path
+        """
+        copy_path, index_path = self._paths(filepath)
+        temp_path = copy_path.with_suffix('.tmp')
         try:
-            with gzip.open(self.filepath, 'rb') as gz_file:
+            index_path.unlink(missing_ok=True)
+            stat = os.stat(filepath)
+            fingerprint = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+            members = []
+            offset = 0
+            pending = b''
+            with self.decompressor.open(filepath) as source, open(temp_path, 'wb') as out:
                 while True:
-                    chunk = gz_file.read(self.chunk_size)
+                    chunk = source.read(self.member_size)
+                    data = pending + chunk
+                    if chunk:
+                        cut = data.rfind(b'\n') + 1
+                        if cut == 0:
+                            pending = data
+                            continue
+                        data, pending = data[:cut], data[cut:]
+                    if data:
+                        member = self.compress_member(data)
+                        out.write(member)
+                        members.append([offset, len(member), len(data)])
+                        offset += len(member)
                     if not chunk:
                         break
-                    buffer.extend(chunk)
-                    lines = buffer.split(b'\n')
-                    buffer = bytearray(lines.pop())
 
-                    for line in lines:
-                        line = line.strip()
-                        if not line:
-                            continue
-                        try:
-                            yield orjson.loads(line)
-                        except orjson.JSONDecodeError as e:
-                            self.logger.warning(
-                                f"JSON decode error in {self.filepath}: {str(e)}"
-                            )
-
-                if buffer.strip():
-                    try:
-                        yield orjson.loads(buffer.strip())
-                    except orjson.JSONDecodeError as e:
+            os.replace(temp_path, copy_path)
+            temp_path = index_path.with_suffix('.json.tmp')
+            with open(temp_path, 'w') as f:
+                json.dump({'version': self.INDEX_VERSION, 'fingerprint': fingerprint, 'members': members}, f)
+            os.replace(temp_path, index_path)
+            self.logger.info(f"Recompressed {filepath} into {len(members)} gzip members")
+        except Exception as e:
+            self.logger.error(f"Error recompressing {filepath} for sharding: {str(e)}")
+            temp_path.unlink(missing_ok=True)
+        return filepath
+
+    def shards(self, filepath, index):
+        """Group the members of a cached copy into FileShard tasks."""
+        copy_path, _ = self._paths(filepath)
+        groups = []
+        group = []
+        group_size = 0
+        for member in index['members']:
+            group.append(member)
+            group_size += member[1]
+            if group_size >= self.shard_size:
+                groups.append(group)
+                group = []
+                group_size = 0
+        if group:
+            groups.append(group)
+
+        return [
+            FileShard(
+                source=filepath,
+                path=str(copy_path),
+                offset=group[0][0],
+                size=sum(member[1] for member in group),
+                length=sum(member[2] for member in group),
+                number=number,
+                count=len(groups),
+                fingerprint=index['fingerprint']
+            )
+            for number, group in enumerate(groups, start=1)
+        ]
+
+    def prune(self, filepaths):
+        """Remove cached copies whose source is not among the input filepaths.
+
+        Only files named like the sharder's own copies, indexes and their
+        temporary files are removed; anything else in the directory is left
+        alone.
+        """
+        keep = {self._digest(filepath) for filepath in filepaths}
+        for path in self.directory.iterdir():
+            match = self.CACHE_FILE.fullmatch(path.name)
+            if match and match.group(1) not in keep and path.is_file():
+                path.unlink(missing_ok=True)
+
+
+class TaskScheduler:
+    """Plans the order in which the worker pool processes files and shards.
+
+    Tasks are handed out largest first (longest-processing-time-first list
+    scheduling), so the biggest files start early instead of straggling at
+    the end of a run. Files that are small relative to the total input are
+    packed into batches processed as a single task, which saves per-task
+    dispatch and result overhead. The makespan predicted from on-disk sizes
+    is logged before processing and compared with the actual one after.
+    """
+
+    BATCHES_PER_WORKER = 4
+
+    def __init__(self, workers):
+        """Initialize the scheduler.
+
+        Args:
+            workers (int): Number of worker processes
+        """
+        self.workers = workers
+        self.total_size = 0
+        self.predicted_load = 0
+        self.busy_time = {}
+        self.logger = logging.getLogger('datacite.scheduler')
+
+    def plan(self, tasks):
+        """Group tasks into batches ordered largest first.
+
+        Tasks smaller than an even share of the input per batch are packed
+        together (first-fit decreasing) up to that size.
+
+        Args:
+            tasks (list): File paths and FileShards
+
+        Returns:
+            list: Batches (lists of tasks), largest first
+        """
+        sized = sorted(((FileSharder.task_size(task), task) for task in tasks),
+                       key=lambda item: item[0], reverse=True)
+        self.total_size = sum(size for size, _ in sized)
+        batch_size = self.total_size / (self.workers * self.BATCHES_PER_WORKER)
+
+        batches = []
+        open_batches = []
+        for size, task in sized:
+            if size >= batch_size:
+                batches.append((size, [task]))
+                continue
+            for batch in open_batches:
+                if batch[0] + size <= batch_size:
+                    batch[0] += size
+                    batch[1].append(task)
+                    break
+            else:
+                open_batches.append([size, [task]])
+        batches.extend((size, batch) for size, batch in open_batches)
+        batches.sort(key=lambda item: item[0], reverse=True)
+
+        loads = [0] * self.workers
+        for size, _ in batches:
+            loads[loads.index(min(loads))] += size
+        self.predicted_load = max(loads)
+
+        self.logger.info(
+            f"Scheduled {len(tasks)} tasks in {len(batches)} batches on {self.workers} workers, "
+            f"largest first; predicted busiest worker load {self.predicted_load / 2**20:.1f} MB "
+            f"({self.predicted_load / max(self.total_size / self.workers, 1):.2f}x an even share)"
+        )
+        return [batch for _, batch in batches]
+
+    @staticmethod
+    def run_batch(function, batch):
+        """Apply function to every task of a batch in a worker process.
+
+        Returns:
+            tuple: (worker pid, seconds spent, list of results)
+        """
+        start_time = time.perf_counter()
+        results = [function(task) for task in batch]
+        return os.getpid(), time.perf_counter() - start_time, results
+
+    def record(self, pid, elapsed):
+        self.busy_time[pid] = self.busy_time.get(pid, 0.0) + elapsed
+
+    def log_makespan(self, elapsed):
+        """Log the actual makespan next to the predicted one.
+
+        The prediction converts the busiest worker's planned load to seconds
+        with the throughput measured across all workers.
+
+        Args:
+            elapsed (float): Wall-clock seconds spent processing
+        """
+        message = f"Makespan {elapsed:.1f}s"
+        busy_total = sum(self.busy_time.values())
+        if busy_total > 0:
+            throughput = self.total_size / busy_total
+            message += (
+                f", predicted {self.predicted_load / throughput:.1f}s at the measured "
+                f"{throughput / 2**20:.1f} MB/s of compressed input per worker; worker busy time "
+                f"{min(self.busy_time.values()):.1f}-{max(self.busy_time.values()):.1f}s"
+            )
+        self.logger.info(message)
+
+
+class BatchGzipReader:
+    """Reads JSON records from a .jsonl.gz file in large decompressed chunks.
+
+    Lines are sliced out of each chunk through a memoryview and passed to
+    orjson as bytes, so records are never decoded to str first and only a
+    line spanning two chunks is copied. Blank lines are skipped without
+    being counted. Lines rejected by the optional prefilter are counted in
+    rejected_count without being parsed. line_number is the physical line
+    (counted from the start of the reader's byte range) of the last record
+    yielded. A reader can be limited to a byte range of line-aligned gzip
+    members, as produced by FileSharder.
+    """
+
+    BLANK_LINE = re.compile(rb'\s*')
+
+    def __init__(self, filepath, chunk_size=2**24, decompressor=None, prefilter=None,
+                 offset=0, length=None):
+        """Initialize the reader.
+
+        Args:
+            filepath: Path to .jsonl.gz file
+            chunk_size: Size of decompressed chunks to read in bytes (default 16MB)
+            decompressor (GzipDecompressor, optional): Backend used to open the
+                file (default: the best available one)
+            prefilter (RecordPrefilter, optional): Check deciding which lines
+                are parsed
+            offset (int): Byte offset of the first gzip member to read
+            length (int, optional): Number of decompressed bytes to read
+        """
+        self.filepath = filepath
+        self.chunk_size = chunk_size
+        self.offset = offset
+        self.length = length
+        self.decompressor = decompressor or GzipDecompressor()
+        self.prefilter = prefilter
+        self.bytes_read = 0
+        self.rejected_count = 0
+        self.line_number = 0
+        self.logger = logging.getLogger('datacite.batch_reader')
+
+    @classmethod
+    def for_task(cls, task, **kwargs):
+        """Create a reader for a file path or a FileShard."""
+        if isinstance(task, FileShard):
+            return cls(task.path, offset=task.offset, length=task.length, **kwargs)
+        return cls(task, **kwargs)
+
+    def iter_lines(self):
+        """Yield the lines of the file as bytes-like objects, without newlines."""
+        partial = b''
+        remaining = self.length
+        with self.decompressor.open(self.filepath, self.offset) as gz_file:
+            while remaining is None or remaining > 0:
+                chunk = gz_file.read(self.chunk_size if remaining is None else min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                self.bytes_read += len(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+
+                view = memoryview(chunk)
+                start = 0
+                end = chunk.find(b'\n')
+                if end != -1 and partial:
+                    yield partial + view[:end]
+                    partial = b''
+                    start = end + 1
+                    end = chunk.find(b'\n', start)
+
+                while end != -1:
+                    yield view[start:end]
+                    start = end + 1
+                    end = chunk.find(b'\n', start)
+
+                partial += view[start:]
+
+        if partial:
+            yield partial
+
+    def __iter__(self):
+        try:
+            for line_number, line in enumerate(self.iter_lines(), 1):
+                if not line:
+                    continue
+                if self.prefilter and not self.prefilter.might_keep(line):
+                    if not self.BLANK_LINE.fullmatch(line):
+                        self.rejected_count += 1
+                    continue
+                try:
+                    record = orjson.loads(line)
+                except orjson.JSONDecodeError as e:
+                    if not self.BLANK_LINE.fullmatch(line):
                         self.logger.warning(
-                            f"JSON decode error (leftover) in {self.filepath}: {str(e)}"
+                            f"JSON decode error in {self.filepath} line {line_number}: {str(e)}"
                         )
+                    continue
+                self.line_number = line_number
+                yield record
         except Exception as e:
             self.logger.error(f"Error reading gzip file {self.filepath}: {str(e)}")
 
 
 class DOIFilter:
+    """DOIs of a CSV column, looked up in a compact index file mapped by every worker.
+
+    The lowercased DOIs are indexed once into {csv}.doi-index next to the CSV
+    (or in the temporary directory if that is not writable), which is rebuilt
+    when the CSV or column changes. The index holds the sorted 64-bit BLAKE2b
+    hashes of the DOIs, a directory of where the hashes of each value of
+    their top bits start (about four hashes per entry), the offsets of the
+    DOIs in hash order and the DOIs themselves. Lookups bisect the few hashes
+    of one directory entry and compare the DOI only on a hash match, so the
+    strings are only paged in for kept records.
+    Pickled copies only carry the index path and map it again, so worker
+    processes share a single copy through the page cache.
+    """
+
+    MAGIC = b'DOIIDX2\n'
+    WORD = array('Q').itemsize
+
     def __init__(self, csv_path, column_name):
-        self.dois = set()
-        self._load_dois(csv_path, column_name)
+        self.logger = logging.getLogger('datacite.doi_filter')
+        try:
+            stat = os.stat(csv_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"CSV file not found: {csv_path}")
+        source = {
+            'column': column_name,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'byteorder': sys.byteorder
+        }
+
+        self.index_path = Path(csv_path).with_name(Path(csv_path).name + '.doi-index')
+        if not self._is_current(source):
+            if not os.access(self.index_path.parent, os.W_OK):
+                path_hash = hashlib.sha256(str(Path(csv_path).resolve()).encode('utf-8')).hexdigest()[:16]
+                self.index_path = Path(tempfile.gettempdir()) / f"{path_hash}.doi-index"
+            if not self._is_current(source):
+                self._build(csv_path, column_name, source)
+        self._open()
+
+    @staticmethod
+    def doi_hash(doi):
+        return int.from_bytes(hashlib.blake2b(doi, digest_size=8).digest(), 'little')
 
     def _load_dois(self, csv_path, column_name):
         import csv
+        dois = set()
         try:
-            with open(csv_path, 'r') as f:
-                reader = csv.DictReader(f)
-                if column_name not in reader.fieldnames:
+            with open(csv_path, 'r', newline='') as f:
+                reader = csv.reader(f)
+                fieldnames = next(reader, [])
+                if column_name not in fieldnames:
                     raise ValueError(f"Column '{column_name}' not found in CSV")
-                
+                column = fieldnames.index(column_name)
+
                 for row in reader:
-                    doi = row[column_name].strip()
+                    if not row:
+                        continue
+                    doi = row[column].strip()
                     if doi:
-                        self.dois.add(doi.lower())
+                        dois.add(doi.lower())
         except FileNotFoundError:
             raise FileNotFoundError(f"CSV file not found: {csv_path}")
         except Exception as e:
             raise ValueError(f"Error loading CSV: {str(e)}")
+        return dois
+
+    def _read_metadata(self, f):
+        if f.read(len(self.MAGIC)) != self.MAGIC:
+            raise ValueError("Not a DOI index")
+        length = int.from_bytes(f.read(8), 'little')
+        metadata = json.loads(f.read(length))
+        metadata['data_start'] = -(-(len(self.MAGIC) + 8 + length) // self.WORD) * self.WORD
+        return metadata
+
+    def _is_current(self, source):
+        try:
+            with open(self.index_path, 'rb') as f:
+                metadata = self._read_metadata(f)
+        except (OSError, ValueError):
+            return False
+        return all(metadata.get(key) == value for key, value in source.items())
+
+    def _build(self, csv_path, column_name, source):
+        start_time = time.perf_counter()
+        dois = [doi.encode('utf-8') for doi in self._load_dois(csv_path, column_name)]
+        doi_hashes = [self.doi_hash(doi) for doi in dois]
+        order = sorted(range(len(dois)), key=doi_hashes.__getitem__)
+        hashes = array('Q', [doi_hashes[index] for index in order])
+        dois = [dois[index] for index in order]
+        del doi_hashes, order
+
+        directory_bits = (len(dois) // 4).bit_length()
+        shift = 64 - directory_bits
+        directory = array('Q', bytes(self.WORD * ((1 << directory_bits) + 1)))
+        for doi_hash in hashes:
+            directory[(doi_hash >> shift) + 1] += 1
+        directory = array('Q', accumulate(directory))
+
+        header = json.dumps({**source, 'count': len(dois), 'directory_bits': directory_bits}).encode('utf-8')
+        padding = -(len(self.MAGIC) + 8 + len(header)) % self.WORD
+
+        temp_path = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.tmp")
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(self.MAGIC + len(header).to_bytes(8, 'little') + header + b'\0' * padding)
+                hashes.tofile(f)
+                directory.tofile(f)
+                array('Q', accumulate(map(len, dois), initial=0)).tofile(f)
+                f.write(b''.join(dois))
+            os.replace(temp_path, self.index_path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+        self.logger.info(
+            f"Indexed {len(dois)} DOIs of {csv_path} into {self.index_path} "
+            f"in {time.perf_counter() - start_time:.1f}s"
+        )
+
+    def _open(self):
+        with open(self.index_path, 'rb') as f:
+            metadata = self._read_metadata(f)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.count = metadata['count']
+        self._shift = 64 - metadata['directory_bits']
+        directory_start = metadata['data_start'] + self.WORD * self.count
+        offsets_start = directory_start + self.WORD * ((1 << metadata['directory_bits']) + 1)
+        data_start = offsets_start + self.WORD * (self.count + 1)
+        view = memoryview(self._mmap)
+        self._hashes = view[metadata['data_start']:directory_start].cast('Q')
+        self._directory = view[directory_start:offsets_start].cast('Q')
+        self._offsets = view[offsets_start:data_start].cast('Q')
+        self._data = view[data_start:]
+        self._views = [self._hashes, self._directory, self._offsets, self._data, view]
+
+    def __getstate__(self):
+        return {'index_path': self.index_path}
+
+    def __setstate__(self, state):
+        self.logger = logging.getLogger('datacite.doi_filter')
+        self.index_path = state['index_path']
+        self._open()
+
+    @property
+    def nbytes(self):
+        return len(self._mmap)
+
+    def __contains__(self, doi):
+        doi_hash = self.doi_hash(doi)
+        hashes = self._hashes
+        offsets = self._offsets
+        bucket = doi_hash >> self._shift
+        end = self._directory[bucket + 1]
+        index = bisect_left(hashes, doi_hash, self._directory[bucket], end)
+        while index < end and hashes[index] == doi_hash:
+            if self._data[offsets[index]:offsets[index + 1]] == doi:
+                return True
+            index += 1
+        return False
 
     def should_keep(self, record):
         try:
             doi = record.get('attributes', {}).get('doi', '').lower()
-            return doi in self.dois
+            return doi.encode('utf-8') in self
         except:
             return False
 
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+
+class FilterTarget:
+    """Named output of a filter expression, selecting records from a single scan.
+
+    A target is specified as a JSON object whose keys restrict the records it
+    keeps; a record must match every given key and any of the values of a
+    key:
+
+        "dois": {"file": "dois.csv", "column": "doi"}  DOIs of a CSV column
+        "providers": ["provider_id", ...]
+        "clients": ["client_id", ...]
+        "resourceTypeGeneral": ["Dataset", ...]        "Unknown" if missing
+        "publicationYear": {"from": 2015, "to": 2020}  inclusive, either optional
+        "state": ["findable", ...]                     default: ["findable"]
+
+    The records of a target are written to OUTPUT_DIR/<name> with the layout
+    of the selected sort mode.
+    """
+
+    KEYS = {'dois', 'providers', 'clients', 'resourceTypeGeneral', 'publicationYear', 'state'}
+    NAME_PATTERN = re.compile(r'[A-Za-z0-9][A-Za-z0-9._-]*')
+
+    def __init__(self, name, spec, output_dir, doi_filter=None):
+        """Compile a target from its spec.
+
+        Args:
+            name (str): Target name, also its output directory name
+            spec (dict): Filter expression of the target
+            output_dir (str): Base output directory
+            doi_filter (DOIFilter, optional): Filter for the spec's "dois" key
+        """
+        if not self.NAME_PATTERN.fullmatch(name) or name == 'hashed_records':
+            raise ValueError(f"Invalid target name '{name}'")
+        if not isinstance(spec, dict):
+            raise ValueError(f"Target '{name}' must be a JSON object")
+        unknown_keys = set(spec) - self.KEYS
+        if unknown_keys:
+            raise ValueError(f"Unknown keys in target '{name}': {', '.join(sorted(unknown_keys))}")
+
+        self.name = name
+        self.states = self._values(name, spec, 'state', ['findable'])
+        self.providers = self._values(name, spec, 'providers')
+        self.clients = self._values(name, spec, 'clients')
+        self.resource_types = self._values(name, spec, 'resourceTypeGeneral')
+        self.year_range = None
+        if 'publicationYear' in spec:
+            years = spec['publicationYear']
+            if not isinstance(years, dict) or not set(years) <= {'from', 'to'} or not all(
+                isinstance(year, int) and not isinstance(year, bool) for year in years.values()
+            ):
+                raise ValueError(f"publicationYear of target '{name}' must be an object with 'from' and/or 'to' years")
+            self.year_range = (years.get('from', float('-inf')), years.get('to', float('inf')))
+        self.doi_filter = doi_filter
+
+        self.directory_manager = DirectoryManager(Path(output_dir) / name)
+        if not self.directory_manager.setup_base_directory():
+            raise ValueError(f"Failed to create output directory of target '{name}'")
+        self.file_writer = FileWriter(self.directory_manager, batch_size=500_000)
+
+    @staticmethod
+    def _values(name, spec, key, default=None):
+        values = spec.get(key, default)
+        if values is None:
+            return None
+        if not isinstance(values, list) or not values:
+            raise ValueError(f"{key} of target '{name}' must be a non-empty list")
+        return frozenset(values)
+
+    @classmethod
+    def load(cls, spec_path, output_dir):
+        """Load the targets of a JSON spec file mapping target names to filter expressions.
+
+        DOI CSV paths are relative to the spec file, and targets with the
+        same CSV and column share one DOIFilter.
+
+        Returns:
+            list: FilterTargets in the order of the spec
+        """
+        try:
+            with open(spec_path, 'rb') as f:
+                specs = orjson.loads(f.read())
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Targets file not found: {spec_path}")
+        except orjson.JSONDecodeError as e:
+            raise ValueError(f"Error loading targets file: {str(e)}")
+        if not isinstance(specs, dict) or not specs:
+            raise ValueError("Targets file must be a non-empty JSON object of named targets")
+
+        doi_filters = {}
+        targets = []
+        for name, spec in specs.items():
+            doi_filter = None
+            if isinstance(spec, dict) and 'dois' in spec:
+                dois = spec['dois']
+                if not isinstance(dois, dict) or 'file' not in dois or 'column' not in dois:
+                    raise ValueError(f"dois of target '{name}' must be an object with 'file' and 'column'")
+                csv_path = Path(spec_path).parent / dois['file']
+                key = (str(csv_path.resolve()), dois['column'])
+                if key not in doi_filters:
+                    doi_filters[key] = DOIFilter(csv_path, dois['column'])
+                doi_filter = doi_filters[key]
+            targets.append(cls(name, spec, output_dir, doi_filter))
+        return targets
+
+    @staticmethod
+    def publication_year(attributes):
+        year = attributes.get('publicationYear')
+        if isinstance(year, str) and year.strip().isdigit():
+            return int(year)
+        if isinstance(year, int) and not isinstance(year, bool):
+            return year
+        return None
+
+    def matches(self, state, provider_id, client_id, rtg, year, doi):
+        """Return whether a record matches the target, checking its DOI last."""
+        if state not in self.states:
+            return False
+        if self.providers is not None and provider_id not in self.providers:
+            return False
+        if self.clients is not None and client_id not in self.clients:
+            return False
+        if self.resource_types is not None and rtg not in self.resource_types:
+            return False
+        if self.year_range is not None and (
+            year is None or not self.year_range[0] <= year <= self.year_range[1]
+        ):
+            return False
+        return self.doi_filter is None or doi in self.doi_filter
+
 
 class FileProcessor:
-    def __init__(self, file_writer, config, counter=None, lock=None, total_files=None):
+    def __init__(self, file_writer, config, counter=None, lock=None, total_files=None, doi_filter=None,
+                 targets=None):
         self.file_writer = file_writer
         self.config = config
         self._counter = counter
         self._lock = lock
         self._total_files = total_files
         self.logger = logging.getLogger('datacite.file_processor')
-        self.doi_filter = None
-        if config.from_file:
-            self.doi_filter = DOIFilter(config.from_file, config.doi_column)
+        self.decompressor = GzipDecompressor(config.decompression)
+        self.doi_filter = doi_filter
+        self.targets = targets
+        if targets:
+            self.prefilter = RecordPrefilter(
+                self._target_scope_ids(),
+                findable_only=all(target.states == {'findable'} for target in targets)
+            )
+        else:
+            self.prefilter = RecordPrefilter(self._prefilter_scope_ids())
 
     def log_progress(self, message):
         if self._lock:
@@ -503,13 +1326,76 @@ class FileProcessor:
             return client_id in self.config.clients
         return True
 
-    def process_file(self, filepath):
+    def _prefilter_scope_ids(self):
+        if self.config.all or self.config.sort_rtg_only:
+            return None
+        return self.config.providers or self.config.clients or None
+
+    def _target_scope_ids(self):
+        """Return the ids one of which every kept record mentions, or None if any record may be kept."""
+        scope_ids = set()
+        for target in self.targets:
+            target_ids = target.providers or target.clients
+            if not target_ids:
+                return None
+            scope_ids.update(target_ids)
+        return scope_ids
+
+    def _record_key(self, provider_id, client_id, rtg):
+        if self.config.sort_rtg_only:
+            return (rtg,)
+        if self.config.sort_provider_client_rtg:
+            return (provider_id, client_id, rtg)
+        return (provider_id, client_id)
+
+    def _route_to_targets(self, item):
+        """Add a parsed record to every target it matches, returning the number of matches."""
+        attributes = item.get('attributes', {})
+        relationships = item.get('relationships', {})
+        client_id = relationships.get('client', {}).get('data', {}).get('id')
+        provider_id = relationships.get('provider', {}).get('data', {}).get('id')
+
+        rtg = None
+        types_info = attributes.get('types', {})
+        if isinstance(types_info, dict):
+            rtg = types_info.get('resourceTypeGeneral')
+        if not rtg:
+            rtg = "Unknown"
+
+        doi = attributes.get('doi')
+        doi = doi.lower().encode('utf-8') if isinstance(doi, str) else b''
+        state = attributes.get('state')
+        year = FilterTarget.publication_year(attributes)
+
+        matched = 0
+        key = None
+        for target in self.targets:
+            if target.matches(state, provider_id, client_id, rtg, year, doi):
+                if key is None:
+                    key = self._record_key(provider_id, client_id, rtg)
+                target.file_writer.add_to_batch(key, item)
+                matched += 1
+        return matched
+
+    def process_file(self, task):
+        filepath = task.source if isinstance(task, FileShard) else task
         try:
             processed_count = 0
             skipped_count = 0
-            reader = BatchGzipReader(filepath)
+            start_time = time.perf_counter()
+            reader = BatchGzipReader.for_task(task, decompressor=self.decompressor, prefilter=self.prefilter)
 
             for item in reader:
+                if self.targets:
+                    try:
+                        if self._route_to_targets(item):
+                            processed_count += 1
+                        else:
+                            skipped_count += 1
+                    except (AttributeError, TypeError):
+                        skipped_count += 1
+                    continue
+
                 if item.get('attributes', {}).get('state') != 'findable':
                     skipped_count += 1
                     continue
@@ -547,6 +1433,13 @@ class FileProcessor:
                 processed_count += 1
 
             self.file_writer.flush_batch()
+            for target in self.targets or ():
+                target.file_writer.flush_batch()
+            skipped_count += reader.rejected_count
+
+            megabytes = reader.bytes_read / 2**20
+            elapsed = max(time.perf_counter() - start_time, 1e-9)
+            throughput = f"{megabytes:.1f} MB in {elapsed:.1f}s ({megabytes / elapsed:.1f} MB/s)"
 
             if self._counter is not None and self._lock and self._total_files:
                 with self._lock:
@@ -554,14 +1447,21 @@ class FileProcessor:
                     current_count = self._counter.value
                 self.log_progress(
                     f"Completed {current_count}/{self._total_files} "
-                    f"({Path(filepath).name}): {processed_count} findable, {skipped_count} skipped"
+                    f"({FileSharder.task_name(task)}): {processed_count} findable, {skipped_count} skipped, "
+                    f"{throughput}"
                 )
             else:
                 self.logger.info(
-                    f"Processed file {filepath}: {processed_count} findable, {skipped_count} skipped"
+                    f"Processed {FileSharder.task_name(task)}: {processed_count} findable, {skipped_count} skipped, "
+                    f"{throughput}"
                 )
 
         except Exception as e:
+            # The writers outlive the file; drop its buffered records so they
+            # are not flushed with the next file's
+            self.file_writer.discard_batch()
+            for target in self.targets or ():
+                target.file_writer.discard_batch()
             self.logger.error(f"Error processing file {filepath}: {str(e)}")
 
 
@@ -659,11 +1559,40 @@ class DataCiteDataFileProcessor:
     def __init__(self):
         self.logger = None
 
-    def init_worker(self, counter, lock, total_files):
-        global _counter, _lock, _total_files
+    def init_worker(self, counter, lock, total_files, file_processor=None):
+        global _counter, _lock, _total_files, _file_processor
         _counter = counter
         _lock = lock
         _total_files = total_files
+        # Installed once per worker, so tasks only carry their file path
+        _file_processor = file_processor
+
+    @staticmethod
+    def process_task(task):
+        return _file_processor.process_file(task)
+
+    def shard_files(self, sharder, files, processes_count):
+        large_files = [filepath for filepath in files if sharder.needs_sharding(filepath)]
+        indexes = {filepath: sharder.load_index(filepath) for filepath in large_files}
+        stale_files = [filepath for filepath, index in indexes.items() if index is None]
+        if stale_files:
+            self.logger.info(f"Recompressing {len(stale_files)} large files into shardable gzip members.")
+            with Pool(processes=min(processes_count, len(stale_files))) as pool:
+                for filepath in pool.imap_unordered(sharder.build, stale_files):
+                    indexes[filepath] = sharder.load_index(filepath)
+
+        tasks = []
+        shard_count = 0
+        for filepath in files:
+            if indexes.get(filepath):
+                shards = sharder.shards(filepath, indexes[filepath])
+                shard_count += len(shards)
+                tasks.extend(shards)
+            else:
+                tasks.append(filepath)
+
+        self.logger.info(f"Split {len(large_files)} large files into {shard_count} shards.")
+        return tasks
 
     def run(self):
         try:
@@ -675,7 +1604,7 @@ class DataCiteDataFileProcessor:
                 self.logger.error("Failed to create base output directory.")
                 return 1
                 
-            fetch_providers_and_clients = not (config.sort_rtg_only or config.from_file)
+            fetch_providers_and_clients = not (config.sort_rtg_only or config.from_file or config.targets)
 
             if fetch_providers_and_clients:
                 api_client = DataCiteAPIClient(cache_dir=config.cache_dir)
@@ -749,6 +1678,8 @@ class DataCiteDataFileProcessor:
 
             if config.from_file:
                 self.logger.info(f"Running in DOI filter mode using CSV: {config.from_file}")
+            if config.targets:
+                self.logger.info(f"Running in filter expression mode using targets: {config.targets}")
 
             self.logger.info(f"Found {total_files} files to process.")
 
@@ -759,30 +1690,66 @@ class DataCiteDataFileProcessor:
             file_writer = FileWriter(directory_manager, batch_size=500_000)
             processes_count = config.processes if config.processes is not None else max(1, cpu_count() - 1)
             self.logger.info(f"Using {processes_count} processes.")
+            self.logger.info(f"Using {GzipDecompressor.resolve(config.decompression)} decompression backend.")
+
+            if config.shard_size > 0:
+                sharder = FileSharder(config.shard_dir, config.shard_size * 2**20,
+                                      decompressor=GzipDecompressor(config.decompression))
+                sharder.prune(files_to_process)
+                files_to_process = self.shard_files(sharder, files_to_process, processes_count)
+            total_tasks = len(files_to_process)
+            scheduler = TaskScheduler(workers=processes_count)
+            batches = scheduler.plan(files_to_process)
 
             pool = None
+            doi_filter = None
+            targets = []
             try:
-                pool = Pool(
-                    processes=processes_count,
-                    initializer=self.init_worker,
-                    initargs=(counter, lock, total_files)
-                )
+                if config.targets:
+                    targets = FilterTarget.load(config.targets, config.output_dir)
+                    self.logger.info(f"Writing {len(targets)} targets: {', '.join(t.name for t in targets)}")
+                if config.from_file:
+                    doi_filter = DOIFilter(config.from_file, config.doi_column)
+                    self.logger.info(
+                        f"Using DOI index {doi_filter.index_path} of {doi_filter.count} DOIs "
+                        f"({doi_filter.nbytes / 2**20:.1f} MB)."
+                    )
 
                 file_processor = FileProcessor(
                     file_writer=file_writer,
                     config=config,
                     counter=counter,
                     lock=lock,
-                    total_files=total_files
+                    total_files=total_tasks,
+                    doi_filter=doi_filter,
+                    targets=targets or None
                 )
 
-                for _ in pool.imap_unordered(file_processor.process_file, files_to_process):
-                    pass
+                pool = Pool(
+                    processes=processes_count,
+                    initializer=self.init_worker,
+                    initargs=(counter, lock, total_tasks, file_processor)
+                )
+
+                processing_start = time.perf_counter()
+                for pid, elapsed, _ in pool.imap_unordered(
+                    partial(TaskScheduler.run_batch, self.process_task),
+                    batches
+                ):
+                    scheduler.record(pid, elapsed)
+                scheduler.log_makespan(time.perf_counter() - processing_start)
 
             finally:
                 if pool:
                     pool.close()
                     pool.join()
+                if doi_filter:
+                    doi_filter.close()
+                for target_doi_filter in {target.doi_filter for target in targets} - {None}:
+                    target_doi_filter.close()
+
+            for target in targets:
+                RecordReorganizer(target.directory_manager).move_hashed_files(compress=True)
 
             reorganizer = RecordReorganizer(directory_manager)
             reorganizer.move_hashed_files(compress=(not config.all))
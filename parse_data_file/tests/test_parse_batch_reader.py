@@ -0,0 +1,40 @@
+import gzip
+
+import pytest
+
+from parse_data_file import BatchGzipReader, RecordPrefilter
+
+LINES = [
+    b'{"id": 1, "attributes": {"state": "findable"}}',
+    b'',
+    b'   \t',
+    b'{"id": 2, "attributes": {"state": "draft"}}',
+    b'{"id": 3, "attributes": {"state": "findable"',
+    b'',
+    b'{"id": 4, "attributes": {"state": "findable"}}',
+]
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / 'records.jsonl.gz'
+    path.write_bytes(gzip.compress(b'\n'.join(LINES) + b'\n'))
+    return str(path)
+
+
+def read(reader):
+    return [(record['id'], reader.line_number) for record in reader]
+
+
+@pytest.mark.parametrize('chunk_size', [7, 2**24])
+def test_records_carry_physical_line_numbers(data_file, chunk_size):
+    reader = BatchGzipReader(data_file, chunk_size=chunk_size)
+    assert read(reader) == [(1, 1), (2, 4), (4, 7)]
+    assert reader.rejected_count == 0
+
+
+def test_blank_lines_are_not_counted_as_rejected(data_file):
+    reader = BatchGzipReader(data_file, prefilter=RecordPrefilter())
+    assert read(reader) == [(1, 1), (4, 7)]
+    # The draft record; blank lines are skipped and the truncated record fails to parse
+    assert reader.rejected_count == 1
@@ -0,0 +1,55 @@
+import gzip
+
+import orjson
+
+from parse_data_file import ArgumentConfig, DirectoryManager, FileProcessor, FileWriter
+
+
+class FailingDOIFilter:
+    """Keeps every record, raising on the DOI given."""
+
+    def __init__(self, failing_doi):
+        self.failing_doi = failing_doi
+
+    def should_keep(self, item):
+        if item['attributes']['doi'] == self.failing_doi:
+            raise OSError('index unavailable')
+        return True
+
+
+def record(doi):
+    return orjson.dumps({
+        'id': doi,
+        'attributes': {'doi': doi, 'state': 'findable'},
+        'relationships': {
+            'client': {'data': {'id': 'p0.c0'}},
+            'provider': {'data': {'id': 'p0'}},
+        },
+    })
+
+
+def write_data_file(path, dois):
+    path.write_bytes(gzip.compress(b'\n'.join(record(doi) for doi in dois) + b'\n'))
+    return str(path)
+
+
+def test_failed_file_does_not_leak_records_into_the_next(tmp_path):
+    config = ArgumentConfig()
+    config.all = True
+    config.decompression = 'gzip'
+    directory_manager = DirectoryManager(tmp_path / 'output')
+    directory_manager.setup_base_directory()
+    file_writer = FileWriter(directory_manager)
+    processor = FileProcessor(file_writer, config, doi_filter=FailingDOIFilter('10.1/fail'))
+
+    processor.process_file(write_data_file(tmp_path / 'a.jsonl.gz', ['10.1/a', '10.1/fail']))
+    assert file_writer.buffer_count == 0
+    processor.process_file(write_data_file(tmp_path / 'b.jsonl.gz', ['10.1/b']))
+
+    written = [
+        orjson.loads(line)['id']
+        for path in (tmp_path / 'output' / 'hashed_records').rglob('*')
+        if path.is_file()
+        for line in path.read_bytes().splitlines()
+    ]
+    assert written == ['10.1/b']
@@ -0,0 +1,93 @@
+import orjson
+import pytest
+
+from parse_data_file import RecordPrefilter
+
+SCOPE = ['p0', 'p0.c1']
+
+
+def record(state='findable', client='p0.c1', provider='p0', **attributes):
+    return orjson.dumps({
+        'attributes': dict(attributes, state=state),
+        'relationships': {
+            'client': {'data': {'id': client}},
+            'provider': {'data': {'id': provider}},
+        },
+    })
+
+
+def is_kept(line, scope_ids=SCOPE, findable_only=True):
+    item = orjson.loads(line)
+    state = item.get('attributes', {}).get('state')
+    relationships = item.get('relationships', {})
+    ids = {
+        relationships.get('client', {}).get('data', {}).get('id'),
+        relationships.get('provider', {}).get('data', {}).get('id'),
+    }
+    return (state == 'findable' or not findable_only) and (not scope_ids or bool(ids & set(scope_ids)))
+
+
+# Lines of in-scope findable records, each of which the prefilter must pass
+KEPT_LINES = [
+    record(),
+    record(client='other.client'),
+    record(provider='other'),
+    # Escaped quotes in keys and values
+    record(**{'ti"tle': 'x'}),
+    record(title='say "state": "draft" and "p9.c9"'),
+    record(title='ends with a backslash\\'),
+    # A nested "state" before the top-level one
+    rb'{"attributes": {"container": {"state": "draft"}, "state": "findable"},'
+    rb' "relationships": {"client": {"data": {"id": "p0.c1"}}}}',
+    # "findable" and the scope ids as values of other keys
+    record(title='findable'),
+    record(subjects=['p0.c1', 'findable']),
+    # Ids and keys spelled with \u escapes
+    rb'{"attributes": {"state": "findable"}, "relationships": {"client": {"data": {"id": "p0\u002ec1"}}}}',
+    rb'{"attributes": {"st\u0061te": "findable"}, "relationships": {"provider": {"data": {"id": "p0"}}}}',
+]
+
+# Lines of records that are skipped and can be told apart from the bytes
+REJECTED_LINES = [
+    record(state='draft'),
+    record(state='registered', title='findable'),
+    # Near misses of the scope ids
+    record(client='p0.c10', provider='p01'),
+    record(client='p0xc1', provider='p'),
+    record(client='P0.C1', provider='P0'),
+    record(client='xp0.c1', provider='p0 '),
+    # Escaped quotes around a scope id in a value
+    record(client='x', provider='y', title='"p0.c1"'),
+]
+
+
+@pytest.mark.parametrize('line', KEPT_LINES)
+def test_kept_lines_pass(line):
+    assert is_kept(line)
+    assert RecordPrefilter(SCOPE).might_keep(line)
+
+
+@pytest.mark.parametrize('line', REJECTED_LINES)
+def test_skipped_lines_are_rejected(line):
+    assert not is_kept(line)
+    assert not RecordPrefilter(SCOPE).might_keep(line)
+
+
+def test_nested_state_and_scope_id_values_are_false_positives():
+    line = (rb'{"attributes": {"state": "draft", "relatedItems": [{"state": "findable"}],'
+            rb' "subjects": ["p0.c1"]}, "relationships": {"client": {"data": {"id": "p2.c2"}}}}')
+    assert not is_kept(line)
+    assert RecordPrefilter(SCOPE).might_keep(line)
+
+
+@pytest.mark.parametrize('state', ['draft', 'registered', 'findable'])
+def test_other_states_pass_when_not_findable_only(state):
+    line = record(state=state)
+    assert is_kept(line, findable_only=False)
+    assert RecordPrefilter(SCOPE, findable_only=False).might_keep(line)
+    assert not RecordPrefilter(SCOPE, findable_only=False).might_keep(record(state=state, client='x', provider='y'))
+
+
+def test_without_scope_only_the_state_is_checked():
+    assert RecordPrefilter().might_keep(record(client='x', provider='y'))
+    assert not RecordPrefilter().might_keep(record(state='draft'))
@@ -0,0 +1,67 @@
+"""Times the gzip decompression backends of the data file processor on a .jsonl.gz file.
+
+Every available backend (and `pigz -dc` if pigz is on the PATH) reads the
+file through BatchGzipReader, which decompresses it and slices it into
+lines as a processing run does, without parsing the records. The best of
+several repeats is reported as decompressed MB per second.
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from process_data_file_for_metadata_health_api import BatchGzipReader, GzipDecompressor  # noqa: E402
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='Compare the gzip decompression backends on a data file'
+    )
+    parser.add_argument('file', help='.jsonl.gz data file or shard copy to read')
+    parser.add_argument('-b', '--backends', nargs='+',
+                        choices=[backend for backend in GzipDecompressor.BACKENDS if backend != 'auto'],
+                        help='Backends to time (default: every available backend)')
+    parser.add_argument('-r', '--repeat', type=int, default=3,
+                        help='Number of reads per backend; the fastest is reported (default: 3)')
+    return parser.parse_args()
+
+
+def time_backend(filepath, backend, repeat):
+    """Return (decompressed bytes, lines, best time in seconds) of reading a file."""
+    decompressor = GzipDecompressor(backend)
+    best = None
+    for _ in range(repeat):
+        reader = BatchGzipReader(filepath, decompressor=decompressor)
+        start = time.perf_counter()
+        lines = sum(1 for _ in reader.iter_lines())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return reader.bytes_read, lines, best
+
+
+def main():
+    args = parse_arguments()
+    logging.basicConfig(level=logging.WARNING)
+    backends = args.backends or [
+        backend for backend in GzipDecompressor.BACKENDS
+        if backend != 'auto' and GzipDecompressor.is_available(backend)
+    ]
+    compressed = os.path.getsize(args.file)
+    print(f"{args.file}: {compressed / 2**20:.1f} MB compressed, "
+          f"auto resolves to {GzipDecompressor.resolve('auto')}")
+    print(f"{'backend':<10}{'MB/s':>10}{'seconds':>10}{'lines':>12}")
+    for backend in backends:
+        if not GzipDecompressor.is_available(backend):
+            print(f"{backend:<10}{'not installed':>32}")
+            continue
+        size, lines, elapsed = time_backend(args.file, backend, args.repeat)
+        print(f"{backend:<10}{size / 2**20 / elapsed:>10.0f}{elapsed:>10.2f}{lines:>12}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+"""Measures the memory and time of a processing run with many providers and clients.
+
+A provider/client cache and data files are generated in a temporary
+directory, with every client's records spread over a few resource types,
+and the processor is run on them. The peak RSS reported is the largest of
+the processor's main and worker processes, each of which holds counters for
+the providers and clients it has seen. --script runs another copy of the
+processor (e.g. a checkout of an earlier revision) on the same input.
+"""
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import resource
+import tempfile
+import subprocess
+from pathlib import Path
+
+RESOURCE_TYPES = [
+    'Dataset', 'Text', 'Image', 'Software', 'Collection', 'JournalArticle',
+    'PhysicalObject', 'Audiovisual', 'Preprint', 'Other',
+]
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='Measure processor memory and time on a generated input with many entities'
+    )
+    parser.add_argument('--providers', type=int, default=300, help='Number of providers (default: 300)')
+    parser.add_argument('--clients', type=int, default=3000, help='Number of clients (default: 3000)')
+    parser.add_argument('--records', type=int, default=100000, help='Number of findable records (default: 100000)')
+    parser.add_argument('--files', type=int, default=4, help='Number of data files (default: 4)')
+    parser.add_argument('--resource-types', type=int, default=3,
+                        help='Number of resource types used by each client (default: 3)')
+    parser.add_argument('-n', '--processes', type=int, default=2, help='Worker processes (default: 2)')
+    parser.add_argument('--script', default=str(Path(__file__).resolve().parent / 'process_data_file_for_metadata_health_api.py'),
+                        help='Processor script to run (default: the one next to this file)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the generated input (default: 0)')
+    return parser.parse_args()
+
+
+def generate_input(directory, args):
+    """Write the provider/client cache and the data files; return the input and cache dirs."""
+    rng = random.Random(args.seed)
+    cache_dir = directory / 'cache'
+    input_dir = directory / 'input'
+    cache_dir.mkdir()
+    input_dir.mkdir()
+
+    providers = [f'p{i}' for i in range(args.providers)]
+    clients = [(f'{providers[i % args.providers]}.c{i}', providers[i % args.providers])
+               for i in range(args.clients)]
+    with open(cache_dir / 'providers.json', 'w') as f:
+        json.dump([{'id': provider_id, 'type': 'providers',
+                    'attributes': {'name': provider_id.upper(), 'symbol': provider_id},
+                    'relationships': {'prefixes': {'data': []}}}
+                   for provider_id in providers], f)
+    with open(cache_dir / 'clients.json', 'w') as f:
+        json.dump([{'id': client_id, 'type': 'clients',
+                    'attributes': {'name': client_id.upper(), 'symbol': client_id},
+                    'relationships': {'provider': {'data': {'id': provider_id, 'type': 'providers'}},
+                                      'prefixes': {'data': []}}}
+                   for client_id, provider_id in clients], f)
+
+    client_types = [rng.sample(RESOURCE_TYPES, args.resource_types) for _ in clients]
+    outputs = [gzip.open(input_dir / f'part{i}.jsonl.gz', 'wt') for i in range(args.files)]
+    try:
+        for number in range(args.records):
+            index = rng.randrange(len(clients))
+            client_id, provider_id = clients[index]
+            record = {
+                'id': f'10.5555/{number}',
+                'type': 'dois',
+                'attributes': {
+                    'doi': f'10.5555/{number}',
+                    'state': 'findable',
+                    'creators': [{'name': 'x', 'nameType': 'Personal'}],
+                    'titles': [{'title': 't'}],
+                    'publisher': {'name': 'pub'},
+                    'publicationYear': 2000 + number % 25,
+                    'types': {'resourceTypeGeneral': rng.choice(client_types[index])},
+                    'subjects': [{'subject': 's'}],
+                    'dates': [{'date': '2020', 'dateType': 'Issued'}],
+                    'rightsList': [{'rights': 'r'}],
+                    'descriptions': [{'description': 'd', 'descriptionType': 'Abstract'}],
+                },
+                'relationships': {
+                    'client': {'data': {'id': client_id, 'type': 'clients'}},
+                    'provider': {'data': {'id': provider_id, 'type': 'providers'}},
+                },
+            }
+            outputs[number % args.files].write(json.dumps(record) + '\n')
+    finally:
+        for output in outputs:
+            output.close()
+    return input_dir, cache_dir
+
+
+def main():
+    args = parse_arguments()
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        input_dir, cache_dir = generate_input(directory, args)
+        command = [
+            sys.executable, args.script,
+            '-i', str(input_dir),
+            '-o', str(directory / 'output'),
+            '-c', str(cache_dir),
+            '-n', str(args.processes),
+            '-l', 'WARNING',
+        ]
+        start = time.perf_counter()
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            sys.stderr.write(result.stderr)
+            return result.returncode
+
+    # ru_maxrss is in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 2**10
+    print(f"{args.records} records, {args.providers} providers, {args.clients} clients, "
+          f"{args.resource_types} resource types per client")
+    print(f"Wall time: {elapsed:.1f} s, peak RSS: {peak_rss:.1f} MB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
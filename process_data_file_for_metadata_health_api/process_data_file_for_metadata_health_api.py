@@ -1,13 +1,66 @@
+import io
+import os
+import re
 import sys
 import json
 import gzip
+import time
+import hashlib
+import queue
+import shutil
 import logging
 import argparse
+import math
+import sqlite3
+import subprocess
+import multiprocessing
 import orjson
 import requests
+import numpy as np
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
 from datetime import datetime
-from multiprocessing import Pool, cpu_count, Manager
+from functools import partial
+from itertools import chain
+from typing import Any, Union
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import cpu_count
+
+try:
+    from isal import igzip
+except ImportError:
+    igzip = None
+
+try:
+    from zlib_ng import gzip_ng
+except ImportError:
+    gzip_ng = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Progress state, prefix index and file processor of worker processes, set by
+# DataCiteDataFileProcessor.init_worker
+_counter = None
+_total_files = None
+_prefix_index = None
+_file_processor = None
 
 
 class ArgumentConfig:
@@ -16,6 +69,23 @@ class ArgumentConfig:
         self.output_dir = None
         self.cache_dir = None
         self.log_level = None
+        self.merge_mode = None
+        self.incremental = False
+        self.partials_dir = None
+        self.decompression = None
+        self.decoding = None
+        self.shard_size = None
+        self.shard_dir = None
+        self.processes = None
+        self.pool_backend = None
+        self.max_tasks_per_child = None
+        self.compact_output = False
+        self.output_compression = None
+        self.stats_layout = None
+        self.sqlite = None
+        self.presence_dir = None
+        self.time_dimension = None
+        self.registry_max_age = None
 
     @classmethod
     def parse_arguments(cls):
@@ -26,7 +96,55 @@ class ArgumentConfig:
         parser.add_argument('-i', '--input-dir', required=True, help='Directory containing DataCite data files (recursive search for jsonl.gz)')
         parser.add_argument('-o', '--output-dir', required=True, help='Output directory for JSON files')
         parser.add_argument('-c', '--cache-dir', help='Directory for caching API responses')
+        parser.add_argument('--registry-max-age', type=float, metavar='HOURS',
+                            help='Refresh cached providers and clients older than HOURS with conditional '
+                                 'requests (default: cached responses are always reused)')
         parser.add_argument('-l', '--log-level', default='INFO', help='Logging level')
+        parser.add_argument('-m', '--merge-mode', choices=['file', 'worker'], default='file',
+                            help='Merge stats per file in the main process (file) or keep long-lived '
+                                 'per-worker accumulators that are merged once at the end (worker)')
+        parser.add_argument('--incremental', action='store_true',
+                            help='Reuse cached per-file partial stats and only process new or changed files')
+        parser.add_argument('--partials-dir',
+                            help='Directory for cached per-file partial stats (default: OUTPUT_DIR/partials)')
+        parser.add_argument('-z', '--decompression', choices=GzipDecompressor.BACKENDS, default='auto',
+                            help='Gzip decompression backend (default: auto, the first available '
+                                 'of zlib-ng, isal and gzip)')
+        parser.add_argument('--decoding', choices=['auto', 'projected', 'full'], default='auto',
+                            help='Decode only the fields the stats use (projected, requires msgspec) or '
+                                 'every record in full with orjson (default: auto, projected when '
+                                 'msgspec is installed)')
+        parser.add_argument('--shard-size', type=int, default=0, metavar='MB',
+                            help='Split files larger than MB megabytes into shards of about that size that '
+                                 'are processed in parallel (default: 0, no sharding)')
+        parser.add_argument('--shard-dir',
+                            help='Directory for the recompressed copies of sharded files '
+                                 '(default: OUTPUT_DIR/.shards)')
+        parser.add_argument('-n', '--processes', type=int,
+                            help='Number of worker processes (default: one less than the CPUs available '
+                                 'to this process, honouring CPU affinity and cgroup quotas)')
+        parser.add_argument('--pool-backend', choices=WorkerPool.BACKENDS, default='pool',
+                            help='Worker pool used in file merge mode: multiprocessing.Pool (pool) or '
+                                 'concurrent.futures.ProcessPoolExecutor (executor) (default: pool)')
+        parser.add_argument('--max-tasks-per-child', type=int,
+                            help='Replace each worker process after this many tasks, bounding the memory '
+                                 'held by long-lived workers (default: workers live for the whole run)')
+        parser.add_argument('--compact-output', action='store_true',
+                            help='Write output JSON without indentation')
+        parser.add_argument('--output-compression', choices=['none', 'gzip'], default='none',
+                            help='Compression of the output files; gzip writes .json.gz files (default: none)')
+        parser.add_argument('--stats-layout', choices=OutputWriter.STATS_LAYOUTS, default='single',
+                            help='Write each stats file as a single JSON document (single) or as one JSON '
+                                 'record per provider/client with an offsets index for serving single '
+                                 'entities (indexed) (default: single)')
+        parser.add_argument('--sqlite', metavar='PATH',
+                            help='Also write the stats as long-format tables to a SQLite database at PATH')
+        parser.add_argument('--presence-dir',
+                            help='Write a Parquet file per data file with the field presence mask of every '
+                                 'findable record to this directory (requires pyarrow)')
+        parser.add_argument('--time-dimension', choices=StatsLayout.TIME_DIMENSIONS,
+                            help='Also break the stats down by publication year (publicationYear) or by '
+                                 'month of registration (registered) or creation (created)')
 
         args = parser.parse_args()
 
@@ -34,7 +152,24 @@ class ArgumentConfig:
         config.input_dir = args.input_dir
         config.output_dir = args.output_dir
         config.cache_dir = args.cache_dir
+        config.registry_max_age = None if args.registry_max_age is None else args.registry_max_age * 3600
         config.log_level = args.log_level
+        config.merge_mode = args.merge_mode
+        config.incremental = args.incremental
+        config.partials_dir = args.partials_dir or str(Path(args.output_dir) / 'partials')
+        config.decompression = args.decompression
+        config.decoding = args.decoding
+        config.shard_size = args.shard_size
+        config.shard_dir = args.shard_dir or str(Path(args.output_dir) / '.shards')
+        config.processes = args.processes
+        config.pool_backend = args.pool_backend
+        config.max_tasks_per_child = args.max_tasks_per_child
+        config.compact_output = args.compact_output
+        config.output_compression = None if args.output_compression == 'none' else args.output_compression
+        config.stats_layout = args.stats_layout
+        config.sqlite = args.sqlite
+        config.presence_dir = args.presence_dir
+        config.time_dimension = args.time_dimension
 
         return config
 
@@ -58,17 +193,43 @@ class LoggerSetup:
 
 
 class DataCiteAPIClient:
-    """Client for retrieving providers and clients metadata from DataCite API."""
+    """Client for retrieving providers and clients metadata from DataCite API.
 
-    def __init__(self, cache_dir=None):
+    Pages of an endpoint are fetched concurrently over a shared, pooled
+    requests.Session that retries transient failures. With a cache directory,
+    every endpoint is stored as {endpoint}.json (the list of items) and
+    {endpoint}.pages.json (when it was fetched and the ETag/Last-Modified
+    validators of every page). Cached data is reused as is unless it is older
+    than max_age, in which case every page is requested conditionally and
+    pages the API reports as unchanged (304) are taken from the cache.
+    """
+
+    FETCH_WORKERS = 4
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, cache_dir=None, max_age=None, base_url='https://api.datacite.org'):
         """Initialize the DataCite API client.
 
         Args:
             cache_dir (str, optional): Directory path for caching API responses.
                 If provided, responses will be cached to and loaded from this directory.
+            max_age (float, optional): Age in seconds after which cached responses
+                are refreshed. Cached responses never expire if not provided.
+            base_url (str): Base URL of the DataCite API
         """
-        self.base_url = 'https://api.datacite.org'
+        self.base_url = base_url.rstrip('/')
         self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_age = max_age
+        self.logger = logging.getLogger('datacite.api_client')
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.FETCH_WORKERS,
+            max_retries=Retry(total=3, backoff_factor=1, status_forcelist=self.RETRY_STATUSES,
+                              allowed_methods=['GET'])
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
 
         if self.cache_dir:
             self.cache_dir.mkdir(parents=True, exist_ok=True)
@@ -80,54 +241,176 @@ class DataCiteAPIClient:
         return self.get_all_pages('clients')
 
     def get_all_pages(self, endpoint, page_size=1000):
-        if self.cache_dir:
-            cache_file = self.cache_dir / f"{endpoint}.json"
-            if cache_file.exists():
-                logging.info(f"Loading cached {endpoint} data")
-                with open(cache_file, 'r') as f:
-                    return json.load(f)
-
-        logging.info(f"Fetching {endpoint} data from API")
-        all_items = []
-        page = 1
-        total_pages = 1
-
-        while page <= total_pages:
-            url = f"{self.base_url}/{endpoint}"
-            params = {
-                'page[size]': page_size,
-                'page[number]': page,
-                'include': 'prefixes'
-            }
-
-            response = requests.get(url, params=params)
-            if response.status_code != 200:
-                raise Exception(f"API request failed: {response.status_code}")
+        """Return all items of an endpoint, from the cache when it is fresh enough.
 
-            data = response.json()
-            all_items.extend(data.get('data', []))
-
-            meta = data.get('meta', {})
-            total_pages = meta.get('totalPages', 1)
-            total = meta.get('total', 0)
+        Args:
+            endpoint (str): API endpoint, e.g. 'providers'
+            page_size (int): Number of items per page
 
-            logging.info(
-                f"Fetched page {page} of {total_pages} for {endpoint} "
-                f"({len(all_items)}/{total} items)"
-            )
-            page += 1
+        Returns:
+            list: Items of the endpoint
+        """
+        cached_items, pages_meta = self._load_cache(endpoint)
+        if cached_items is not None:
+            age = time.time() - pages_meta.get('fetched_at', 0)
+            if self.max_age is None or age <= self.max_age:
+                self.logger.info(f"Loading cached {endpoint} data")
+                return cached_items
+            self.logger.info(f"Refreshing cached {endpoint} data ({age / 3600:.1f} hours old)")
+        else:
+            self.logger.info(f"Fetching {endpoint} data from API")
+
+        # Validators only apply to pages of the same size
+        if pages_meta.get('page_size') != page_size:
+            pages_meta = {}
+        cached_pages = self._split_pages(cached_items or [], pages_meta.get('pages', []))
+
+        url = f"{self.base_url}/{endpoint}"
+        fetched_at = time.time()
+        first_page = self._fetch_page(url, endpoint, 1, page_size, cached_pages)
+        total_pages = first_page['total_pages']
+        # The first page's validators cover its meta, so the page count is unchanged too
+        if total_pages is None:
+            total_pages = len(cached_pages)
+
+        pages = [first_page]
+        if total_pages > 1:
+            with ThreadPoolExecutor(max_workers=self.FETCH_WORKERS) as executor:
+                futures = [
+                    executor.submit(self._fetch_page, url, endpoint, page, page_size, cached_pages)
+                    for page in range(2, total_pages + 1)
+                ]
+                pages.extend(future.result() for future in futures)
+
+        all_items = [item for page in pages for item in page['items']]
+        unchanged = sum(1 for page in pages if page['unchanged'])
+        self.logger.info(
+            f"Fetched {len(all_items)} {endpoint} in {total_pages} pages "
+            f"({unchanged} unchanged since the last fetch)"
+        )
+        if cached_items is not None:
+            self._log_changes(endpoint, cached_items, all_items)
 
         if self.cache_dir:
-            with open(self.cache_dir / f"{endpoint}.json", 'w') as f:
-                json.dump(all_items, f)
+            self._save_cache(endpoint, all_items, {
+                'fetched_at': fetched_at,
+                'page_size': page_size,
+                'pages': [
+                    {'etag': page['etag'], 'last_modified': page['last_modified'], 'count': len(page['items'])}
+                    for page in pages
+                ]
+            })
 
         return all_items
 
-    def _get_single_page(self, url, params):
-        response = requests.get(url, params=params)
+    def _fetch_page(self, url, endpoint, page, page_size, cached_pages):
+        """Fetch one page, conditionally if validators of the cached page are known.
+
+        Returns:
+            dict: 'items', 'total_pages' (None for unchanged pages), 'etag',
+                'last_modified' and whether the page is 'unchanged'
+        """
+        params = {
+            'page[size]': page_size,
+            'page[number]': page,
+            'include': 'prefixes'
+        }
+        headers = {}
+        cached = cached_pages[page - 1] if page <= len(cached_pages) else None
+        if cached:
+            if cached['etag']:
+                headers['If-None-Match'] = cached['etag']
+            if cached['last_modified']:
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        response = self.session.get(url, params=params, headers=headers, timeout=60)
+        if response.status_code == 304 and cached:
+            self.logger.debug(f"Page {page} of {endpoint} is unchanged")
+            return {
+                'items': cached['items'],
+                'total_pages': None,
+                'etag': cached['etag'],
+                'last_modified': cached['last_modified'],
+                'unchanged': True
+            }
         if response.status_code != 200:
             raise Exception(f"API request failed: {response.status_code}")
-        return response.json()
+
+        data = response.json()
+        meta = data.get('meta', {})
+        self.logger.debug(f"Fetched page {page} of {meta.get('totalPages', 1)} for {endpoint}")
+        return {
+            'items': data.get('data', []),
+            'total_pages': meta.get('totalPages', 1),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'unchanged': False
+        }
+
+    @staticmethod
+    def _split_pages(items, pages):
+        """Split cached items into pages with their validators."""
+        cached_pages = []
+        offset = 0
+        for page in pages:
+            count = page['count']
+            cached_pages.append({
+                'items': items[offset:offset + count],
+                'etag': page.get('etag'),
+                'last_modified': page.get('last_modified')
+            })
+            offset += count
+        if offset != len(items):
+            return []
+        return cached_pages
+
+    def _log_changes(self, endpoint, old_items, new_items):
+        """Log how many items were added, removed or updated since the cached fetch."""
+        old_updated = {item['id']: item.get('attributes', {}).get('updated') for item in old_items}
+        new_updated = {item['id']: item.get('attributes', {}).get('updated') for item in new_items}
+        added = len(new_updated.keys() - old_updated.keys())
+        removed = len(old_updated.keys() - new_updated.keys())
+        updated = sum(
+            1 for item_id, timestamp in new_updated.items()
+            if item_id in old_updated and old_updated[item_id] != timestamp
+        )
+        self.logger.info(f"{endpoint}: {added} added, {removed} removed, {updated} updated")
+
+    def _load_cache(self, endpoint):
+        """Return the cached items and page metadata of an endpoint.
+
+        Caches written without page metadata are dated by their modification
+        time and have no validators.
+
+        Returns:
+            tuple: (items or None, page metadata dict)
+        """
+        if not self.cache_dir:
+            return None, {}
+        cache_file = self.cache_dir / f"{endpoint}.json"
+        if not cache_file.exists():
+            return None, {}
+        with open(cache_file, 'rb') as f:
+            items = orjson.loads(f.read())
+
+        pages_file = self.cache_dir / f"{endpoint}.pages.json"
+        try:
+            with open(pages_file, 'rb') as f:
+                pages_meta = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            pages_meta = {'fetched_at': cache_file.stat().st_mtime}
+        return items, pages_meta
+
+    def _save_cache(self, endpoint, items, pages_meta):
+        """Atomically write the items and page metadata of an endpoint."""
+        for path, content in (
+            (self.cache_dir / f"{endpoint}.json", items),
+            (self.cache_dir / f"{endpoint}.pages.json", pages_meta),
+        ):
+            temp_path = path.with_name(path.name + '.tmp')
+            with open(temp_path, 'wb') as f:
+                f.write(orjson.dumps(content))
+            os.replace(temp_path, path)
 
 
 class StatsContainer:
@@ -209,187 +492,614 @@ class StatsContainer:
         }
     }
 
-    def __init__(self):
-        self.stats = self.create_empty_stats()
+    def __init__(self, time_dimension=None):
+        """Initialize the container.
 
-    @classmethod
-    def create_empty_field_stats(cls, field_name, field_status):
-        """Create empty stats structure for a field.
+        Args:
+            time_dimension (str, optional): Record attribute to additionally
+                break the stats down by (see StatsLayout.TIME_DIMENSIONS)
+        """
+        self.layout = StatsLayout(self.FIELD_STATUS, self.SUBFIELD_STATS, time_dimension)
+        self.skeleton = StatsSkeleton(self.layout, self.FIELD_STATUS)
+
+    def stats_from_counts(self, counts, clean=False):
+        """Build the nested stats structure from the counters of an entity.
 
         Args:
-            field_name (str): Name of the field
-            field_status (str): Status of the field (mandatory/recommended/optional)
+            counts (SparseCounts): Counters laid out by self.layout
+            clean (bool): Build the structure already cleaned, with rounded
+                completeness values and without zero value counts
 
         Returns:
-            dict: Empty stats structure for the field
+            dict: Stats structure (without the outer 'stats' key) including
+                missing, completeness and category metrics, with sections only
+                for resource types that have records
         """
-        stats = {
-            'count': 0,
-            'instances': 0,
-            'fieldStatus': field_status,
-            'completeness': 0.0,
-            'missing': 0
+        return self.skeleton.stats(counts, clean)
+
+
+class StatsLayout:
+    """Fixed counter layout compiled from the StatsContainer field definitions.
+
+    Every raw counter (field count/instances, subfield count/instances and
+    controlled vocabulary value counts) is mapped to an integer slot, so the
+    stats of a provider or client can be kept in int64 arrays with one row
+    for the summary and one row per resourceTypeGeneral (see SparseCounts).
+    With a time dimension, every time bucket (publication year or month of
+    registration/creation) gets a further row after the resource type rows.
+    Vocabularies are sorted so that every process derives the same layout.
+    """
+
+    SUMMARY_ROW = 0
+    COUNT_SLOT = 0
+    TIME_DIMENSIONS = ('publicationYear', 'registered', 'created')
+
+    def __init__(self, field_status, subfield_stats, time_dimension=None):
+        self.resource_types = sorted(
+            subfield_stats['resourceType']['resourceTypeGeneral'])
+        self.resource_type_rows = {
+            resource_type: row for row, resource_type in enumerate(self.resource_types, start=1)
         }
-
-        if field_name in cls.SUBFIELD_STATS:
-            subfields = cls.SUBFIELD_STATS[field_name]
-            stats['subfields'] = {}
-
+        self.num_rows = len(self.resource_types) + 1
+        self.time_dimension = time_dimension
+
+        self.category_count_slots = {'mandatory': [], 'recommended': [], 'optional': []}
+        self.presence_bits = {}   # field/subfield count slot -> bit in a record presence mask
+        self.field_slots = {}     # field -> (count_slot, instances_slot)
+        self.subfield_slots = {}  # field -> {subfield: (count_slot, instances_slot)}
+        self.value_slots = {}     # field -> {subfield: {value: slot}}
+
+        next_slot = self.COUNT_SLOT + 1
+        for field_name, status in field_status.items():
+            self.field_slots[field_name] = (next_slot, next_slot + 1)
+            self.presence_bits[next_slot] = 1 << len(self.presence_bits)
+            if status in self.category_count_slots:
+                self.category_count_slots[status].append(next_slot)
+            next_slot += 2
+
+            subfields = subfield_stats.get(field_name)
+            if not subfields:
+                continue
+
+            self.subfield_slots[field_name] = {}
+            self.value_slots[field_name] = {}
             for subfield, values in subfields.items():
                 if subfield == 'multiple':
                     continue
 
-                if isinstance(values, set):
-                    stats['subfields'][subfield] = {
-                        'count': 0,
-                        'instances': 0,
-                        'missing': 0,
-                        'completeness': 0.0,
-                        'values': {val: 0 for val in values}
-                    }
-                elif isinstance(values, dict):
-                    base_stats = {
-                        'count': 0,
-                        'instances': 0,
-                        'missing': 0,
-                        'completeness': 0.0
+                self.subfield_slots[field_name][subfield] = (next_slot, next_slot + 1)
+                self.presence_bits[next_slot] = 1 << len(self.presence_bits)
+                next_slot += 2
+
+                if isinstance(values, dict):
+                    scheme_field = f'{subfield}Scheme'
+                    if not (values.get('scheme') and scheme_field in subfields):
+                        continue
+                    values = subfields[scheme_field]
+
+                self.value_slots[field_name][subfield] = {}
+                for value in sorted(values):
+                    self.value_slots[field_name][subfield][value] = next_slot
+                    next_slot += 1
+
+        self.num_slots = next_slot
+        self._presence_cache = {}
+
+    def fingerprint(self):
+        """Return a hash identifying the slot assignment of this layout."""
+        layout = [self.resource_types, self.num_slots, self.field_slots,
+                  self.subfield_slots, self.value_slots]
+        if self.time_dimension:
+            layout.append(self.time_dimension)
+        return hashlib.sha256(json.dumps(layout, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def presence_names(self):
+        """Return the field or field.subfield name of every presence bit, in bit order."""
+        names = {}
+        for field_name, (count_slot, _) in self.field_slots.items():
+            names[self.presence_bits[count_slot]] = field_name
+        for field_name, subfields in self.subfield_slots.items():
+            for subfield, (count_slot, _) in subfields.items():
+                names[self.presence_bits[count_slot]] = f'{field_name}.{subfield}'
+        return [names[1 << bit] for bit in range(len(names))]
+
+    def new_counts(self):
+        """Return zeroed counters for one provider or client."""
+        return SparseCounts(self)
+
+    def finalize(self, counts):
+        """Compute the derived metrics of every row of a counter array at once.
+
+        Only raw counts are accumulated while processing records; missing,
+        completeness and category completeness are derived here, once per
+        entity, when its stats are materialized for output.
+
+        Args:
+            counts (numpy.ndarray): Counter array laid out by this layout
+
+        Returns:
+            tuple: (missing, completeness, categories) where missing and
+                completeness are arrays shaped like counts (meaningful at count
+                slots) and categories maps each field status to a per-row array
+        """
+        totals = counts[:, self.COUNT_SLOT:self.COUNT_SLOT + 1]
+        missing = totals - counts
+        completeness = np.divide(
+            counts, totals, out=np.zeros(counts.shape), where=totals > 0)
+
+        categories = {}
+        for status, slots in self.category_count_slots.items():
+            category_totals = totals[:, 0] * len(slots)
+            categories[status] = np.divide(
+                counts[:, slots].sum(axis=1), category_totals,
+                out=np.zeros(len(counts)), where=category_totals > 0)
+
+        return missing, completeness, categories
+
+    def presence_slots(self, presence):
+        """Decode a record presence mask into the counter slots it sets.
+
+        Records share a small number of distinct presence patterns, so decoded
+        masks are cached.
+
+        Args:
+            presence (int): Presence mask built from presence_bits
+
+        Returns:
+            numpy.ndarray: DOI count slot followed by the field/subfield count slots
+        """
+        slots = self._presence_cache.get(presence)
+        if slots is None:
+            if len(self._presence_cache) >= 65536:
+                self._presence_cache.clear()
+            slots = np.array(
+                [self.COUNT_SLOT] + [slot for slot, bit in self.presence_bits.items() if presence & bit],
+                dtype=np.intp)
+            self._presence_cache[presence] = slots
+        return slots
+
+    def resource_type_row(self, record):
+        """Return the counter row for the record's resourceTypeGeneral, if tracked."""
+        resource_type = record.get('resourceType')
+        if isinstance(resource_type, dict):
+            resource_type = resource_type.get('resourceTypeGeneral')
+        if not isinstance(resource_type, str):
+            return None
+        return self.resource_type_rows.get(resource_type)
+
+    def time_row(self, record):
+        """Return the counter row for the record's time bucket, if a time dimension is set.
+
+        publicationYear is bucketed by year, the registered and created dates
+        by month.
+        """
+        if self.time_dimension is None:
+            return None
+        value = record.get(self.time_dimension)
+        if self.time_dimension == 'publicationYear':
+            try:
+                bucket = int(value)
+            except (TypeError, ValueError):
+                return None
+            return self.num_rows + bucket if 0 <= bucket <= 9999 else None
+
+        if not isinstance(value, str) or value[4:5] != '-':
+            return None
+        try:
+            year, month = int(value[:4]), int(value[5:7])
+        except ValueError:
+            return None
+        return self.num_rows + year * 12 + month - 1 if 1 <= month <= 12 else None
+
+    def time_label(self, row):
+        """Return the label ('YYYY' or 'YYYY-MM') of a time bucket row."""
+        bucket = row - self.num_rows
+        if self.time_dimension == 'publicationYear':
+            return f'{bucket:04d}'
+        year, month = divmod(bucket, 12)
+        return f'{year:04d}-{month + 1:02d}'
+
+
+class SparseCounts:
+    """Counters of one provider or client, allocating resource type and time rows on first use.
+
+    Only the summary row is allocated up front. Most entities have records
+    of a few resource types (and time buckets), so allocating every row of
+    the layout for each of the thousands of providers and clients mostly
+    holds zeros. Rows are allocated from a buffer that grows geometrically.
+
+    Attributes:
+        rows (list): Layout row of each allocated row, in allocation order
+        data (numpy.ndarray): Counters of the allocated rows (a view of the buffer)
+    """
+
+    __slots__ = ('layout', 'rows', 'data', '_buffer', '_row_index', '_targets')
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.rows = [layout.SUMMARY_ROW]
+        self._buffer = np.zeros((1, layout.num_slots), dtype=np.int64)
+        self.data = self._buffer[:1]
+        self._row_index = {layout.SUMMARY_ROW: 0}
+        self._targets = {}
+
+    def row_index(self, row):
+        """Return the index of a layout row in data, allocating the row if needed."""
+        index = self._row_index.get(row)
+        if index is None:
+            index = self._row_index[row] = len(self.rows)
+            self.rows.append(row)
+            if index == len(self._buffer):
+                buffer = np.zeros((2 * len(self._buffer), self.layout.num_slots), dtype=np.int64)
+                buffer[:index] = self._buffer
+                self._buffer = buffer
+            self.data = self._buffer[:index + 1]
+        return index
+
+    def add(self, resource_type_row, slots, amounts, time_row=None):
+        """Add amounts at slots of the summary row, a resource type row and a time row.
+
+        Args:
+            resource_type_row (int): Layout row of the resource type, or None
+            slots (numpy.ndarray): Counter slots
+            amounts (numpy.ndarray): Increment for each entry of slots
+            time_row (int, optional): Layout row of the time bucket
+        """
+        key = (resource_type_row, time_row)
+        targets = self._targets.get(key)
+        if targets is None:
+            targets = [[0]] + [[self.row_index(row)] for row in key if row]
+            targets = self._targets[key] = np.array(targets)
+        self.data[targets, slots] += amounts
+
+    def add_flat(self, positions, values):
+        """Add counters addressed by their position in the flattened layout array.
+
+        Args:
+            positions (numpy.ndarray): Distinct row * num_slots + slot positions
+            values (numpy.ndarray): Value to add at each position
+        """
+        rows, slots = np.divmod(positions, self.layout.num_slots)
+        unique_rows, inverse = np.unique(rows, return_inverse=True)
+        indexes = np.array([self.row_index(row) for row in unique_rows.tolist()], dtype=np.intp)
+        self.data[indexes[inverse], slots] += values
+
+    def __iadd__(self, other):
+        indexes = [self.row_index(row) for row in other.rows]
+        self.data[indexes] += other.data
+        return self
+
+    @property
+    def record_count(self):
+        return int(self.data[0, self.layout.COUNT_SLOT])
+
+    def flat_nonzero(self):
+        """Return the nonzero counters addressed by position in the flattened layout array.
+
+        Returns:
+            tuple: (positions, values), ordered by position
+        """
+        indexes, slots = np.nonzero(self.data)
+        positions = np.array(self.rows, dtype=np.int64)[indexes] * self.layout.num_slots + slots
+        order = np.argsort(positions, kind='stable')
+        return positions[order], self.data[indexes, slots][order]
+
+
+class StatsSkeleton:
+    """Nested stats structure compiled once from the StatsContainer field definitions.
+
+    The field, subfield and value definitions are flattened into a plan of
+    counter slots when the skeleton is built, so stats are stamped out by
+    walking that plan instead of rebuilding the template from FIELD_STATUS
+    and SUBFIELD_STATS for every provider and client. Sections for
+    resourceTypeGeneral values are only materialized for resource types
+    that have records.
+    """
+
+    CATEGORIES = ('mandatory', 'recommended', 'optional')
+
+    def __init__(self, layout, field_status):
+        """Compile the skeleton.
+
+        Args:
+            layout (StatsLayout): Counter layout of the stats
+            field_status (dict): Field name -> status (mandatory/recommended/optional)
+        """
+        self.layout = layout
+        self.fields = []  # (field_name, status, count_slot, instances_slot, subfields)
+        for field_name, status in field_status.items():
+            subfields = None
+            if field_name in layout.subfield_slots:
+                value_slots = layout.value_slots[field_name]
+                subfields = tuple(
+                    (subfield, count_slot, instances_slot,
+                     tuple(value_slots[subfield].items()) if subfield in value_slots else None)
+                    for subfield, (count_slot, instances_slot) in layout.subfield_slots[field_name].items()
+                )
+            self.fields.append((field_name, status, *layout.field_slots[field_name], subfields))
+        self.count_slots = sorted(layout.presence_bits)  # slots with a completeness value
+
+    def section(self, counts, missing, completeness, categories, clean=False):
+        """Build the stats section of one counter row.
+
+        Args:
+            counts (list): Counter row
+            missing (list): Missing counts of the row
+            completeness (list): Completeness of the row
+            categories (dict): Field status -> category completeness of the row
+            clean (bool): Leave out zero value counts
+
+        Returns:
+            dict: Section with count, fields and categories
+        """
+        fields = {}
+        for field_name, status, count_slot, instances_slot, subfields in self.fields:
+            field_stats = {
+                'count': counts[count_slot],
+                'instances': counts[instances_slot],
+                'missing': missing[count_slot],
+                'fieldStatus': status,
+                'completeness': completeness[count_slot]
+            }
+            if subfields is not None:
+                field_stats['subfields'] = subfield_stats = {}
+                for subfield, sub_count_slot, sub_instances_slot, values in subfields:
+                    subfield_stats[subfield] = {
+                        'count': counts[sub_count_slot],
+                        'instances': counts[sub_instances_slot],
+                        'missing': missing[sub_count_slot],
+                        'completeness': completeness[sub_count_slot]
                     }
+                    if values is not None:
+                        subfield_stats[subfield]['values'] = {
+                            value: counts[slot] for value, slot in values
+                            if not clean or counts[slot] > 0
+                        }
+            fields[field_name] = field_stats
 
-                    if values.get('scheme'):
-                        scheme_field = f'{subfield}Scheme'
-                        if scheme_field in subfields:
-                            base_stats['values'] = {
-                                val: 0 for val in subfields[scheme_field]}
+        return {
+            'count': counts[self.layout.COUNT_SLOT],
+            'fields': fields,
+            'categories': {status: {'completeness': categories[status]} for status in self.CATEGORIES}
+        }
 
-                    stats['subfields'][subfield] = base_stats
+    def stats(self, counts, clean=False):
+        """Build the nested stats of the counters of an entity.
 
-        return stats
+        Args:
+            counts (SparseCounts): Counters laid out by self.layout
+            clean (bool): Round completeness values to 4 places and leave out
+                zero value counts
+
+        Returns:
+            dict: Summary and byResourceType stats, the latter holding only
+                resource types with records, and with a time dimension byTime
+                stats for every time bucket with records
+        """
+        layout = self.layout
+        row_counts = counts.data[:, layout.COUNT_SLOT].tolist()
+        indexes = sorted(
+            (index for index, row in enumerate(counts.rows)
+             if row == layout.SUMMARY_ROW or row_counts[index] > 0),
+            key=counts.rows.__getitem__
+        )
+        rows = [counts.rows[index] for index in indexes]
+        counts = counts.data[indexes]
+        missing, completeness, categories = layout.finalize(counts)
+        counts_rows = counts.tolist()
+        missing_rows = missing.tolist()
+        completeness_rows = completeness.tolist()
+        category_rows = {status: values.tolist() for status, values in categories.items()}
+
+        sections = []
+        for index in range(len(rows)):
+            row_completeness = completeness_rows[index]
+            row_categories = {status: values[index] for status, values in category_rows.items()}
+            if clean:
+                for slot in self.count_slots:
+                    row_completeness[slot] = round(row_completeness[slot], 4)
+                row_categories = {status: round(value, 4) for status, value in row_categories.items()}
+            sections.append(self.section(
+                counts_rows[index], missing_rows[index], row_completeness, row_categories, clean))
 
-    @classmethod
-    def create_empty_stats(cls):
         stats = {
-            'stats': {
-                'summary': {
-                    'count': 0,
-                    'fields': {},
-                    'categories': {
-                        'mandatory': {'completeness': 0.0},
-                        'recommended': {'completeness': 0.0},
-                        'optional': {'completeness': 0.0}
-                    }
-                },
-                'byResourceType': {
-                    'resourceTypes': {}
+            'summary': sections[0],
+            'byResourceType': {
+                'resourceTypes': {
+                    layout.resource_types[row - 1]: section
+                    for row, section in zip(rows[1:], sections[1:])
+                    if row < layout.num_rows
                 }
             }
         }
-
-        for field_name, field_status in cls.FIELD_STATUS.items():
-            stats['stats']['summary']['fields'][field_name] = \
-                cls.create_empty_field_stats(field_name, field_status)
-
-        resource_types = list(
-            cls.SUBFIELD_STATS['resourceType']['resourceTypeGeneral'])
-        for resource_type in resource_types:
-            stats['stats']['byResourceType']['resourceTypes'][resource_type] = {
-                'count': 0,
-                'categories': {
-                    'mandatory': {'completeness': 0.0},
-                    'recommended': {'completeness': 0.0},
-                    'optional': {'completeness': 0.0}
-                },
-                'fields': {}
+        if layout.time_dimension:
+            stats['byTime'] = {
+                'dimension': layout.time_dimension,
+                'buckets': {
+                    layout.time_label(row): section
+                    for row, section in zip(rows[1:], sections[1:])
+                    if row >= layout.num_rows
+                }
             }
+        return stats
 
-            for field_name, field_status in cls.FIELD_STATUS.items():
-                stats['stats']['byResourceType']['resourceTypes'][resource_type]['fields'][field_name] = \
-                    cls.create_empty_field_stats(field_name, field_status)
 
-        return stats
+class RecordFeatures:
+    """Counter contributions of a single record.
+
+    Features are extracted once per record and then added to the client,
+    provider and resource type rows they belong to by vector addition.
+
+    Attributes:
+        presence (int): Bitmask of the field/subfield count slots the record sets
+        increments (tuple): (slot, amount) pairs for instances and value counters
+        resource_type_row (int): Counter row of the record's resourceTypeGeneral,
+            or None if it is not tracked
+        time_row (int): Counter row of the record's time bucket, or None
+        slots (numpy.ndarray): All counter slots touched by the record
+        amounts (numpy.ndarray): Increment for each entry of slots
+    """
 
-    def remove_zero_count_resource_types_and_clean(self, stats_obj=None):
-        """Remove resource types with zero counts and clean up the stats structure.
+    __slots__ = ('presence', 'increments', 'resource_type_row', 'time_row', 'slots', 'amounts')
+
+    def __init__(self, presence, increments, resource_type_row, layout, time_row=None):
+        self.presence = presence
+        self.increments = increments
+        self.resource_type_row = resource_type_row
+        self.time_row = time_row
+        self.slots = np.concatenate((
+            layout.presence_slots(presence),
+            np.fromiter((slot for slot, _ in increments), dtype=np.intp, count=len(increments))
+        ))
+        self.amounts = np.concatenate((
+            np.ones(len(self.slots) - len(increments), dtype=np.int64),
+            np.fromiter((amount for _, amount in increments), dtype=np.int64, count=len(increments))
+        ))
+
+
+class CountsPayload:
+    """Compact, picklable form of per-entity counters.
+
+    Only nonzero counters are kept. Most resource type rows and vocabulary
+    slots of a provider or client are zero, so the sparse entries are much
+    smaller to send between processes than the dense arrays.
+    """
+
+    __slots__ = ('ids', 'entity_index', 'positions', 'values')
+
+    def __init__(self, ids, entity_index, positions, values):
+        self.ids = list(ids)
+        self.entity_index = entity_index
+        self.positions = positions
+        self.values = values
+
+    @classmethod
+    def pack(cls, counts_by_id):
+        """Pack entity counters.
 
         Args:
-            stats_obj (dict, optional): Stats object to clean. If None, cleans internal stats.
+            counts_by_id (dict): Entity ID -> SparseCounts
 
         Returns:
-            dict: Cleaned stats object if stats_obj was provided, None otherwise
+            CountsPayload: Payload holding the nonzero counters
         """
-        target_stats = stats_obj if stats_obj is not None else self.stats['stats']
+        ids = list(counts_by_id)
+        packed = [counts_by_id[entity_id].flat_nonzero() for entity_id in ids]
+        entity_index = np.repeat(np.arange(len(ids), dtype=np.int32),
+                                 [len(positions) for positions, _ in packed])
+        positions = np.concatenate([positions for positions, _ in packed] + [np.zeros(0, dtype=np.int64)])
+        values = np.concatenate([values for _, values in packed] + [np.zeros(0, dtype=np.int64)])
+        return cls(ids, entity_index, positions.astype(np.int32), values)
 
-        if 'byResourceType' in target_stats and 'resourceTypes' in target_stats['byResourceType']:
-            target_stats['byResourceType']['resourceTypes'] = {
-                rt: data for rt, data in target_stats['byResourceType']['resourceTypes'].items()
-                if data['count'] > 0
-            }
-
-        def clean_subfields(fields_dict):
-            for field_data in fields_dict.values():
-                if 'subfields' in field_data:
-                    for subfield_data in field_data['subfields'].values():
-                        if 'values' in subfield_data:
-                            subfield_data['values'] = {
-                                value: count for value, count in subfield_data['values'].items()
-                                if count > 0
-                            }
+    @classmethod
+    def combine(cls, payloads):
+        """Sum several payloads into one.
 
-        if 'summary' in target_stats and 'fields' in target_stats['summary']:
-            clean_subfields(target_stats['summary']['fields'])
+        Args:
+            payloads (list): CountsPayload objects built with the same layout
 
-        for rt_data in target_stats['byResourceType']['resourceTypes'].values():
-            if 'fields' in rt_data:
-                clean_subfields(rt_data['fields'])
+        Returns:
+            CountsPayload: Payload holding the summed counters
+        """
+        ids = list(dict.fromkeys(chain.from_iterable(payload.ids for payload in payloads)))
+        id_index = {entity_id: index for index, entity_id in enumerate(ids)}
+        entity_index = np.concatenate([
+            np.array([id_index[entity_id] for entity_id in payload.ids], dtype=np.int64)[payload.entity_index]
+            for payload in payloads
+        ] + [np.zeros(0, dtype=np.int64)])
+        positions = np.concatenate([payload.positions for payload in payloads] + [np.zeros(0, dtype=np.int32)])
+        values = np.concatenate([payload.values for payload in payloads] + [np.zeros(0, dtype=np.int64)])
+
+        keys, inverse = np.unique((entity_index << 32) | positions, return_inverse=True)
+        summed = np.zeros(len(keys), dtype=np.int64)
+        np.add.at(summed, inverse, values)
+        return cls(ids, (keys >> 32).astype(np.int32), (keys & 0xFFFFFFFF).astype(np.int32), summed)
+
+    def to_arrays(self, prefix):
+        """Return the payload as named arrays, e.g. for numpy.savez."""
+        return {
+            f'{prefix}_ids': np.array(self.ids, dtype=str),
+            f'{prefix}_entity_index': self.entity_index,
+            f'{prefix}_positions': self.positions,
+            f'{prefix}_values': self.values
+        }
 
-        self._round_completeness_values(target_stats)
+    @classmethod
+    def from_arrays(cls, arrays, prefix):
+        return cls(
+            arrays[f'{prefix}_ids'].tolist(),
+            arrays[f'{prefix}_entity_index'],
+            arrays[f'{prefix}_positions'],
+            arrays[f'{prefix}_values']
+        )
 
-        return stats_obj if stats_obj is not None else None
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.entity_index.nbytes + self.positions.nbytes
 
-    def _round_completeness_values(self, stats_obj):
-        if isinstance(stats_obj, dict):
-            for key, value in stats_obj.items():
-                if key == 'completeness' and isinstance(value, float):
-                    stats_obj[key] = round(value, 4)
-                elif isinstance(value, (dict, list)):
-                    self._round_completeness_values(value)
-        elif isinstance(stats_obj, list):
-            for item in stats_obj:
-                if isinstance(item, (dict, list)):
-                    self._round_completeness_values(item)
+    def items(self):
+        """Yield (entity_id, positions, values) for every packed entity.
 
-    def get_stats(self):
-        return self.stats
+        Positions index into the flattened (rows x slots) layout array of the entity.
+        """
+        bounds = np.searchsorted(self.entity_index, np.arange(len(self.ids) + 1))
+        for index, entity_id in enumerate(self.ids):
+            start, end = bounds[index], bounds[index + 1]
+            yield entity_id, self.positions[start:end], self.values[start:end]
 
 
 class StatsUpdater:
-    """Class for updating and merging stats."""
+    """Class for updating stats counters."""
 
     def __init__(self, container):
         self.container = container
+        self.layout = container.layout
+
+    @staticmethod
+    def _add(increments, slot, amount=1):
+        increments[slot] = increments.get(slot, 0) + amount
 
-    def update_subfield_stats(self, field_value, field_name, stats, stat_key='all'):
-        """Update subfield statistics for a given field value.
+    def update_subfield_stats(self, field_value, field_name, increments):
+        """Collect subfield counters for a given field value.
+
+        Subfields are marked present once per record, instances and values
+        are counted once per occurrence.
 
         Args:
             field_value: The value of the field to analyze
             field_name: Name of the field being analyzed
-            stats: Statistics object to update
-            stat_key: Key for specific stats section ('all' or resource type)
+            increments (dict): Slot -> increment mapping for the current record
+
+        Returns:
+            int: Presence bits of the subfields found in the value
         """
         if not field_value or field_name not in self.container.SUBFIELD_STATS:
-            return
+            return 0
 
-        field_stats = stats['stats']['summary']['fields'][field_name] if stat_key == 'all' else stats[
-            'stats']['byResourceType']['resourceTypes'][stat_key]['fields'][field_name]
         field_config = self.container.SUBFIELD_STATS[field_name]
-        total_dois = stats['stats']['summary']['count'] if stat_key == 'all' else stats[
-            'stats']['byResourceType']['resourceTypes'][stat_key]['count']
+        instances_slot = self.layout.field_slots[field_name][1]
+        subfield_slots = self.layout.subfield_slots[field_name]
+        value_slots = self.layout.value_slots[field_name]
+        presence_bits = self.layout.presence_bits
+        presence = 0
+
+        def add_subfield(subfield, amount=1, value=None):
+            nonlocal presence
+            count_slot, subfield_instances_slot = subfield_slots[subfield]
+            presence |= presence_bits[count_slot]
+            self._add(increments, subfield_instances_slot, amount)
+            if value is not None and subfield in value_slots:
+                value_slot = value_slots[subfield].get(value)
+                if value_slot is not None:
+                    self._add(increments, value_slot)
 
         if isinstance(field_value, list):
-            field_stats['instances'] += len(field_value)
-            seen_subfields = set()
+            self._add(increments, instances_slot, len(field_value))
 
             for item in field_value:
+                if not isinstance(item, dict):
+                    continue
+
                 for subfield, expected_values in field_config.items():
                     if subfield == 'multiple':
                         continue
@@ -397,373 +1107,133 @@ class StatsUpdater:
                     if field_name == 'fundingReferences':
                         value = item.get(subfield)
                         if value:
-                            if subfield not in seen_subfields:
-                                field_stats['subfields'][subfield]['count'] += 1
-                                seen_subfields.add(subfield)
-                            field_stats['subfields'][subfield]['instances'] += 1
-                            if isinstance(expected_values, set):
-                                if value not in expected_values:
-                                    value = 'Other'
-                                field_stats['subfields'][subfield]['values'][value] += 1
+                            if isinstance(expected_values, set) and value not in expected_values:
+                                value = 'Other'
+                            add_subfield(subfield, value=value)
 
                     elif subfield == 'nameType':
                         value = item.get('nameType', '')
                         if value:
-                            if subfield not in seen_subfields:
-                                field_stats['subfields'][subfield]['count'] += 1
-                                seen_subfields.add(subfield)
-                            field_stats['subfields'][subfield]['instances'] += 1
-                            field_stats['subfields'][subfield]['values'][value] += 1
+                            add_subfield(subfield, value=value)
 
                     elif subfield == 'nameIdentifier':
                         identifiers = item.get('nameIdentifiers', [])
                         if identifiers:
                             identifiers = identifiers if isinstance(
                                 identifiers, list) else [identifiers]
-                            if subfield not in seen_subfields:
-                                field_stats['subfields'][subfield]['count'] += 1
-                                seen_subfields.add(subfield)
-                            field_stats['subfields'][subfield]['instances'] += len(
-                                identifiers)
+                            add_subfield(subfield, len(identifiers))
 
                             for identifier in identifiers:
                                 scheme = identifier.get('nameIdentifierScheme')
                                 if scheme and scheme in field_config['nameIdentifierScheme']:
-                                    if 'nameIdentifierScheme' not in seen_subfields:
-                                        field_stats['subfields']['nameIdentifierScheme']['count'] += 1
-                                        seen_subfields.add(
-                                            'nameIdentifierScheme')
-                                    field_stats['subfields']['nameIdentifierScheme']['instances'] += 1
-                                    field_stats['subfields']['nameIdentifierScheme']['values'][scheme] += 1
+                                    add_subfield('nameIdentifierScheme', value=scheme)
 
                     elif subfield == 'affiliation':
                         affiliations = item.get('affiliation', [])
                         if affiliations:
                             affiliations = affiliations if isinstance(
                                 affiliations, list) else [affiliations]
-                            if subfield not in seen_subfields:
-                                field_stats['subfields'][subfield]['count'] += 1
-                                seen_subfields.add(subfield)
-                            field_stats['subfields'][subfield]['instances'] += len(
-                                affiliations)
+                            add_subfield(subfield, len(affiliations))
 
                             for affiliation in affiliations:
                                 if isinstance(affiliation, dict):
                                     identifier = affiliation.get(
                                         'affiliationIdentifier')
                                     if identifier:
-                                        if 'affiliationIdentifier' not in seen_subfields:
-                                            field_stats['subfields']['affiliationIdentifier']['count'] += 1
-                                            seen_subfields.add(
-                                                'affiliationIdentifier')
-                                        field_stats['subfields']['affiliationIdentifier']['instances'] += 1
+                                        add_subfield('affiliationIdentifier')
 
                                         scheme = affiliation.get(
                                             'affiliationIdentifierScheme')
                                         if scheme and scheme in field_config['affiliationIdentifierScheme']:
-                                            if 'affiliationIdentifierScheme' not in seen_subfields:
-                                                field_stats['subfields']['affiliationIdentifierScheme']['count'] += 1
-                                                seen_subfields.add(
-                                                    'affiliationIdentifierScheme')
-                                            field_stats['subfields']['affiliationIdentifierScheme']['instances'] += 1
-                                            field_stats['subfields']['affiliationIdentifierScheme']['values'][scheme] += 1
+                                            add_subfield(
+                                                'affiliationIdentifierScheme', value=scheme)
 
                     elif subfield in ['contributorType', 'relationType', 'relatedIdentifierType', 'resourceTypeGeneral']:
                         value = item.get(subfield)
                         if value and value in expected_values:
-                            if subfield not in seen_subfields:
-                                field_stats['subfields'][subfield]['count'] += 1
-                                seen_subfields.add(subfield)
-                            field_stats['subfields'][subfield]['instances'] += 1
-                            field_stats['subfields'][subfield]['values'][value] += 1
-
-            for subfield in field_config:
-                if subfield != 'multiple' and subfield in field_stats['subfields']:
-                    subfield_stats = field_stats['subfields'][subfield]
-                    subfield_stats['missing'] = total_dois - \
-                        subfield_stats['count']
-                    subfield_stats['completeness'] = subfield_stats['count'] / \
-                        total_dois if total_dois > 0 else 0.0
+                            add_subfield(subfield, value=value)
 
-        else:
+        elif isinstance(field_value, dict):
             # Skip processing if this is a fundingReferences field since it should only be processed as a list
             if field_name == 'fundingReferences':
-                return
+                return presence
 
-            field_stats['instances'] += 1
+            self._add(increments, instances_slot)
             for subfield, expected_values in field_config.items():
                 if subfield == 'multiple':
                     continue
 
                 value = field_value.get(subfield)
                 if value and (isinstance(expected_values, dict) or value in expected_values):
-                    if subfield not in field_stats['subfields']:
-                        continue
-
-                    field_stats['subfields'][subfield]['count'] += 1
-                    field_stats['subfields'][subfield]['instances'] += 1
-                    if 'values' in field_stats['subfields'][subfield]:
-                        field_stats['subfields'][subfield]['values'][value] += 1
-                    field_stats['subfields'][subfield]['missing'] = total_dois - \
-                        field_stats['subfields'][subfield]['count']
-                    field_stats['subfields'][subfield]['completeness'] = field_stats['subfields'][subfield]['count'] / \
-                        total_dois if total_dois > 0 else 0.0
-
-    def update_stats_single_record(self, stats_obj, record):
-        stats_obj['stats']['summary']['count'] += 1
-        total_dois = stats_obj['stats']['summary']['count']
-
-        def update_field_stats(field_value, field_stats, field_name):
-            """Helper function to update stats for a single field"""
-            if not field_value:
-                return
-
-            has_subfields = field_name in self.container.SUBFIELD_STATS
-
-            if isinstance(field_value, (list, tuple)):
-                if field_value:
-                    field_stats['count'] += 1
-                    if not has_subfields:
-                        field_stats['instances'] += len(field_value)
-            elif isinstance(field_value, dict):
-                if field_value:
-                    field_stats['count'] += 1
-                    if not has_subfields:
-                        field_stats['instances'] += 1
-            else:
-                if field_value not in (None, ''):
-                    field_stats['count'] += 1
-                    if not has_subfields:
-                        field_stats['instances'] += 1
-
-        for field_name, field_status in self.container.FIELD_STATUS.items():
-            field_value = record.get(field_name)
-            field_stats = stats_obj['stats']['summary']['fields'][field_name]
-
-            update_field_stats(field_value, field_stats, field_name)
-
-            if field_name in self.container.SUBFIELD_STATS and field_value:
-                self.update_subfield_stats(
-                    field_value, field_name, stats_obj, 'all')
-
-            field_stats['missing'] = total_dois - field_stats['count']
-            field_stats['completeness'] = field_stats['count'] / \
-                total_dois if total_dois > 0 else 0.0
-
-        stats_obj['stats']['summary']['categories'] = self.calculate_category_metrics(
-            stats_obj['stats']['summary']['fields'],
-            total_dois
-        )
-
-        resource_type = None
-        if record.get('resourceType'):
-            if isinstance(record['resourceType'], dict):
-                resource_type = record['resourceType'].get(
-                    'resourceTypeGeneral')
-            elif isinstance(record['resourceType'], str):
-                resource_type = record['resourceType']
+                    add_subfield(subfield, value=value)
 
-        if resource_type and resource_type in stats_obj['stats']['byResourceType']['resourceTypes']:
-            type_stats = stats_obj['stats']['byResourceType']['resourceTypes'][resource_type]
-            type_stats['count'] += 1
-            total_type_dois = type_stats['count']
+        return presence
 
-            for field_name in self.container.FIELD_STATUS:
-                field_value = record.get(field_name)
-                field_stats = type_stats['fields'][field_name]
-
-                update_field_stats(field_value, field_stats, field_name)
-
-                if field_name in self.container.SUBFIELD_STATS and field_value:
-                    self.update_subfield_stats(
-                        field_value, field_name, stats_obj, resource_type)
-
-                field_stats['missing'] = total_type_dois - field_stats['count']
-                field_stats['completeness'] = field_stats['count'] / \
-                    total_type_dois if total_type_dois > 0 else 0.0
-
-            type_stats['categories'] = self.calculate_category_metrics(
-                type_stats['fields'],
-                total_type_dois
-            )
-
-    def calculate_category_metrics(self, fields, total_dois):
-        """Calculate metrics for each category (mandatory/recommended/optional).
+    def extract_features(self, record):
+        """Extract the counter contributions of a normalized record.
 
         Args:
-            fields (dict): Fields to calculate metrics for
-            total_dois (int): Total number of DOIs
+            record (dict): Normalized record from FileProcessor.get_fields
 
         Returns:
-            dict: Category metrics
+            RecordFeatures: Features to add to every aggregation the record belongs to
         """
-        categories = {
-            'mandatory': {'count': 0, 'total': 0, 'num_fields': 0},
-            'recommended': {'count': 0, 'total': 0, 'num_fields': 0},
-            'optional': {'count': 0, 'total': 0, 'num_fields': 0}
-        }
-
-        for field_name, field_stats in fields.items():
-            status = field_stats['fieldStatus']
-            if status in categories:
-                categories[status]['num_fields'] += 1
-                categories[status]['count'] += field_stats['count']
-
-        for status in categories:
-            if categories[status]['num_fields'] > 0:
-                categories[status]['total'] = total_dois * \
-                    categories[status]['num_fields']
-
-        return {
-            'mandatory': {
-                'completeness': categories['mandatory']['count'] / categories['mandatory']['total']
-                if categories['mandatory']['total'] > 0 else 0.0
-            },
-            'recommended': {
-                'completeness': categories['recommended']['count'] / categories['recommended']['total']
-                if categories['recommended']['total'] > 0 else 0.0
-            },
-            'optional': {
-                'completeness': categories['optional']['count'] / categories['optional']['total']
-                if categories['optional']['total'] > 0 else 0.0
-            }
-        }
-
-    def merge_fields(self, fields1, fields2):
-        """Merge field statistics with updated metrics.
-
-        Args:
-            fields1: First fields dictionary containing field statistics
-            fields2: Second fields dictionary containing field statistics
+        presence_bits = self.layout.presence_bits
+        presence = 0
+        increments = {}
 
-        Returns:
-            dict: Merged field statistics
-        """
-        if not fields1:
-            return fields2
-        if not fields2:
-            return fields1
+        for field_name in self.container.FIELD_STATUS:
+            field_value = record.get(field_name)
+            if not field_value:
+                continue
 
-        merged = {}
-        all_fields = set(fields1.keys()) | set(fields2.keys())
+            count_slot, instances_slot = self.layout.field_slots[field_name]
+            presence |= presence_bits[count_slot]
 
-        total_dois = max(
-            (field_stats1.get('count', 0) + field_stats1.get('missing', 0) +
-             field_stats2.get('count', 0) + field_stats2.get('missing', 0))
-            for field_stats1, field_stats2 in ((fields1.get(field, {}), fields2.get(field, {}))
-                                               for field in all_fields)
+            if field_name in self.container.SUBFIELD_STATS:
+                presence |= self.update_subfield_stats(field_value, field_name, increments)
+            elif isinstance(field_value, (list, tuple)):
+                self._add(increments, instances_slot, len(field_value))
+            else:
+                self._add(increments, instances_slot)
+
+        return RecordFeatures(
+            presence,
+            tuple(increments.items()),
+            self.layout.resource_type_row(record),
+            self.layout,
+            self.layout.time_row(record)
         )
 
-        for field in all_fields:
-            field_stats1 = fields1.get(field, {'count': 0, 'instances': 0})
-            field_stats2 = fields2.get(field, {'count': 0, 'instances': 0})
-
-            count = field_stats1.get('count', 0) + field_stats2.get('count', 0)
-
-            merged[field] = {
-                'count': count,
-                'instances': field_stats1.get('instances', 0) + field_stats2.get('instances', 0),
-                'missing': total_dois - count,
-                'fieldStatus': field_stats1.get('fieldStatus', field_stats2.get('fieldStatus')),
-                'completeness': count / total_dois if total_dois > 0 else 0.0
-            }
-
-            if ('subfields' in field_stats1 or 'subfields' in field_stats2):
-                subfields1 = field_stats1.get('subfields', {})
-                subfields2 = field_stats2.get('subfields', {})
-                merged[field]['subfields'] = {}
-
-                all_subfields = set(subfields1.keys()) | set(subfields2.keys())
-
-                for subfield in all_subfields:
-                    subfield_stats1 = subfields1.get(
-                        subfield, {'count': 0, 'instances': 0})
-                    subfield_stats2 = subfields2.get(
-                        subfield, {'count': 0, 'instances': 0})
-
-                    subfield_count = subfield_stats1.get(
-                        'count', 0) + subfield_stats2.get('count', 0)
-                    merged[field]['subfields'][subfield] = {
-                        'count': subfield_count,
-                        'instances': subfield_stats1.get('instances', 0) + subfield_stats2.get('instances', 0),
-                        'missing': total_dois - subfield_count,
-                        'completeness': subfield_count / total_dois if total_dois > 0 else 0.0
-                    }
-
-                    if 'values' in subfield_stats1 or 'values' in subfield_stats2:
-                        merged[field]['subfields'][subfield]['values'] = {}
-                        values1 = subfield_stats1.get('values', {})
-                        values2 = subfield_stats2.get('values', {})
-                        all_values = set(values1.keys()) | set(values2.keys())
+    def add_features(self, counts, features):
+        """Add extracted record features to the counters of an entity.
 
-                        for value in all_values:
-                            merged[field]['subfields'][subfield]['values'][value] = \
-                                values1.get(value, 0) + values2.get(value, 0)
+        The record is counted in the summary row and, when its
+        resourceTypeGeneral is tracked, in the matching resource type row.
 
-        return merged
+        Args:
+            counts (SparseCounts): Counters laid out by the container layout
+            features (RecordFeatures): Features from extract_features
+        """
+        counts.add(features.resource_type_row, features.slots, features.amounts, features.time_row)
 
-    def merge_stats(self, stats1, stats2):
-        """Merge statistics with new structure.
+    @staticmethod
+    def merge_counts(target, source):
+        """Merge per-entity counters of source into target.
 
         Args:
-            stats1: First statistics dictionary
-            stats2: Second statistics dictionary
+            target (dict): Entity ID -> SparseCounts, updated in place
+            source (dict): Entity ID -> SparseCounts
 
         Returns:
-            dict: Merged statistics
-        """
-        if not stats1:
-            return stats2
-        if not stats2:
-            return stats1
-
-        merged = {
-            'stats': {
-                'summary': {
-                    'count': stats1['stats']['summary']['count'] + stats2['stats']['summary']['count'],
-                    'fields': self.merge_fields(
-                        stats1['stats']['summary']['fields'],
-                        stats2['stats']['summary']['fields']
-                    ),
-                    'categories': {}
-                },
-                'byResourceType': {
-                    'resourceTypes': {}
-                }
-            }
-        }
-
-        all_resource_types = set(stats1['stats']['byResourceType']['resourceTypes'].keys()) | \
-            set(stats2['stats']['byResourceType']['resourceTypes'].keys())
-
-        for resource_type in all_resource_types:
-            type_stats1 = stats1['stats']['byResourceType']['resourceTypes'].get(
-                resource_type, {})
-            type_stats2 = stats2['stats']['byResourceType']['resourceTypes'].get(
-                resource_type, {})
-
-            merged['stats']['byResourceType']['resourceTypes'][resource_type] = {
-                'count': type_stats1.get('count', 0) + type_stats2.get('count', 0),
-                'fields': self.merge_fields(
-                    type_stats1.get('fields', {}),
-                    type_stats2.get('fields', {})
-                ),
-                'categories': {}
-            }
-
-            total_dois = merged['stats']['byResourceType']['resourceTypes'][resource_type]['count']
-            merged['stats']['byResourceType']['resourceTypes'][resource_type]['categories'] = \
-                self.calculate_category_metrics(
-                    merged['stats']['byResourceType']['resourceTypes'][resource_type]['fields'],
-                    total_dois
-            )
-
-        merged['stats']['summary']['categories'] = self.calculate_category_metrics(
-            merged['stats']['summary']['fields'],
-            merged['stats']['summary']['count']
-        )
-
-        return merged
+            dict: The updated target
+        """
+        for entity_id, counts in source.items():
+            if entity_id in target:
+                target[entity_id] += counts
+            else:
+                target[entity_id] = counts
+        return target
 
 
 class ProviderClientManager:
@@ -773,27 +1243,27 @@ class ProviderClientManager:
         self.stats_container = stats_container
         self.providers = {}
         self.clients = {}
-        self.stats_updater = StatsUpdater(self.stats_container)
+        self.prefix_index = PrefixIndex()
 
     def initialize_provider_entry(self, attributes=None):
-        stats = self.stats_container.create_empty_stats()['stats']
         entry = {
             'id': '',
             'type': 'providers',
             'attributes': attributes if attributes else {},
             'relationships': {'clients': []},
-            'stats': stats
+            'counts': self.stats_container.layout.new_counts(),
+            'stats': None
         }
         return entry
 
     def initialize_client_entry(self, attributes=None):
-        stats = self.stats_container.create_empty_stats()['stats']
         entry = {
             'id': '',
             'type': 'clients',
             'attributes': attributes if attributes else {},
             'relationships': {'provider': None},
-            'stats': stats
+            'counts': self.stats_container.layout.new_counts(),
+            'stats': None
         }
         return entry
 
@@ -825,42 +1295,32 @@ class ProviderClientManager:
                         client_id
                     )
 
-    def merge_provider_stats(self, provider_id, stats):
-        if provider_id in self.providers:
-            self.providers[provider_id]['stats'] = self.stats_updater.merge_stats(
-                {'stats': self.providers[provider_id]['stats']},
-                stats
-            )['stats']
+        self.prefix_index = PrefixIndex.from_registry(providers, clients)
+
+    def merge_provider_payload(self, payload):
+        self._merge_payload(self.providers, payload)
 
-    def merge_client_stats(self, client_id, stats):
-        if client_id in self.clients:
-            self.clients[client_id]['stats'] = self.stats_updater.merge_stats(
-                {'stats': self.clients[client_id]['stats']},
-                stats
-            )['stats']
+    def merge_client_payload(self, payload):
+        self._merge_payload(self.clients, payload)
+
+    def _merge_payload(self, entries, payload):
+        for entity_id, positions, values in payload.items():
+            if entity_id in entries:
+                entries[entity_id]['counts'].add_flat(positions, values)
 
     def create_aggregate_entries(self):
         """
         Create a aggregate 'aggregate' provider and 'aggregate.all' client 
         that aggregate all providers/clients stats.
         """
-        all_providers_aggregator = self.stats_container.create_empty_stats()
-        stats_updater = StatsUpdater(self.stats_container)
-        
+        all_providers_aggregator = self.stats_container.layout.new_counts()
         for provider in self.providers.values():
-            # Each provider has {'stats': ...}; so wrap it such that merge_stats expects {'stats': ...}
-            all_providers_aggregator = stats_updater.merge_stats(
-                all_providers_aggregator,
-                {'stats': provider['stats']}
-            )
-        
-        all_clients_aggregator = self.stats_container.create_empty_stats()
+            all_providers_aggregator += provider['counts']
+
+        all_clients_aggregator = self.stats_container.layout.new_counts()
         for client in self.clients.values():
-            all_clients_aggregator = stats_updater.merge_stats(
-                all_clients_aggregator,
-                {'stats': client['stats']}
-            )
-        
+            all_clients_aggregator += client['counts']
+
         aggregate_provider = self.initialize_provider_entry()
         aggregate_provider['id'] = 'aggregate'
         aggregate_provider['type'] = 'providers'
@@ -869,7 +1329,7 @@ class ProviderClientManager:
             'name': 'All DataCite Organizations (All Providers Aggregated)'
         }
         aggregate_provider['relationships']['clients'] = ['aggregate.all']
-        aggregate_provider['stats'] = all_providers_aggregator['stats']
+        aggregate_provider['counts'] = all_providers_aggregator
         
         aggregate_client = self.initialize_client_entry()
         aggregate_client['id'] = 'aggregate.all'
@@ -878,7 +1338,7 @@ class ProviderClientManager:
             'symbol': 'AGGREGATE.ALL',
             'name': 'All DataCite Repositories (All Clients Aggregated)'
         }
-        aggregate_client['stats'] = all_clients_aggregator['stats']
+        aggregate_client['counts'] = all_clients_aggregator
 
         self.providers['aggregate'] = aggregate_provider
         self.clients['aggregate.all'] = aggregate_client
@@ -886,23 +1346,24 @@ class ProviderClientManager:
     def filter_active_only(self):
         self.providers = {
             pid: p for pid, p in self.providers.items()
-            if p['stats']['summary']['count'] > 0
+            if self.get_doi_count(p) > 0
         }
         self.clients = {
             cid: c for cid, c in self.clients.items()
-            if c['stats']['summary']['count'] > 0
+            if self.get_doi_count(c) > 0
         }
 
-    def clean_resource_types(self):
-        for provider in self.providers.values():
-            provider['stats'] = self.stats_container.remove_zero_count_resource_types_and_clean(
-                provider['stats']
-            )
+    def get_doi_count(self, entry):
+        return entry['counts'].record_count
 
-        for client in self.clients.values():
-            client['stats'] = self.stats_container.remove_zero_count_resource_types_and_clean(
-                client['stats']
-            )
+    def finalize_stats(self):
+        """Materialize the final stats of every entry from its counters.
+
+        Derived metrics are computed and zero-count resource types and values
+        removed here, in a single pass just before output is written.
+        """
+        for entry in list(self.providers.values()) + list(self.clients.values()):
+            entry['stats'] = self.stats_container.stats_from_counts(entry.pop('counts'), clean=True)
 
     def get_providers(self):
         return self.providers
@@ -911,6 +1372,220 @@ class ProviderClientManager:
         return self.clients
 
 
+class PrefixIndex:
+    """Maps DOI prefixes to the client and provider they are assigned to.
+
+    Built from the prefixes relationships of the providers and clients
+    returned by the API (requested with include=prefixes). Records without
+    client and provider relationships are attributed by the prefix of their
+    DOI. Prefixes of a client map to (client_id, provider_id); prefixes only
+    known from a provider map to (None, provider_id). Prefixes claimed by
+    more than one client or provider are left out.
+    """
+
+    def __init__(self, prefixes=None):
+        """Initialize the index.
+
+        Args:
+            prefixes (dict, optional): Prefix -> (client_id, provider_id)
+        """
+        self.prefixes = prefixes or {}
+
+    def __len__(self):
+        return len(self.prefixes)
+
+    @staticmethod
+    def related_prefixes(item):
+        relationship = item.get('relationships', {}).get('prefixes', {}).get('data') or []
+        return [prefix['id'].lower() for prefix in relationship if prefix.get('id')]
+
+    @classmethod
+    def from_registry(cls, providers, clients):
+        """Build the index from the API items of providers and clients.
+
+        Args:
+            providers (list): Provider items
+            clients (list): Client items
+
+        Returns:
+            PrefixIndex: Index of every unambiguous prefix
+        """
+        logger = logging.getLogger('datacite.prefix_index')
+        client_prefixes = {}
+        ambiguous = set()
+        for client in clients:
+            provider_rel = client.get('relationships', {}).get('provider', {}).get('data') or {}
+            owner = (client['id'], provider_rel.get('id'))
+            for prefix in cls.related_prefixes(client):
+                if client_prefixes.setdefault(prefix, owner) != owner:
+                    ambiguous.add(prefix)
+
+        provider_prefixes = {}
+        for provider in providers:
+            owner = (None, provider['id'])
+            for prefix in cls.related_prefixes(provider):
+                if prefix in client_prefixes:
+                    continue
+                if provider_prefixes.setdefault(prefix, owner) != owner:
+                    ambiguous.add(prefix)
+
+        prefixes = {**provider_prefixes, **client_prefixes}
+        for prefix in ambiguous:
+            del prefixes[prefix]
+        if ambiguous:
+            logger.warning(f"Ignoring {len(ambiguous)} prefixes assigned to more than one client or provider")
+        client_count = sum(1 for client_id, _ in prefixes.values() if client_id)
+        logger.info(f"Indexed {client_count} client and {len(prefixes) - client_count} provider prefixes")
+        return cls(prefixes)
+
+    def resolve(self, doi):
+        """Return the (client_id, provider_id) of a DOI's prefix, or None if unknown."""
+        if not isinstance(doi, str):
+            return None
+        return self.prefixes.get(doi.split('/', 1)[0].lower())
+
+    def digest(self):
+        """Return a hash of the index, so partials attributed with another index are not reused."""
+        return hashlib.sha256(
+            json.dumps(sorted(self.prefixes.items())).encode('utf-8')
+        ).hexdigest()
+
+
+class PartialStatsStore:
+    """On-disk cache of per-file partial stats for incremental runs.
+
+    Every processed data file gets a partial (.npz) holding its packed client
+    and provider counters. A manifest maps each file path to its partial and
+    to the file's size, modification time and SHA-256 content hash, which is
+    computed from the compressed bytes as the file is read for processing.
+    Files whose size and mtime are unchanged reuse their partial directly; if
+    only the mtime changed, the file is hashed again and the hash decides. The manifest also lists the
+    presence matrix files written for each file, which are removed with its
+    partial once the file is no longer part of the input.
+    """
+
+    MANIFEST_NAME = 'manifest.json'
+
+    def __init__(self, directory, layout, prefix_index=None, presence_matrix=None):
+        """Initialize the store.
+
+        Args:
+            directory (str): Directory holding the manifest and partials
+            layout (StatsLayout): Layout the cached counters were built with
+            prefix_index (PrefixIndex, optional): Index used to attribute
+                records without relationships
+            presence_matrix (PresenceMatrix, optional): Presence matrix whose
+                files are recorded with the partials
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.layout_fingerprint = layout.fingerprint()
+        self.prefix_digest = (prefix_index or PrefixIndex()).digest()
+        self.presence_matrix = presence_matrix
+        self.logger = logging.getLogger('datacite.partial_stats_store')
+        self.entries = self._load_manifest()
+
+    @staticmethod
+    def file_key(filepath):
+        return str(Path(filepath).resolve())
+
+    @staticmethod
+    def file_stat(filepath):
+        """Return the size and mtime of a file, to be completed with its content hash."""
+        stat = os.stat(filepath)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+    @staticmethod
+    def file_hash(filepath, digest=None, block_size=2**20):
+        """Return the SHA-256 content hash of a file, or update the given digest with it."""
+        sha256 = digest or hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                sha256.update(block)
+        return sha256.hexdigest()
+
+    def _load_manifest(self):
+        manifest_path = self.directory / self.MANIFEST_NAME
+        if not manifest_path.exists():
+            return {}
+
+        try:
+            with open(manifest_path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable manifest {manifest_path}: {str(e)}")
+            return {}
+
+        if manifest.get('layout') != self.layout_fingerprint:
+            self.logger.info("Stats layout changed since the partials were cached; ignoring them")
+            return {}
+        if manifest.get('prefixes') != self.prefix_digest:
+            self.logger.info("Prefix index changed since the partials were cached; ignoring them")
+            return {}
+
+        return manifest.get('files', {})
+
+    def load(self, filepath):
+        """Return the cached payloads of a file if it is unchanged.
+
+        Args:
+            filepath (str): Data file path
+
+        Returns:
+            tuple: (client_payload, provider_payload), or None if the file is
+                new, changed or its partial cannot be read
+        """
+        entry = self.entries.get(self.file_key(filepath))
+        if not entry:
+            return None
+
+        stat = os.stat(filepath)
+        if stat.st_size != entry['size']:
+            return None
+        if stat.st_mtime_ns != entry['mtime_ns']:
+            if self.file_hash(filepath) != entry.get('sha256'):
+                return None
+            entry['mtime_ns'] = stat.st_mtime_ns
+
+        try:
+            with np.load(self.directory / entry['partial']) as arrays:
+                return (CountsPayload.from_arrays(arrays, 'client'),
+                        CountsPayload.from_arrays(arrays, 'provider'))
+        except (OSError, ValueError, KeyError) as e:
+            self.logger.warning(f"Ignoring unreadable partial for {filepath}: {str(e)}")
+            return None
+
+    def save(self, filepath, fingerprint, client_payload, provider_payload):
+        """Store the payloads of a processed file and record it in the manifest."""
+        key = self.file_key(filepath)
+        partial_name = hashlib.sha1(key.encode('utf-8')).hexdigest() + '.npz'
+        with open(self.directory / partial_name, 'wb') as f:
+            np.savez(f, **client_payload.to_arrays('client'), **provider_payload.to_arrays('provider'))
+        presence_paths = self.entries.get(key, {}).get('presence', [])
+        if self.presence_matrix is not None:
+            presence_paths = sorted(set(presence_paths).union(
+                str(path.resolve()) for path in self.presence_matrix.source_paths(filepath)
+            ))
+        self.entries[key] = dict(fingerprint, partial=partial_name, presence=presence_paths)
+
+    def prune(self, filepaths):
+        """Drop partials and presence files of files that are no longer part of the input."""
+        keep = {self.file_key(filepath) for filepath in filepaths}
+        for key in [key for key in self.entries if key not in keep]:
+            entry = self.entries.pop(key)
+            (self.directory / entry['partial']).unlink(missing_ok=True)
+            for presence_path in entry.get('presence', []):
+                Path(presence_path).unlink(missing_ok=True)
+
+    def write_manifest(self):
+        manifest_path = self.directory / self.MANIFEST_NAME
+        temp_path = manifest_path.with_suffix('.json.tmp')
+        with open(temp_path, 'w') as f:
+            json.dump({'layout': self.layout_fingerprint, 'prefixes': self.prefix_digest,
+                       'files': self.entries}, f)
+        os.replace(temp_path, manifest_path)
+
+
 class FileScanner:
     """Checks input directory for JSONL.gz files (format used in the data files)"""
 
@@ -938,70 +1613,937 @@ class FileScanner:
             return {'files': []}
 
 
-class BatchGzipReader:
-    def __init__(self, filepath, chunk_size=64 * 1024):
-        """Initialize the reader.
+class GzipDecompressor:
+    """Opens gzip files for reading through a selectable decompression backend.
 
-        Args:
-            filepath: Path to .jsonl.gz file
-            chunk_size: Size of chunks to read in bytes (default 64KB)
-        """
-        self.filepath = filepath
-        self.chunk_size = chunk_size
-        self.buffer = ""
-        self.logger = logging.getLogger('datacite.batch_reader')
+    'isal' and 'zlib-ng' use the python-isal and zlib-ng bindings when they
+    are installed, 'pigz' streams the output of a `pigz -dc` subprocess and
+    'gzip' is the stdlib module. 'auto' picks the first available of zlib-ng,
+    isal and gzip.
+    """
 
-    def __iter__(self):
-        with gzip.open(self.filepath, 'rt', encoding='utf-8') as f:
-            # Read initial chunk
-            chunk = f.read(self.chunk_size)
-
-            while chunk:
-                # Split on newlines, keeping any partial line in buffer
-                lines = (self.buffer + chunk).split('\n')
-
-                # If chunk doesn't end with newline, last line is partial
-                if chunk.endswith('\n'):
-                    self.buffer = ""
-                else:
-                    self.buffer = lines[-1]
-                    lines = lines[:-1]
-                for line in lines:
-                    if line.strip():
-                        try:
-                            yield orjson.loads(line)
-                        except orjson.JSONDecodeError as e:
-                            self.logger.warning(
-                                f"Error decoding JSON in {self.filepath}: {str(e)}"
-                            )
-                            continue
-                chunk = f.read(self.chunk_size)
+    BACKENDS = ('auto', 'isal', 'zlib-ng', 'pigz', 'gzip')
+    AUTO_ORDER = ('zlib-ng', 'isal', 'gzip')
 
-            if self.buffer.strip():
-                try:
-                    yield orjson.loads(self.buffer)
-                except orjson.JSONDecodeError as e:
-                    self.logger.warning(
-                        f"Error decoding final JSON in {self.filepath}: {str(e)}"
-                    )
+    def __init__(self, backend='auto'):
+        """Initialize the decompressor.
 
+        Args:
+            backend (str): One of BACKENDS
 
-class FileProcessor:
-    """Processor class for individual jsonl.gz files."""
+        Raises:
+            ValueError: If the backend is unknown or not available
+        """
+        self.backend = self.resolve(backend)
+
+    @staticmethod
+    def is_available(backend):
+        if backend == 'isal':
+            return igzip is not None
+        if backend == 'zlib-ng':
+            return gzip_ng is not None
+        if backend == 'pigz':
+            return shutil.which('pigz') is not None
+        return backend == 'gzip'
 
-    def __init__(self, stats_container, counter=None, lock=None, total_files=None):
-        """Initialize the file processor.
+    @classmethod
+    def resolve(cls, backend):
+        """Resolve 'auto' and check that the requested backend can be used.
+
+        Returns:
+            str: Name of the backend that will be used
+        """
+        if backend == 'auto':
+            return next(name for name in cls.AUTO_ORDER if cls.is_available(name))
+        if backend not in cls.BACKENDS:
+            raise ValueError(f"Unknown decompression backend: {backend}")
+        if not cls.is_available(backend):
+            raise ValueError(f"Decompression backend '{backend}' is not installed")
+        return backend
+
+    @contextmanager
+    def open(self, filepath, offset=0, digest=None):
+        """Open a gzip file for binary reading with the selected backend.
+
+        Args:
+            filepath: Path to the gzip file
+            offset (int): Byte offset of the gzip member to start reading at
+            digest (hashlib hash, optional): Hash updated with the compressed
+                bytes from offset to the end of the file, including any not
+                needed for decompression
+
+        Yields:
+            A binary file-like object returning decompressed bytes
+        """
+        if self.backend == 'pigz':
+            if digest is not None:
+                # pigz reads the file itself, so it is hashed separately
+                PartialStatsStore.file_hash(filepath, digest)
+            yield from self._open_pigz(filepath, offset)
+            return
+
+        gzip_module = {'isal': igzip, 'zlib-ng': gzip_ng}.get(self.backend, gzip)
+        with open(filepath, 'rb') as raw_file:
+            raw_file.seek(offset)
+            source = raw_file if digest is None else HashingReader(raw_file, digest)
+            with gzip_module.open(source, 'rb') as gz_file:
+                yield gz_file
+            if digest is not None:
+                source.drain()
+
+    def _open_pigz(self, filepath, offset):
+        with open(filepath, 'rb', buffering=0) as raw_file:
+            raw_file.seek(offset)
+            process = subprocess.Popen(
+                ['pigz', '-dc'],
+                stdin=raw_file,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE
+            )
+        try:
+            yield process.stdout
+        except BaseException:
+            process.kill()
+            raise
+        else:
+            # Stopping before the end (e.g. at the end of a shard) is not an error
+            stopped_early = bool(process.stdout.read(1))
+            if stopped_early:
+                process.kill()
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            process.wait()
+
+        if process.returncode != 0 and not stopped_early:
+            raise OSError(
+                f"pigz exited with status {process.returncode}: "
+                f"{stderr.decode(errors='replace').strip()}"
+            )
+
+
+class HashingReader(io.RawIOBase):
+    """Binary file wrapper updating a hash with the bytes read through it."""
+
+    def __init__(self, raw_file, digest):
+        self.raw_file = raw_file
+        self.digest = digest
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.raw_file.readinto(buffer)
+        if count:
+            self.digest.update(memoryview(buffer)[:count])
+        return count
+
+    def drain(self, block_size=2**20):
+        """Hash the rest of the file."""
+        for block in iter(lambda: self.raw_file.read(block_size), b''):
+            self.digest.update(block)
+
+
+class RecordPrefilter:
+    """Cheap check run on the raw bytes of a line before it is parsed.
+
+    A line is rejected only when it cannot be a findable record, or, when
+    scope ids are given, cannot mention any of them as a JSON string. Every
+    line that passes still goes through the full checks after parsing, so
+    false positives (e.g. a nested "state" key) only cost a parse. Lines with
+    \\u00XX escapes, which could spell out a key, value or id, always pass.
+    """
+
+    FINDABLE_STATE = re.compile(rb'"state"\s*:\s*"findable"')
+    ASCII_ESCAPE = re.compile(rb'\\u00[2-7]')
+
+    def __init__(self, scope_ids=None):
+        """Initialize the prefilter.
+
+        Args:
+            scope_ids (iterable, optional): Provider/client ids of which at
+                least one must appear in a line for it to be kept
+        """
+        self.scope_pattern = None
+        if scope_ids:
+            alternatives = b'|'.join(re.escape(str(scope_id).encode()) for scope_id in scope_ids)
+            self.scope_pattern = re.compile(b'"(?:' + alternatives + b')"')
+
+    def might_keep(self, line):
+        if self.FINDABLE_STATE.search(line) and (
+            self.scope_pattern is None or self.scope_pattern.search(line)
+        ):
+            return True
+        return self.ASCII_ESCAPE.search(line) is not None
+
+
+if msgspec is not None:
+    LazyValue = Union[list[msgspec.Raw], dict[str, msgspec.Raw], str, int, float, bool, None]
+
+    class ProjectedAttributes(msgspec.Struct):
+        """Record attributes read by FileProcessor.get_fields and the state check.
+
+        registered and created are only used as time dimensions.
+
+        Missing keys default to None, which the stats treat like the empty
+        defaults get_fields uses.
+        """
+        state: Any = None
+        doi: Any = None
+        creators: Any = None
+        titles: LazyValue = None
+        publisher: LazyValue = None
+        publicationYear: LazyValue = None
+        types: Any = None
+        subjects: LazyValue = None
+        contributors: Any = None
+        dates: LazyValue = None
+        relatedIdentifiers: Any = None
+        descriptions: LazyValue = None
+        geoLocations: LazyValue = None
+        language: LazyValue = None
+        alternateIdentifiers: LazyValue = None
+        sizes: LazyValue = None
+        formats: LazyValue = None
+        version: LazyValue = None
+        rightsList: LazyValue = None
+        fundingReferences: Any = None
+        relatedItems: LazyValue = None
+        registered: Any = None
+        created: Any = None
+
+    class ProjectedRelationships(msgspec.Struct):
+        client: Any = {}
+        provider: Any = {}
+
+    class ProjectedRecord(msgspec.Struct):
+        attributes: ProjectedAttributes = msgspec.field(default_factory=ProjectedAttributes)
+        relationships: ProjectedRelationships = msgspec.field(default_factory=ProjectedRelationships)
+
+
+class ProjectedRecordDecoder:
+    """Decodes only the parts of a record that the stats need.
+
+    Records are decoded with msgspec into Structs holding the attributes used
+    by FileProcessor.get_fields and the client/provider relationships; every
+    other key is skipped without being materialized. Fields without subfield
+    stats only need their truthiness and length, so their lists and objects
+    keep their items as undecoded msgspec.Raw. A record that does not fit the
+    projection (e.g. null attributes or invalid JSON) is decoded in full with
+    orjson instead, so results and decode errors match a full decode.
+    """
+
+    def __init__(self):
+        self._decoder = None
+
+    @staticmethod
+    def is_available():
+        return msgspec is not None
+
+    def __getstate__(self):
+        # msgspec decoders are rebuilt in each worker process
+        return {'_decoder': None}
+
+    def decode(self, line):
+        """Decode a raw JSON line into a dict shaped like the full record.
+
+        Args:
+            line: Bytes-like JSON line
+
+        Returns:
+            dict: Record with projected 'attributes' and 'relationships'
+        """
+        if self._decoder is None:
+            self._decoder = msgspec.json.Decoder(ProjectedRecord)
+        try:
+            record = self._decoder.decode(line)
+        except msgspec.MsgspecError:
+            return orjson.loads(line)
+        return {
+            'attributes': msgspec.structs.asdict(record.attributes),
+            'relationships': msgspec.structs.asdict(record.relationships)
+        }
+
+
+class FileShard:
+    """A run of gzip members of a sharded data file, processed as one task.
+
+    Attributes:
+        source (str): Original data file
+        path (str): Recompressed copy of the source holding the members
+        offset (int): Byte offset of the first member in path
+        size (int): Compressed size of the members in bytes
+        length (int): Decompressed size of the members in bytes
+        number (int): 1-based number of the shard within the source
+        count (int): Number of shards the source is split into
+        fingerprint (dict): Fingerprint of the source the copy was made from
+    """
+
+    def __init__(self, source, path, offset, size, length, number, count, fingerprint):
+        self.source = source
+        self.path = path
+        self.offset = offset
+        self.size = size
+        self.length = length
+        self.number = number
+        self.count = count
+        self.fingerprint = fingerprint
+
+    @property
+    def name(self):
+        return f"{Path(self.source).name} [shard {self.number}/{self.count}]"
+
+
+class FileSharder:
+    """Splits large .jsonl.gz files into shards that workers process in parallel.
+
+    A gzip stream can only be decompressed from its start, so a pre-pass
+    recompresses every large file into a cached copy made of independently
+    decompressible gzip members that end on line boundaries (as in BGZF),
+    with an index of each member's offset and compressed and decompressed
+    size. Consecutive members are grouped into shards of about shard_size
+    compressed bytes. Cached copies are reused while the size and
+    modification time of their source are unchanged.
+    """
+
+    INDEX_VERSION = 1
+    CACHE_FILE = re.compile(r'([0-9a-f]{40})\.(?:jsonl\.gz|json|jsonl\.tmp|json\.tmp)')
+
+    def __init__(self, directory, shard_size, member_size=2**24, decompressor=None):
+        """Initialize the sharder.
+
+        Args:
+            directory (str): Directory holding the recompressed copies and indexes
+            shard_size (int): Files larger than this many bytes are sharded,
+                into shards of about this compressed size
+            member_size (int): Decompressed size of each gzip member in bytes
+            decompressor (GzipDecompressor, optional): Backend used to read sources
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.shard_size = shard_size
+        self.member_size = member_size
+        self.decompressor = decompressor or GzipDecompressor()
+        self.logger = logging.getLogger('datacite.file_sharder')
+
+    @staticmethod
+    def task_name(task):
+        return task.name if isinstance(task, FileShard) else Path(task).name
+
+    @staticmethod
+    def task_size(task):
+        return task.size if isinstance(task, FileShard) else os.path.getsize(task)
+
+    @staticmethod
+    def compress_member(data):
+        gzip_module = gzip_ng or igzip or gzip
+        return gzip_module.compress(data, compresslevel=1)
+
+    def needs_sharding(self, filepath):
+        return os.path.getsize(filepath) > self.shard_size
+
+    def _digest(self, filepath):
+        return hashlib.sha1(str(Path(filepath).resolve()).encode('utf-8')).hexdigest()
+
+    def _paths(self, filepath):
+        name = self._digest(filepath)
+        return self.directory / f'{name}.jsonl.gz', self.directory / f'{name}.json'
+
+    def load_index(self, filepath):
+        """Return the index of a file's cached copy, or None if it is missing or stale."""
+        _, index_path = self._paths(filepath)
+        try:
+            with open(index_path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        stat = os.stat(filepath)
+        fingerprint = index.get('fingerprint', {})
+        if (index.get('version') != self.INDEX_VERSION
+                or fingerprint.get('size') != stat.st_size
+                or fingerprint.get('mtime_ns') != stat.st_mtime_ns):
+            return None
+        return index
+
+    def build(self, filepath):
+        """Recompress a file into line-aligned gzip members and write its index.
+
+        Errors are logged and leave the file without a cached copy, so it is
+        processed unsharded.
+
+        Returns:
+            str: The source file path
+        """
+        copy_path, index_path = self._paths(filepath)
+        temp_path = copy_path.with_suffix('.tmp')
+        try:
+            index_path.unlink(missing_ok=True)
+            fingerprint = PartialStatsStore.file_stat(filepath)
+            digest = hashlib.sha256()
+            members = []
+            offset = 0
+            pending = b''
+            with self.decompressor.open(filepath, digest=digest) as source, open(temp_path, 'wb') as out:
+                while True:
+                    chunk = source.read(self.member_size)
+                    data = pending + chunk
+                    if chunk:
+                        cut = data.rfind(b'\n') + 1
+                        if cut == 0:
+                            pending = data
+                            continue
+                        data, pending = data[:cut], data[cut:]
+                    if data:
+                        member = self.compress_member(data)
+                        out.write(member)
+                        members.append([offset, len(member), len(data)])
+                        offset += len(member)
+                    if not chunk:
+                        break
+
+            os.replace(temp_path, copy_path)
+            fingerprint['sha256'] = digest.hexdigest()
+            temp_path = index_path.with_suffix('.json.tmp')
+            with open(temp_path, 'w') as f:
+                json.dump({'version': self.INDEX_VERSION, 'fingerprint': fingerprint, 'members': members}, f)
+            os.replace(temp_path, index_path)
+            self.logger.info(f"Recompressed {filepath} into {len(members)} gzip members")
+        except Exception as e:
+            self.logger.error(f"Error recompressing {filepath} for sharding: {str(e)}")
+            temp_path.unlink(missing_ok=True)
+        return filepath
+
+    def shards(self, filepath, index):
+        """Group the members of a cached copy into FileShard tasks."""
+        copy_path, _ = self._paths(filepath)
+        groups = []
+        group = []
+        group_size = 0
+        for member in index['members']:
+            group.append(member)
+            group_size += member[1]
+            if group_size >= self.shard_size:
+                groups.append(group)
+                group = []
+                group_size = 0
+        if group:
+            groups.append(group)
+
+        return [
+            FileShard(
+                source=filepath,
+                path=str(copy_path),
+                offset=group[0][0],
+                size=sum(member[1] for member in group),
+                length=sum(member[2] for member in group),
+                number=number,
+                count=len(groups),
+                fingerprint=index['fingerprint']
+            )
+            for number, group in enumerate(groups, start=1)
+        ]
+
+    def prune(self, filepaths):
+        """Remove cached copies whose source is not among the input filepaths.
+
+        Only files named like the sharder's own copies, indexes and their
+        temporary files are removed; anything else in the directory is left
+        alone.
+        """
+        keep = {self._digest(filepath) for filepath in filepaths}
+        for path in self.directory.iterdir():
+            match = self.CACHE_FILE.fullmatch(path.name)
+            if match and match.group(1) not in keep and path.is_file():
+                path.unlink(missing_ok=True)
+
+
+class WorkerPool:
+    """Runs tasks in worker processes with a configurable pool backend.
+
+    The default number of workers is derived from the CPUs this process may
+    actually use: the scheduler affinity mask, capped by a cgroup CPU quota
+    (as set by container runtimes and batch schedulers), minus one CPU left
+    for the main process merging results.
+    """
+
+    BACKENDS = ('pool', 'executor')
+    CGROUP_V2_CPU_MAX = Path('/sys/fs/cgroup/cpu.max')
+    CGROUP_V1_CPU_QUOTA = Path('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+    CGROUP_V1_CPU_PERIOD = Path('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+
+    def __init__(self, processes=None, backend='pool', max_tasks_per_child=None):
+        """Initialize the worker pool.
+
+        Args:
+            processes (int, optional): Number of worker processes; defaults to
+                one less than the available CPUs
+            backend (str): 'pool' (multiprocessing.Pool) or 'executor'
+                (concurrent.futures.ProcessPoolExecutor)
+            max_tasks_per_child (int, optional): Replace each worker process
+                after it has completed this many tasks
+        """
+        self.processes = processes or self.default_processes()
+        if backend == 'executor' and max_tasks_per_child and sys.version_info < (3, 12):
+            # Before 3.12 ProcessPoolExecutor can deadlock while replacing a
+            # recycled worker; multiprocessing.Pool recycles workers safely
+            logging.getLogger('datacite.worker_pool').warning(
+                "--max-tasks-per-child with the executor backend requires Python 3.12+; "
+                "using the pool backend"
+            )
+            backend = 'pool'
+        self.backend = backend
+        self.max_tasks_per_child = max_tasks_per_child
+        # ProcessPoolExecutor only recycles workers started with spawn; shared
+        # state handed to the workers must come from the same context
+        self.context = multiprocessing.get_context(
+            'spawn' if backend == 'executor' and max_tasks_per_child else None
+        )
+
+    @classmethod
+    def cgroup_cpu_limit(cls):
+        """Return the CPU quota of the cgroup (rounded up), or None if unlimited."""
+        try:
+            quota, period = cls.CGROUP_V2_CPU_MAX.read_text().split()[:2]
+            return None if quota == 'max' else max(1, math.ceil(int(quota) / int(period)))
+        except (OSError, ValueError):
+            pass
+        try:
+            quota = int(cls.CGROUP_V1_CPU_QUOTA.read_text())
+            period = int(cls.CGROUP_V1_CPU_PERIOD.read_text())
+            if quota > 0 and period > 0:
+                return max(1, math.ceil(quota / period))
+        except (OSError, ValueError):
+            pass
+        return None
+
+    @classmethod
+    def available_cpus(cls):
+        """Return the number of CPUs this process may run on."""
+        try:
+            cpus = len(os.sched_getaffinity(0))
+        except AttributeError:
+            cpus = cpu_count()
+        limit = cls.cgroup_cpu_limit()
+        if limit is not None:
+            cpus = min(cpus, limit)
+        return max(1, cpus)
+
+    @classmethod
+    def default_processes(cls):
+        return max(1, cls.available_cpus() - 1)
+
+    def imap_unordered(self, function, items, initializer=None, initargs=()):
+        """Apply function to every item in the workers, yielding results as they complete.
+
+        Args:
+            function: Picklable callable applied to each item
+            items (list): Items to process
+            initializer: Callable run once in every worker process
+            initargs (tuple): Arguments for initializer
+
+        Yields:
+            Results of function in completion order
+        """
+        processes = max(1, min(self.processes, len(items)))
+        if self.backend == 'executor':
+            options = {}
+            if self.max_tasks_per_child:
+                options['max_tasks_per_child'] = self.max_tasks_per_child
+            with ProcessPoolExecutor(max_workers=processes, mp_context=self.context,
+                                     initializer=initializer, initargs=initargs,
+                                     **options) as executor:
+                futures = [executor.submit(function, item) for item in items]
+                try:
+                    for future in as_completed(futures):
+                        yield future.result()
+                finally:
+                    for future in futures:
+                        future.cancel()
+            return
+
+        pool = self.context.Pool(
+            processes=processes,
+            initializer=initializer,
+            initargs=initargs,
+            maxtasksperchild=self.max_tasks_per_child
+        )
+        try:
+            yield from pool.imap_unordered(function, items)
+        finally:
+            pool.close()
+            pool.join()
+
+
+class TaskScheduler:
+    """Plans the order in which the worker pool processes files and shards.
+
+    Tasks are handed out largest first (longest-processing-time-first list
+    scheduling), so the biggest files start early instead of straggling at
+    the end of a run. Files that are small relative to the total input are
+    packed into batches processed as a single task, which saves per-task
+    dispatch and result overhead. The makespan predicted from on-disk sizes
+    is logged before processing and compared with the actual one after.
+    """
+
+    BATCHES_PER_WORKER = 4
+
+    def __init__(self, workers):
+        """Initialize the scheduler.
+
+        Args:
+            workers (int): Number of worker processes
+        """
+        self.workers = workers
+        self.total_size = 0
+        self.predicted_load = 0
+        self.busy_time = {}
+        self.logger = logging.getLogger('datacite.scheduler')
+
+    def plan(self, tasks):
+        """Group tasks into batches ordered largest first.
+
+        Tasks smaller than an even share of the input per batch are packed
+        together (first-fit decreasing) up to that size.
+
+        Args:
+            tasks (list): File paths and FileShards
+
+        Returns:
+            list: Batches (lists of tasks), largest first
+        """
+        sized = sorted(((FileSharder.task_size(task), task) for task in tasks),
+                       key=lambda item: item[0], reverse=True)
+        self.total_size = sum(size for size, _ in sized)
+        batch_size = self.total_size / (self.workers * self.BATCHES_PER_WORKER)
+
+        batches = []
+        open_batches = []
+        for size, task in sized:
+            if size >= batch_size:
+                batches.append((size, [task]))
+                continue
+            for batch in open_batches:
+                if batch[0] + size <= batch_size:
+                    batch[0] += size
+                    batch[1].append(task)
+                    break
+            else:
+                open_batches.append([size, [task]])
+        batches.extend((size, batch) for size, batch in open_batches)
+        batches.sort(key=lambda item: item[0], reverse=True)
+
+        loads = [0] * self.workers
+        for size, _ in batches:
+            loads[loads.index(min(loads))] += size
+        self.predicted_load = max(loads)
+
+        self.logger.info(
+            f"Scheduled {len(tasks)} tasks in {len(batches)} batches on {self.workers} workers, "
+            f"largest first; predicted busiest worker load {self.predicted_load / 2**20:.1f} MB "
+            f"({self.predicted_load / max(self.total_size / self.workers, 1):.2f}x an even share)"
+        )
+        return [batch for _, batch in batches]
+
+    @staticmethod
+    def run_batch(function, batch):
+        """Apply function to every task of a batch in a worker process.
+
+        Returns:
+            tuple: (worker pid, seconds spent, list of results)
+        """
+        start_time = time.perf_counter()
+        results = [function(task) for task in batch]
+        return os.getpid(), time.perf_counter() - start_time, results
+
+    def record(self, pid, elapsed):
+        self.busy_time[pid] = self.busy_time.get(pid, 0.0) + elapsed
+
+    def log_makespan(self, elapsed):
+        """Log the actual makespan next to the predicted one.
+
+        The prediction converts the busiest worker's planned load to seconds
+        with the throughput measured across all workers.
+
+        Args:
+            elapsed (float): Wall-clock seconds spent processing
+        """
+        message = f"Makespan {elapsed:.1f}s"
+        busy_total = sum(self.busy_time.values())
+        if busy_total > 0:
+            throughput = self.total_size / busy_total
+            message += (
+                f", predicted {self.predicted_load / throughput:.1f}s at the measured "
+                f"{throughput / 2**20:.1f} MB/s of compressed input per worker; worker busy time "
+                f"{min(self.busy_time.values()):.1f}-{max(self.busy_time.values()):.1f}s"
+            )
+        self.logger.info(message)
+
+
+class BatchGzipReader:
+    """Reads JSON records from a .jsonl.gz file in large decompressed chunks.
+
+    Lines are sliced out of each chunk through a memoryview and passed to
+    orjson as bytes, so records are never decoded to str first and only a
+    line spanning two chunks is copied. Blank lines are skipped without
+    being counted. Lines rejected by the optional prefilter are counted in
+    rejected_count without being parsed, and failed is set if the file could
+    not be read to the end. line_number is the physical line (counted from
+    the start of the reader's byte range) of the last record yielded. A
+    reader can be limited to a byte range of line-aligned gzip members, as
+    produced by FileSharder.
+    """
+
+    BLANK_LINE = re.compile(rb'\s*')
+
+    def __init__(self, filepath, chunk_size=2**24, decompressor=None, prefilter=None, decoder=None,
+                 offset=0, length=None, digest=None):
+        """Initialize the reader.
+
+        Args:
+            filepath: Path to .jsonl.gz file
+            chunk_size: Size of decompressed chunks to read in bytes (default 16MB)
+            decompressor (GzipDecompressor, optional): Backend used to open the
+                file (default: the best available one)
+            prefilter (RecordPrefilter, optional): Check deciding which lines
+                are parsed
+            decoder (ProjectedRecordDecoder, optional): Decoder used instead of
+                a full orjson parse
+            offset (int): Byte offset of the first gzip member to read
+            length (int, optional): Number of decompressed bytes to read
+            digest (hashlib hash, optional): Hash updated with the compressed
+                bytes of the file (see GzipDecompressor.open)
+        """
+        self.filepath = filepath
+        self.chunk_size = chunk_size
+        self.offset = offset
+        self.length = length
+        self.digest = digest
+        self.decompressor = decompressor or GzipDecompressor()
+        self.prefilter = prefilter
+        self.decode = decoder.decode if decoder else orjson.loads
+        self.bytes_read = 0
+        self.rejected_count = 0
+        self.line_number = 0
+        self.failed = False
+        self.logger = logging.getLogger('datacite.batch_reader')
+
+    @classmethod
+    def for_task(cls, task, **kwargs):
+        """Create a reader for a file path or a FileShard."""
+        if isinstance(task, FileShard):
+            return cls(task.path, offset=task.offset, length=task.length, **kwargs)
+        return cls(task, **kwargs)
+
+    def iter_lines(self):
+        """Yield the lines of the file as bytes-like objects, without newlines."""
+        partial = b''
+        remaining = self.length
+        with self.decompressor.open(self.filepath, self.offset, self.digest) as gz_file:
+            while remaining is None or remaining > 0:
+                chunk = gz_file.read(self.chunk_size if remaining is None else min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                self.bytes_read += len(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+
+                view = memoryview(chunk)
+                start = 0
+                end = chunk.find(b'\n')
+                if end != -1 and partial:
+                    yield partial + view[:end]
+                    partial = b''
+                    start = end + 1
+                    end = chunk.find(b'\n', start)
+
+                while end != -1:
+                    yield view[start:end]
+                    start = end + 1
+                    end = chunk.find(b'\n', start)
+
+                partial += view[start:]
+
+        if partial:
+            yield partial
+
+    def __iter__(self):
+        try:
+            for line_number, line in enumerate(self.iter_lines(), 1):
+                if not line:
+                    continue
+                if self.prefilter and not self.prefilter.might_keep(line):
+                    if not self.BLANK_LINE.fullmatch(line):
+                        self.rejected_count += 1
+                    continue
+                try:
+                    record = self.decode(line)
+                except orjson.JSONDecodeError as e:
+                    if not self.BLANK_LINE.fullmatch(line):
+                        self.logger.warning(
+                            f"JSON decode error in {self.filepath} line {line_number}: {str(e)}"
+                        )
+                    continue
+                self.line_number = line_number
+                yield record
+        except Exception as e:
+            self.failed = True
+            self.logger.error(f"Error reading gzip file {self.filepath}: {str(e)}")
+
+
+class PresenceMatrix:
+    """Per-record field presence matrix written to Parquet next to the stats.
+
+    Every processed file (or shard) gets a Parquet file with one row per
+    findable record: DOI, prefix, provider, client, resourceTypeGeneral,
+    publicationYear and the record's presence mask, a uint64 with one bit
+    per field and subfield counted by the stats. Bit names are stored in
+    the file metadata under 'presence_bits'. Completeness along dimensions
+    not in the aggregate stats can then be computed from these files
+    without rescanning the data files.
+    """
+
+    ROW_GROUP_SIZE = 1_000_000
+
+    def __init__(self, directory, layout):
+        """Initialize the presence matrix.
+
+        Args:
+            directory (str): Directory receiving the Parquet files
+            layout (StatsLayout): Layout defining the presence bits
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.schema = pa.schema([
+            ('doi', pa.string()),
+            ('prefix', pa.string()),
+            ('provider_id', pa.string()),
+            ('client_id', pa.string()),
+            ('resource_type_general', pa.string()),
+            ('publication_year', pa.int16()),
+            ('presence', pa.uint64())
+        ], metadata={'presence_bits': json.dumps(layout.presence_names())})
+
+    @staticmethod
+    def is_available():
+        return pa is not None
+
+    @staticmethod
+    def source_name(source):
+        digest = hashlib.sha1(str(Path(source).resolve()).encode('utf-8')).hexdigest()[:12]
+        return f"{Path(source).name.split('.')[0]}-{digest}"
+
+    def path(self, task):
+        source = task.source if isinstance(task, FileShard) else task
+        name = self.source_name(source)
+        if isinstance(task, FileShard):
+            name += f'-{task.number:05d}'
+        return self.directory / f'{name}.parquet'
+
+    def source_paths(self, source):
+        """Return the Parquet files of a data file and of its shards."""
+        name = self.source_name(source)
+        return sorted(
+            path for path in self.directory.glob('*.parquet')
+            if path.name == f'{name}.parquet' or path.name.startswith(f'{name}-')
+        )
+
+    def open(self, task):
+        """Open the Parquet file of a data file or FileShard."""
+        return PresenceMatrixFile(self.path(task), self.schema, self.ROW_GROUP_SIZE)
+
+
+class PresenceMatrixFile:
+    """Buffers presence matrix rows and writes them to Parquet in large row groups."""
+
+    COLUMNS = ('doi', 'prefix', 'provider_id', 'client_id', 'resource_type_general',
+               'publication_year', 'presence')
+
+    def __init__(self, path, schema, row_group_size):
+        self.path = path
+        self.temp_path = path.with_name(path.name + '.tmp')
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self.columns = {column: [] for column in self.COLUMNS}
+        self._writer = None
+
+    @staticmethod
+    def publication_year(value):
+        try:
+            year = int(value)
+        except (TypeError, ValueError):
+            return None
+        return year if -32768 <= year <= 32767 else None
+
+    def append(self, record, client_id, provider_id, presence):
+        """Add the row of a findable record.
+
+        Args:
+            record (dict): Record normalized by FileProcessor.get_fields
+            client_id (str): Client of the record
+            provider_id (str): Provider of the record
+            presence (int): Presence mask from RecordFeatures
+        """
+        doi = record.get('identifier')
+        resource_type = record.get('resourceType')
+        if isinstance(resource_type, dict):
+            resource_type = resource_type.get('resourceTypeGeneral')
+        columns = self.columns
+        columns['doi'].append(doi if isinstance(doi, str) else None)
+        columns['prefix'].append(doi.split('/', 1)[0] if isinstance(doi, str) and '/' in doi else None)
+        columns['provider_id'].append(provider_id)
+        columns['client_id'].append(client_id)
+        columns['resource_type_general'].append(resource_type if isinstance(resource_type, str) else None)
+        columns['publication_year'].append(self.publication_year(record.get('publicationYear')))
+        columns['presence'].append(presence)
+        if len(columns['presence']) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.temp_path, self.schema, compression='zstd')
+        table = pa.Table.from_pydict(self.columns, schema=self.schema)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows += table.num_rows
+        self.columns = {column: [] for column in self.COLUMNS}
+
+    def close(self):
+        """Write the remaining rows and move the file into place."""
+        self._flush()
+        self._writer.close()
+        os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        if self._writer is not None:
+            self._writer.close()
+        self.temp_path.unlink(missing_ok=True)
+
+
+class FileProcessor:
+    """Processor class for individual jsonl.gz files."""
+
+    def __init__(self, stats_container, decompressor=None, decoder=None, presence_matrix=None):
+        """Initialize the file processor.
+
+        Progress is counted in the shared counter installed in each worker
+        process by DataCiteDataFileProcessor.init_worker, which also installs
+        the processor itself once per worker rather than with every task.
 
         Args:
             stats_container (StatsContainer): Container for stats operations
-            counter: Shared counter for tracking progress
-            lock: Lock for thread-safe operations
-            total_files: Total number of files to process
+            decompressor (GzipDecompressor, optional): Backend used to read files
+            decoder (ProjectedRecordDecoder, optional): Projected decoder used
+                instead of full orjson parsing
+            presence_matrix (PresenceMatrix, optional): Receives a row for
+                every findable record
         """
         self.stats_container = stats_container
-        self._counter = counter
-        self._lock = lock
-        self._total_files = total_files
+        self.decompressor = decompressor or GzipDecompressor()
+        self.decoder = decoder
+        self.prefilter = RecordPrefilter()
+        self.presence_matrix = presence_matrix
         self.logger = logging.getLogger('datacite.file_processor')
 
     def get_fields(self, item):
@@ -1026,23 +2568,50 @@ class FileProcessor:
             'version': attributes.get('version'),
             'rights': attributes.get('rightsList', []),
             'fundingReferences': attributes.get('fundingReferences', []),
-            'relatedItems': attributes.get('relatedItems', [])
+            'relatedItems': attributes.get('relatedItems', []),
+            'registered': attributes.get('registered'),
+            'created': attributes.get('created')
         }
 
     def log_progress(self, message):
         sys.stdout.write(f"{message}\n")
         sys.stdout.flush()
 
-    def process_file(self, filepath):
+    def process_file(self, task, digest=None):
+        """Process a data file or a FileShard of one.
+
+        Args:
+            task: Data file path or FileShard
+            digest (hashlib hash, optional): Hash updated with the compressed
+                bytes of the file as it is read
+
+        Returns:
+            tuple: (source filepath, client counts, provider counts, succeeded),
+            where succeeded is False if the file could not be read to the end
+        """
+        filepath = task.source if isinstance(task, FileShard) else task
+        presence_file = None
         try:
-            client_stats = {}  # client_id -> stats
-            provider_stats = {}  # provider_id -> stats
+            if self.presence_matrix is not None:
+                presence_file = self.presence_matrix.open(task)
+            client_stats = {}  # client_id -> counts
+            provider_stats = {}  # provider_id -> counts
             skipped_count = 0
             processed_count = 0
-            line_number = 0
-            reader = BatchGzipReader(filepath)
+            attributed_count = 0
+            unattributed_count = 0
+            next_progress_line = 100000
+            layout = self.stats_container.layout
+            stats_updater = StatsUpdater(self.stats_container)
+            start_time = time.perf_counter()
+            reader = BatchGzipReader.for_task(
+                task,
+                decompressor=self.decompressor,
+                prefilter=self.prefilter,
+                decoder=self.decoder,
+                digest=digest
+            )
             for item in reader:
-                line_number += 1
                 try:
                     record_state = item.get('attributes', {}).get('state')
                     if record_state != 'findable':
@@ -1054,192 +2623,579 @@ class FileProcessor:
                     provider_id = relationships.get(
                         'provider', {}).get('data', {}).get('id')
 
-                    if not client_id and not provider_id:
-                        self.logger.warning(f"No client or provider relationship found in line {line_number}")
-                        continue
                     normalized = self.get_fields(item)
+                    if not client_id and not provider_id:
+                        owner = _prefix_index.resolve(normalized['identifier']) if _prefix_index else None
+                        if owner is None:
+                            unattributed_count += 1
+                            continue
+                        client_id, provider_id = owner
+                        attributed_count += 1
 
                     if client_id and client_id not in client_stats:
-                        client_stats[client_id] = self.stats_container.create_empty_stats(
-                        )
+                        client_stats[client_id] = layout.new_counts()
                     if provider_id and provider_id not in provider_stats:
-                        provider_stats[provider_id] = self.stats_container.create_empty_stats(
-                        )
+                        provider_stats[provider_id] = layout.new_counts()
 
-                    stats_updater = StatsUpdater(self.stats_container)
+                    features = stats_updater.extract_features(normalized)
                     if client_id:
-                        stats_updater.update_stats_single_record(
-                            client_stats[client_id], normalized
-                        )
+                        stats_updater.add_features(client_stats[client_id], features)
                     if provider_id:
-                        stats_updater.update_stats_single_record(
-                            provider_stats[provider_id], normalized
-                        )
+                        stats_updater.add_features(provider_stats[provider_id], features)
+                    if presence_file is not None:
+                        presence_file.append(normalized, client_id, provider_id, features.presence)
 
                     processed_count += 1
 
-                    if line_number % 100000 == 0:
+                    if reader.line_number >= next_progress_line:
+                        next_progress_line = (reader.line_number // 100000 + 1) * 100000
                         self.logger.debug(
-                            f"Processed {line_number} lines in {Path(filepath).name}: "
+                            f"Processed {reader.line_number} lines in {FileSharder.task_name(task)}: "
                             f"{processed_count} findable records, {skipped_count} skipped"
                         )
 
                 except Exception as e:
-                    self.logger.warning(f"Error processing line {line_number} in {filepath}: {str(e)}")
+                    self.logger.warning(
+                        f"Error processing line {reader.line_number} in {FileSharder.task_name(task)}: {str(e)}"
+                    )
                     continue
 
-            if self._lock and self._counter and self._total_files:
-                with self._lock:
-                    self._counter.value += 1
-                    self.log_progress(
-                        f"Completed {self._counter.value}/{self._total_files} files "
-                        f"({Path(filepath).name}): {processed_count} findable records, "
-                        f"{skipped_count} skipped"
-                    )
+            skipped_count += reader.rejected_count
+            if attributed_count:
+                self.logger.debug(
+                    f"Attributed {attributed_count} records without client or provider relationship "
+                    f"by DOI prefix in {FileSharder.task_name(task)}"
+                )
+            if unattributed_count:
+                self.logger.warning(
+                    f"Skipped {unattributed_count} findable records without client or provider "
+                    f"relationship or known DOI prefix in {FileSharder.task_name(task)}"
+                )
+            if _counter is not None and _total_files:
+                megabytes = reader.bytes_read / 2**20
+                elapsed = max(time.perf_counter() - start_time, 1e-9)
+                with _counter.get_lock():
+                    _counter.value += 1
+                    completed = _counter.value
+                self.log_progress(
+                    f"Completed {completed}/{_total_files} files "
+                    f"({FileSharder.task_name(task)}): {processed_count} findable records, "
+                    f"{skipped_count} skipped, {megabytes:.1f} MB in {elapsed:.1f}s "
+                    f"({megabytes / elapsed:.1f} MB/s)"
+                )
 
-            return filepath, client_stats, provider_stats
+            if presence_file is not None:
+                presence_file.close()
+            return filepath, client_stats, provider_stats, not reader.failed
 
         except Exception as e:
+            if presence_file is not None:
+                presence_file.abort()
             self.logger.error(f"Error processing file {filepath}: {str(e)}")
-            return filepath, {}, {}
+            return filepath, {}, {}, False
+
+    def process_queue(self, task_queue, result_queue):
+        """Worker loop that accumulates stats across every file it handles.
+
+        Files are taken from task_queue until a None sentinel is received; the
+        merged client and provider counters are then put on result_queue once.
+
+        Args:
+            task_queue: Queue of file paths or FileShards to process
+            result_queue: Queue receiving a single (client_payload, provider_payload) tuple
+        """
+        client_stats = {}
+        provider_stats = {}
+        for task in iter(task_queue.get, None):
+            _, file_client_stats, file_provider_stats, _ = self.process_file(task)
+            StatsUpdater.merge_counts(client_stats, file_client_stats)
+            StatsUpdater.merge_counts(provider_stats, file_provider_stats)
+
+        result_queue.put((CountsPayload.pack(client_stats), CountsPayload.pack(provider_stats)))
+
+    def process_file_payload(self, task):
+        """Process a file or shard and pack its stats for sending to the main process.
+
+        Returns:
+            tuple: (client_payload, provider_payload) as CountsPayload objects
+        """
+        _, client_stats, provider_stats, _ = self.process_file(task)
+        return CountsPayload.pack(client_stats), CountsPayload.pack(provider_stats)
+
+    def process_file_partial(self, task):
+        """Fingerprint and process a file or shard for storing as a cached partial.
+
+        The size and mtime are taken before processing so that a file modified
+        while it is read is picked up again by the next incremental run. The
+        content hash is computed from the compressed bytes as they are read,
+        so the file is not read a second time. The shards of a file carry the
+        fingerprint taken when it was recompressed.
+
+        Returns:
+            tuple: (task, fingerprint, client_payload, provider_payload, succeeded)
+        """
+        if isinstance(task, FileShard):
+            fingerprint = task.fingerprint
+            _, client_stats, provider_stats, succeeded = self.process_file(task)
+        else:
+            fingerprint = PartialStatsStore.file_stat(task)
+            digest = hashlib.sha256()
+            _, client_stats, provider_stats, succeeded = self.process_file(task, digest)
+            fingerprint['sha256'] = digest.hexdigest()
+        return (task, fingerprint, CountsPayload.pack(client_stats),
+                CountsPayload.pack(provider_stats), succeeded)
+
+
+class StreamingJsonWriter:
+    """Streams a {"data": [...], "meta": {...}} document one item at a time.
+
+    Items are serialized with orjson as they are written, so the document is
+    never built in memory. Output goes to a temporary file next to the target
+    that only replaces it on commit. Indented output matches json.dump(...,
+    indent=2), apart from non-ASCII characters being written as UTF-8 rather
+    than \\u escapes.
+    """
+
+    GZIP_LEVEL = 6
+
+    def __init__(self, path, compact=False, compression=None):
+        """Open the temporary file.
+
+        Args:
+            path (Path): Final path of the document
+            compact (bool): Write without indentation
+            compression (str, optional): 'gzip' to compress the output
+        """
+        self.path = Path(path)
+        self.temp_path = self.path.with_name(self.path.name + '.tmp')
+        self.compact = compact
+        self.option = 0 if compact else orjson.OPT_INDENT_2
+        self.count = 0
+        self._raw_file = open(self.temp_path, 'wb')
+        self._file = self._raw_file
+        if compression == 'gzip':
+            gzip_file = gzip_ng.GzipNGFile if gzip_ng is not None else gzip.GzipFile
+            self._file = gzip_file(fileobj=self._raw_file, mode='wb',
+                                   compresslevel=self.GZIP_LEVEL, mtime=0)
+        self._file.write(b'{"data":[' if compact else b'{\n  "data": [')
+
+    def _dumps(self, value, depth):
+        serialized = orjson.dumps(value, option=self.option)
+        if self.compact:
+            return serialized
+        return serialized.replace(b'\n', b'\n' + b'  ' * depth)
+
+    def write(self, item):
+        if self.compact:
+            self._file.write(b',' if self.count else b'')
+        else:
+            self._file.write(b',\n    ' if self.count else b'\n    ')
+        self._file.write(self._dumps(item, 2))
+        self.count += 1
+
+    def finish(self, meta):
+        """Write the end of the document and close the temporary file.
+
+        Args:
+            meta (dict): Value of the "meta" key
+        """
+        if self.compact:
+            self._file.write(b'],"meta":' + self._dumps(meta, 1) + b'}')
+        else:
+            self._file.write(b'\n  ],' if self.count else b'],')
+            self._file.write(b'\n  "meta": ' + self._dumps(meta, 1) + b'\n}')
+        self._close()
+
+    def commit(self):
+        """Move the finished document into place."""
+        os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        """Discard the temporary file."""
+        self._close()
+        self.temp_path.unlink(missing_ok=True)
+
+    def _close(self):
+        if self._file is not self._raw_file:
+            self._file.close()
+        self._raw_file.close()
+
+
+class IndexedJsonlWriter:
+    """Writes one compact JSON record per entity plus an offsets index.
+
+    Records are appended to a .jsonl file and the index maps every entity ID
+    to the [offset, length] of its record, so a single entity's stats can be
+    served with one pread (or a slice of an mmap) and parsed on its own.
+    With gzip compression every record is a separate gzip member, which
+    keeps the data file a valid .jsonl.gz while records stay individually
+    readable. Both files are written under temporary names and replaced on
+    commit, data file first.
+    """
+
+    INDEX_VERSION = 1
+
+    def __init__(self, path, compression=None):
+        """Open the temporary data file.
+
+        Args:
+            path (Path): Final path of the data file
+            compression (str, optional): 'gzip' to compress every record
+        """
+        self.path = Path(path)
+        self.temp_path = self.path.with_name(self.path.name + '.tmp')
+        self.index_path = self.path.with_name(self.path.name.split('.')[0] + '.index.json')
+        self.temp_index_path = self.index_path.with_name(self.index_path.name + '.tmp')
+        self.compression = compression
+        self.count = 0
+        self.offset = 0
+        self.entities = {}
+        self._file = open(self.temp_path, 'wb')
+
+    def write(self, item):
+        record = orjson.dumps(item) + b'\n'
+        if self.compression == 'gzip':
+            gzip_module = gzip_ng or gzip
+            record = gzip_module.compress(record, compresslevel=StreamingJsonWriter.GZIP_LEVEL, mtime=0)
+        self._file.write(record)
+        self.entities[item['id']] = [self.offset, len(record)]
+        self.offset += len(record)
+        self.count += 1
+
+    def finish(self, meta):
+        """Close the data file and write the index to its temporary path.
+
+        Args:
+            meta (dict): Value of the "meta" key of the index
+        """
+        self._file.close()
+        with open(self.temp_index_path, 'wb') as f:
+            f.write(orjson.dumps({
+                'version': self.INDEX_VERSION,
+                'data': self.path.name,
+                'compression': self.compression or 'none',
+                'meta': meta,
+                'entities': self.entities
+            }))
+
+    def commit(self):
+        """Move the data file and then its index into place."""
+        os.replace(self.temp_path, self.path)
+        os.replace(self.temp_index_path, self.index_path)
+
+    def abort(self):
+        """Discard the temporary files."""
+        self._file.close()
+        self.temp_path.unlink(missing_ok=True)
+        self.temp_index_path.unlink(missing_ok=True)
 
 
 class OutputWriter:
     """Handles final output writing and validation for  metadata statistics."""
 
-    def __init__(self):
+    REQUIRED_FIELDS = {
+        'providers_attributes': {'id', 'type', 'attributes', 'relationships'},
+        'clients_attributes': {'id', 'type', 'attributes', 'relationships'},
+        'providers_stats': {'id', 'stats'},
+        'clients_stats': {'id', 'stats'}
+    }
+
+    STATS_LAYOUTS = ('single', 'indexed')
+
+    def __init__(self, compact=False, compression=None, stats_layout='single'):
+        """Initialize the output writer.
+
+        Args:
+            compact (bool): Write JSON without indentation
+            compression (str, optional): 'gzip' to write .json.gz files
+            stats_layout (str): 'single' to write each stats file as one JSON
+                document, 'indexed' to write one record per entity plus an
+                offsets index (see IndexedJsonlWriter)
+        """
+        self.compact = compact
+        self.compression = compression
+        self.stats_layout = stats_layout
         self.logger = logging.getLogger('datacite.output_writer')
 
-    def validate_output(self, data, data_type, output_type):
-        """Validate output data structure.
+    def validate_item(self, item, data_type, output_type):
+        """Validate the structure of a single output item.
 
         Args:
-            data (list): List of data items to validate
+            item (dict): Data item to validate
             data_type (str): Type of data ('providers' or 'clients')
             output_type (str): Type of output ('attributes' or 'stats')
 
         Returns:
             bool: True if valid, False otherwise
         """
-        required_fields = {
-            'providers_attributes': {'id', 'type', 'attributes', 'relationships'},
-            'clients_attributes': {'id', 'type', 'attributes', 'relationships'},
-            'providers_stats': {'id', 'stats'},
-            'clients_stats': {'id', 'stats'}
+        validation_key = f"{data_type}_{output_type}"
+        missing_fields = self.REQUIRED_FIELDS[validation_key] - item.keys()
+        if missing_fields:
+            self.logger.error(
+                f"Missing required fields in {validation_key}: {missing_fields}"
+            )
+            return False
+        return True
+
+    @staticmethod
+    def split_item(item, keep_stats=False):
+        """Return the attributes or the stats component of a data item."""
+        if keep_stats:
+            return {'id': item['id'], 'stats': item['stats']}
+        return {
+            'id': item['id'],
+            'type': item['type'],
+            'attributes': item['attributes'],
+            'relationships': item['relationships']
         }
 
-        validation_key = f"{data_type}_{output_type}"
+    def output_path(self, output_dir, name, indexed=False):
+        extension = 'jsonl' if indexed else 'json'
+        return Path(output_dir) / f"{name}.{extension}{'.gz' if self.compression == 'gzip' else ''}"
 
-        for item in data:
-            missing_fields = required_fields[validation_key] - set(item.keys())
-            if missing_fields:
-                self.logger.error(
-                    f"Missing required fields in {validation_key}: {missing_fields}"
-                )
-                return False
-        return True
+    def open_writer(self, output_path):
+        return StreamingJsonWriter(output_path, compact=self.compact, compression=self.compression)
+
+    def open_stats_writer(self, output_dir, data_type):
+        if self.stats_layout == 'indexed':
+            return IndexedJsonlWriter(
+                self.output_path(output_dir, f'{data_type}_stats', indexed=True),
+                compression=self.compression
+            )
+        return self.open_writer(self.output_path(output_dir, f'{data_type}_stats'))
+
+    def write_output(self, provider_data, client_data, output_dir):
+        """Stream the attributes and stats files of providers and clients.
 
-    def split_data(self, data, keep_stats=False):
-        """Split data into attributes and stats components.
+        Every entity is validated and written to its attributes and stats
+        files in a single pass. Files are written to temporary paths and only
+        moved into place once all four are complete.
 
         Args:
-            data (list): List of data items to split
-            keep_stats (bool): Whether to keep stats (True) or attributes (False)
+            provider_data (dict): Provider ID -> entry
+            client_data (dict): Client ID -> entry
+            output_dir (str): Output directory
 
         Returns:
-            list: Split data items
+            bool: True if all files were written, False otherwise
         """
-        result = []
-        for item in data:
-            new_item = {}
-            if keep_stats:
-                new_item = {'id': item['id'], 'stats': item['stats']}
-            else:
-                new_item = {
-                    'id': item['id'],
-                    'type': item['type'],
-                    'attributes': item['attributes'],
-                    'relationships': item['relationships']
-                }
-            result.append(new_item)
-        return result
-
-    def write_output(self, provider_data, client_data, output_dir):
+        writers = []
         try:
             output_dir = Path(output_dir)
             output_dir.mkdir(parents=True, exist_ok=True)
             timestamp = datetime.now().isoformat()
 
-            provider_output = list(provider_data.values())
-            client_output = list(client_data.values())
-
-            provider_attributes = self.split_data(
-                provider_output, keep_stats=False)
-            provider_stats = self.split_data(provider_output, keep_stats=True)
-            client_attributes = self.split_data(
-                client_output, keep_stats=False)
-            client_stats = self.split_data(client_output, keep_stats=True)
-
-            validations = [
-                ('providers', 'attributes', provider_attributes),
-                ('providers', 'stats', provider_stats),
-                ('clients', 'attributes', client_attributes),
-                ('clients', 'stats', client_stats)
-            ]
-
-            for data_type, output_type, data in validations:
-                if not self.validate_output(data, data_type, output_type):
-                    self.logger.error(f"Validation failed for {data_type}_{output_type}")
-                    return False
-
-            output_files = {
-                'providers_attributes.json': provider_attributes,
-                'providers_stats.json': provider_stats,
-                'clients_attributes.json': client_attributes,
-                'clients_stats.json': client_stats
-            }
-
-            for filename, data in output_files.items():
-                output_path = output_dir / filename
-                with open(output_path, 'w') as f:
-                    json.dump({
-                        'data': data,
-                        'meta': {
-                            'total': len(data),
-                            'timestamp': timestamp
-                        }
-                    }, f, indent=2)
-
-                self.logger.info(f"Wrote {len(data)} records to {output_path}")
+            for data_type, data in (('providers', provider_data), ('clients', client_data)):
+                attributes_writer = self.open_writer(self.output_path(output_dir, f'{data_type}_attributes'))
+                writers.append(attributes_writer)
+                stats_writer = self.open_stats_writer(output_dir, data_type)
+                writers.append(stats_writer)
+
+                for item in data.values():
+                    if not (self.validate_item(item, data_type, 'attributes')
+                            and self.validate_item(item, data_type, 'stats')):
+                        self.logger.error(f"Validation failed for {data_type} output")
+                        for writer in writers:
+                            writer.abort()
+                        return False
+                    attributes_writer.write(self.split_item(item, keep_stats=False))
+                    stats_writer.write(self.split_item(item, keep_stats=True))
+
+            for writer in writers:
+                writer.finish({'total': writer.count, 'timestamp': timestamp})
+            for writer in writers:
+                writer.commit()
+                self.logger.info(f"Wrote {writer.count} records to {writer.path}")
 
             self.logger.info(f"Successfully wrote all output files to {output_dir}")
             return True
 
         except Exception as e:
+            for writer in writers:
+                if writer.temp_path.exists():
+                    writer.abort()
             self.logger.error(f"Error writing output: {str(e)}")
             return False
 
-    def validate_and_write_single(self, output_path, data, data_type, output_type):
-        try:
-            if not self.validate_output(data, data_type, output_type):
-                return False
 
-            timestamp = datetime.now().isoformat()
+class SQLiteStatsWriter:
+    """Writes the final stats as normalized long-format tables to a SQLite database.
+
+    Every provider and client section (the summary, with NULL resource_type
+    and time_bucket, each resource type and each time bucket) becomes a row
+    of sections, with one row per field
+    and subfield in field_stats and one row per vocabulary value in
+    value_counts, so the stats can be queried with SQL instead of loading the
+    nested JSON. The database is built under a temporary name and replaces
+    the previous one when complete.
+    """
+
+    SCHEMA = """
+        CREATE TABLE entities (
+            entity_type TEXT NOT NULL,
+            entity_id TEXT NOT NULL,
+            name TEXT,
+            symbol TEXT,
+            provider_id TEXT,
+            PRIMARY KEY (entity_type, entity_id)
+        );
+        CREATE TABLE sections (
+            entity_type TEXT NOT NULL,
+            entity_id TEXT NOT NULL,
+            resource_type TEXT,
+            time_bucket TEXT,
+            count INTEGER NOT NULL,
+            mandatory_completeness REAL,
+            recommended_completeness REAL,
+            optional_completeness REAL
+        );
+        CREATE TABLE field_stats (
+            entity_type TEXT NOT NULL,
+            entity_id TEXT NOT NULL,
+            resource_type TEXT,
+            time_bucket TEXT,
+            field TEXT NOT NULL,
+            subfield TEXT,
+            field_status TEXT,
+            count INTEGER NOT NULL,
+            instances INTEGER NOT NULL,
+            missing INTEGER NOT NULL,
+            completeness REAL NOT NULL
+        );
+        CREATE TABLE value_counts (
+            entity_type TEXT NOT NULL,
+            entity_id TEXT NOT NULL,
+            resource_type TEXT,
+            time_bucket TEXT,
+            field TEXT NOT NULL,
+            subfield TEXT NOT NULL,
+            value TEXT NOT NULL,
+            count INTEGER NOT NULL
+        );
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    INDEXES = """
+        CREATE UNIQUE INDEX sections_entity ON sections (entity_type, entity_id, resource_type, time_bucket);
+        CREATE INDEX field_stats_entity ON field_stats (entity_type, entity_id, resource_type, time_bucket);
+        CREATE INDEX field_stats_completeness ON field_stats (field, subfield, completeness);
+        CREATE INDEX value_counts_entity ON value_counts (entity_type, entity_id, resource_type, time_bucket);
+        CREATE INDEX value_counts_value ON value_counts (field, subfield, value);
+    """
+
+    def __init__(self, time_dimension=None):
+        """Initialize the writer.
 
-            with open(output_path, 'w') as f:
-                json.dump({
-                    'data': data,
-                    'meta': {
-                        'total': len(data),
-                        'timestamp': timestamp
-                    }
-                }, f, indent=2)
+        Args:
+            time_dimension (str, optional): Time dimension of the stats, recorded in meta
+        """
+        self.time_dimension = time_dimension
+        self.logger = logging.getLogger('datacite.sqlite_writer')
+
+    @staticmethod
+    def section_rows(entity_type, entity_id, resource_type, time_bucket, section):
+        """Return the sections, field_stats and value_counts rows of a stats section."""
+        categories = section.get('categories', {})
+        section_row = (
+            entity_type, entity_id, resource_type, time_bucket, section['count'],
+            *(categories.get(status, {}).get('completeness') for status in StatsSkeleton.CATEGORIES)
+        )
+        field_rows = []
+        value_rows = []
+        for field_name, field_stats in section['fields'].items():
+            field_rows.append((
+                entity_type, entity_id, resource_type, time_bucket, field_name, None,
+                field_stats['fieldStatus'],
+                field_stats['count'], field_stats['instances'], field_stats['missing'],
+                field_stats['completeness']
+            ))
+            for subfield, subfield_stats in field_stats.get('subfields', {}).items():
+                field_rows.append((
+                    entity_type, entity_id, resource_type, time_bucket, field_name, subfield, None,
+                    subfield_stats['count'], subfield_stats['instances'], subfield_stats['missing'],
+                    subfield_stats['completeness']
+                ))
+                for value, count in subfield_stats.get('values', {}).items():
+                    value_rows.append((
+                        entity_type, entity_id, resource_type, time_bucket, field_name, subfield, value, count
+                    ))
+        return section_row, field_rows, value_rows
+
+    def write(self, provider_data, client_data, database_path):
+        """Write the stats of providers and clients to a SQLite database.
+
+        Args:
+            provider_data (dict): Provider ID -> finalized entry
+            client_data (dict): Client ID -> finalized entry
+            database_path (str): Path of the database file
 
-            self.logger.info(f"Wrote {len(data)} records to {output_path}")
+        Returns:
+            bool: True if the database was written, False otherwise
+        """
+        database_path = Path(database_path)
+        temp_path = database_path.with_name(database_path.name + '.tmp')
+        try:
+            database_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path.unlink(missing_ok=True)
+            connection = sqlite3.connect(temp_path)
+            try:
+                connection.execute('PRAGMA journal_mode = OFF')
+                connection.execute('PRAGMA synchronous = OFF')
+                connection.executescript(self.SCHEMA)
+                totals = {'sections': 0, 'field_stats': 0, 'value_counts': 0}
+                with connection:
+                    for entity_type, data in (('providers', provider_data), ('clients', client_data)):
+                        for entity_id, entry in data.items():
+                            attributes = entry.get('attributes') or {}
+                            relationships = entry.get('relationships') or {}
+                            connection.execute(
+                                'INSERT INTO entities VALUES (?, ?, ?, ?, ?)',
+                                (entity_type, entity_id, attributes.get('name'), attributes.get('symbol'),
+                                 relationships.get('provider'))
+                            )
+                            stats = entry['stats']
+                            sections = [(None, None, stats['summary'])]
+                            sections.extend(
+                                (resource_type, None, section)
+                                for resource_type, section in stats['byResourceType']['resourceTypes'].items()
+                            )
+                            sections.extend(
+                                (None, time_bucket, section)
+                                for time_bucket, section in stats.get('byTime', {}).get('buckets', {}).items()
+                            )
+                            for resource_type, time_bucket, section in sections:
+                                section_row, field_rows, value_rows = self.section_rows(
+                                    entity_type, entity_id, resource_type, time_bucket, section)
+                                connection.execute(
+                                    'INSERT INTO sections VALUES (?, ?, ?, ?, ?, ?, ?, ?)', section_row)
+                                connection.executemany(
+                                    'INSERT INTO field_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', field_rows)
+                                connection.executemany(
+                                    'INSERT INTO value_counts VALUES (?, ?, ?, ?, ?, ?, ?, ?)', value_rows)
+                                totals['sections'] += 1
+                                totals['field_stats'] += len(field_rows)
+                                totals['value_counts'] += len(value_rows)
+                    connection.executemany('INSERT INTO meta VALUES (?, ?)', [
+                        ('timestamp', datetime.now().isoformat()),
+                        ('time_dimension', self.time_dimension),
+                        ('providers', str(len(provider_data))),
+                        ('clients', str(len(client_data)))
+                    ])
+                connection.executescript(self.INDEXES)
+                connection.execute('ANALYZE')
+            finally:
+                connection.close()
+            os.replace(temp_path, database_path)
+
+            self.logger.info(
+                f"Wrote {totals['sections']} sections, {totals['field_stats']} field stats and "
+                f"{totals['value_counts']} value counts to {database_path}"
+            )
             return True
 
         except Exception as e:
-            self.logger.error(f"Error writing {output_path}: {str(e)}")
+            temp_path.unlink(missing_ok=True)
+            self.logger.error(f"Error writing {database_path}: {str(e)}")
             return False
 
 
@@ -1249,18 +3205,192 @@ class DataCiteDataFileProcessor:
     def __init__(self):
         self.logger = None
 
-    def init_worker(self, counter, lock, total_files):
+    @staticmethod
+    def init_worker(counter, total_files, log_level, prefix_index=None, file_processor=None):
         """Initialize the worker processes (w/ shared state).
 
         Args:
-            counter: Shared counter for progress tracking
-            lock: Lock for thread-safe operations
-            total_files: Total number of files to process
+            counter (multiprocessing.Value): Shared count of completed files,
+                handed over when the worker starts rather than with every task
+            total_files (int): Total number of files to process
+            log_level (str): Logging level, for workers started with spawn
+            prefix_index (PrefixIndex, optional): Index attributing records
+                without relationships, likewise handed over once per worker
+            file_processor (FileProcessor, optional): Processor run by
+                run_file_task, so tasks only carry their file or shard
         """
-        global _counter, _lock, _total_files
+        global _counter, _total_files, _prefix_index, _file_processor
         _counter = counter
-        _lock = lock
         _total_files = total_files
+        _prefix_index = prefix_index
+        _file_processor = file_processor
+        LoggerSetup.configure(log_level)
+
+    @staticmethod
+    def run_file_task(method, task):
+        """Run a method of the worker's file processor on a file or shard."""
+        return getattr(_file_processor, method)(task)
+
+    @staticmethod
+    def run_queue_worker(file_processor, task_queue, result_queue, progress):
+        """Entry point of the long-lived workers of the worker merge mode."""
+        DataCiteDataFileProcessor.init_worker(*progress)
+        file_processor.process_queue(task_queue, result_queue)
+
+    def process_files_per_file(self, file_processor, batches, scheduler, worker_pool, progress,
+                               partials_store=None):
+        """Process batches of files in a pool, yielding the stats of every file.
+
+        Args:
+            file_processor (FileProcessor): Processor applied to each file,
+                installed once in every worker by init_worker
+            batches (list): Batches of file paths and FileShards from the scheduler
+            scheduler (TaskScheduler): Scheduler recording the workers' busy time
+            worker_pool (WorkerPool): Pool running the batches
+            progress (tuple): Arguments of init_worker
+            partials_store (PartialStatsStore, optional): Store receiving the
+                partial stats of every processed file; the shards of a file are
+                combined before it is stored
+
+        Yields:
+            tuple: (client_payload, provider_payload) for each file or shard
+        """
+        if partials_store is None:
+            for pid, elapsed, results in worker_pool.imap_unordered(
+                partial(TaskScheduler.run_batch, partial(self.run_file_task, 'process_file_payload')),
+                batches,
+                initializer=self.init_worker,
+                initargs=progress + (file_processor,)
+            ):
+                scheduler.record(pid, elapsed)
+                yield from results
+            return
+
+        shard_results = {}
+        for pid, elapsed, results in worker_pool.imap_unordered(
+            partial(TaskScheduler.run_batch, partial(self.run_file_task, 'process_file_partial')),
+            batches,
+            initializer=self.init_worker,
+            initargs=progress + (file_processor,)
+        ):
+            scheduler.record(pid, elapsed)
+            yield from self._save_partials(results, shard_results, partials_store)
+
+    def _save_partials(self, results, shard_results, partials_store):
+        """Store the partials of processed files, yielding their payloads.
+
+        The shards of a file are held back in shard_results until all of them
+        are processed, and then combined into a single partial. Files that
+        failed, or any of whose shards failed, are not stored, so the next
+        incremental run processes them again.
+        """
+        for task, fingerprint, client_payload, provider_payload, succeeded in results:
+            if isinstance(task, FileShard):
+                shard_payloads = shard_results.setdefault(task.source, [])
+                shard_payloads.append((client_payload, provider_payload, succeeded))
+                if len(shard_payloads) == task.count:
+                    del shard_results[task.source]
+                    if all(payloads[2] for payloads in shard_payloads):
+                        partials_store.save(
+                            task.source,
+                            fingerprint,
+                            CountsPayload.combine([payloads[0] for payloads in shard_payloads]),
+                            CountsPayload.combine([payloads[1] for payloads in shard_payloads])
+                        )
+                    else:
+                        self.logger.warning(f"Not storing partial stats of {task.source}: a shard failed")
+            elif succeeded:
+                partials_store.save(task, fingerprint, client_payload, provider_payload)
+            else:
+                self.logger.warning(f"Not storing partial stats of {task}: processing failed")
+            yield client_payload, provider_payload
+
+    def shard_files(self, sharder, files, worker_pool):
+        """Split large files into shards, recompressing stale ones in parallel.
+
+        Args:
+            sharder (FileSharder): Sharder holding the recompressed copies
+            files (list): File paths to process
+            worker_pool (WorkerPool): Pool recompressing the stale files
+
+        Returns:
+            list: Tasks (file paths and FileShards) covering every file
+        """
+        large_files = [filepath for filepath in files if sharder.needs_sharding(filepath)]
+        indexes = {filepath: sharder.load_index(filepath) for filepath in large_files}
+        stale_files = [filepath for filepath, index in indexes.items() if index is None]
+        if stale_files:
+            self.logger.info(f"Recompressing {len(stale_files)} large files into shardable gzip members")
+            for filepath in worker_pool.imap_unordered(sharder.build, stale_files):
+                indexes[filepath] = sharder.load_index(filepath)
+
+        tasks = []
+        shard_count = 0
+        for filepath in files:
+            if indexes.get(filepath):
+                shards = sharder.shards(filepath, indexes[filepath])
+                shard_count += len(shards)
+                tasks.extend(shards)
+            else:
+                tasks.append(filepath)
+
+        self.logger.info(f"Split {len(large_files)} large files into {shard_count} shards")
+        return tasks
+
+    def process_files_per_worker(self, file_processor, files, worker_pool, progress):
+        """Process files in long-lived workers that each accumulate their own stats.
+
+        Every worker returns a single result once all files are processed, so
+        the number of results merged in the main process scales with the
+        number of workers rather than the number of files.
+
+        Args:
+            file_processor (FileProcessor): Processor run by every worker
+            files (list): File paths to process
+            worker_pool (WorkerPool): Pool providing the worker count and
+                multiprocessing context
+            progress (tuple): Arguments of init_worker
+
+        Yields:
+            tuple: (client_payload, provider_payload) for each worker
+        """
+        num_workers = max(1, min(worker_pool.processes, len(files)))
+        task_queue = worker_pool.context.Queue()
+        result_queue = worker_pool.context.Queue()
+        for filepath in files:
+            task_queue.put(filepath)
+        for _ in range(num_workers):
+            task_queue.put(None)
+
+        workers = [
+            worker_pool.context.Process(
+                target=self.run_queue_worker,
+                args=(file_processor, task_queue, result_queue, progress)
+            )
+            for _ in range(num_workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        try:
+            received = 0
+            while received < num_workers:
+                try:
+                    result = result_queue.get(timeout=5)
+                except queue.Empty:
+                    if not any(worker.is_alive() for worker in workers) and result_queue.empty():
+                        raise RuntimeError(
+                            f"{num_workers - received} worker(s) exited without returning stats"
+                        )
+                    continue
+                received += 1
+                yield result
+
+        finally:
+            for worker in workers:
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
 
     def run(self):
         try:
@@ -1268,8 +3398,8 @@ class DataCiteDataFileProcessor:
             
             self.logger = LoggerSetup.configure(config.log_level)
             
-            api_client = DataCiteAPIClient(config.cache_dir)
-            stats_container = StatsContainer()
+            api_client = DataCiteAPIClient(config.cache_dir, config.registry_max_age)
+            stats_container = StatsContainer(config.time_dimension)
             provider_client_manager = ProviderClientManager(stats_container)
             
             provider_client_manager.initialize_output_structure(api_client)
@@ -1283,51 +3413,126 @@ class DataCiteDataFileProcessor:
                 return 1
             
             self.logger.info(f"Found {total_files} files to process")
-            
-            counter = Manager().Value('i', 0)
-            lock = Manager().Lock()
+
+            decompressor = GzipDecompressor(config.decompression)
+            self.logger.info(f"Using {decompressor.backend} decompression backend")
+
+            if config.decoding == 'projected' and not ProjectedRecordDecoder.is_available():
+                self.logger.error("Projected decoding requires msgspec (pip install msgspec)")
+                return 1
+            decoder = None
+            if config.decoding == 'projected' or (
+                config.decoding == 'auto' and ProjectedRecordDecoder.is_available()
+            ):
+                decoder = ProjectedRecordDecoder()
+            self.logger.info(f"Using {'projected' if decoder else 'full'} JSON decoding")
+
+            presence_matrix = None
+            if config.presence_dir:
+                if not PresenceMatrix.is_available():
+                    self.logger.error("--presence-dir requires pyarrow (pip install pyarrow)")
+                    return 1
+                presence_matrix = PresenceMatrix(config.presence_dir, stats_container.layout)
+
+            worker_pool = WorkerPool(config.processes, config.pool_backend, config.max_tasks_per_child)
+            self.logger.info(
+                f"Using {worker_pool.processes} worker processes ({worker_pool.backend} backend, "
+                f"{WorkerPool.available_cpus()} CPUs available)"
+            )
+
+            files_to_process = files['files']
+            cached_results = []
+            partials_store = None
+            if config.incremental:
+                partials_store = PartialStatsStore(
+                    config.partials_dir, stats_container.layout, provider_client_manager.prefix_index,
+                    presence_matrix
+                )
+                files_to_process = []
+                for filepath in files['files']:
+                    cached = partials_store.load(filepath)
+                    if cached is None:
+                        files_to_process.append(filepath)
+                    else:
+                        cached_results.append(cached)
+                partials_store.prune(files['files'])
+
+                self.logger.info(
+                    f"Incremental run: reusing {len(cached_results)} cached partials, "
+                    f"processing {len(files_to_process)} new or changed files"
+                )
+                if config.merge_mode == 'worker':
+                    self.logger.warning("Incremental runs need per-file stats; using file merge mode")
+                    config.merge_mode = 'file'
+
+            if config.shard_size > 0:
+                sharder = FileSharder(config.shard_dir, config.shard_size * 2**20, decompressor=decompressor)
+                sharder.prune(files['files'])
+                files_to_process = self.shard_files(sharder, files_to_process, worker_pool)
+            scheduler = TaskScheduler(workers=worker_pool.processes)
+            batches = scheduler.plan(files_to_process)
+
+            progress = (
+                worker_pool.context.Value('i', 0),
+                len(files_to_process),
+                config.log_level,
+                provider_client_manager.prefix_index
+            )
             file_processor = FileProcessor(
                 stats_container=stats_container,
-                counter=counter,
-                lock=lock,
-                total_files=total_files
+                decompressor=decompressor,
+                decoder=decoder,
+                presence_matrix=presence_matrix
             )
-            
-            try:
-                pool = Pool(
-                    processes=max(1, cpu_count() - 1),
-                    initializer=self.init_worker,
-                    initargs=(counter, lock, total_files)
-                )
-                
-                for filepath, file_client_stats, file_provider_stats in pool.imap_unordered(
-                    file_processor.process_file,
-                    files['files']
-                ):
-                    for client_id, stats in file_client_stats.items():
-                        provider_client_manager.merge_client_stats(client_id, stats)
 
-                    for provider_id, stats in file_provider_stats.items():
-                        provider_client_manager.merge_provider_stats(provider_id, stats)
+            processing_start = time.perf_counter()
+            if config.merge_mode == 'worker':
+                results = self.process_files_per_worker(
+                    file_processor, list(chain.from_iterable(batches)), worker_pool, progress)
+            else:
+                results = self.process_files_per_file(
+                    file_processor, batches, scheduler, worker_pool, progress, partials_store)
+            results = chain(cached_results, results)
+
+            merge_time = 0.0
+            merged_results = 0
+            merged_bytes = 0
+            for client_payload, provider_payload in results:
+                merge_start = time.perf_counter()
+                provider_client_manager.merge_client_payload(client_payload)
+                provider_client_manager.merge_provider_payload(provider_payload)
+                merge_time += time.perf_counter() - merge_start
+                merged_results += 1
+                merged_bytes += client_payload.nbytes + provider_payload.nbytes
+
+            scheduler.log_makespan(time.perf_counter() - processing_start)
+            self.logger.info(
+                f"Merged {merged_results} {config.merge_mode} results "
+                f"({merged_bytes / 2**20:.1f} MB of counters) in the main process in {merge_time:.2f}s"
+            )
+            if resource is not None:
+                # ru_maxrss is in kilobytes on Linux
+                peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+                self.logger.info(f"Peak main process RSS after merging: {peak_rss:.1f} MB")
 
-                    del file_client_stats
-                    del file_provider_stats
+            if partials_store is not None:
+                partials_store.write_manifest()
 
-            finally:
-                pool.close()
-                pool.join()
-            
             self.logger.info("Filtering active providers and clients")
             provider_client_manager.filter_active_only()
             
             self.logger.info("Creating aggregate entries for all DataCite providers and clients")
             provider_client_manager.create_aggregate_entries()
             
-            self.logger.info("Cleaning resource types")
-            provider_client_manager.clean_resource_types()
+            self.logger.info("Finalizing stats and cleaning resource types")
+            provider_client_manager.finalize_stats()
             
             self.logger.info(f"Writing output to {config.output_dir}")
-            output_writer = OutputWriter()
+            output_writer = OutputWriter(
+                compact=config.compact_output,
+                compression=config.output_compression,
+                stats_layout=config.stats_layout
+            )
             success = output_writer.write_output(
                 provider_data=provider_client_manager.get_providers(),
                 client_data=provider_client_manager.get_clients(),
@@ -1338,6 +3543,17 @@ class DataCiteDataFileProcessor:
                 self.logger.error("Failed to write output files")
                 return 1
 
+            if config.sqlite:
+                self.logger.info(f"Writing SQLite database to {config.sqlite}")
+                sqlite_writer = SQLiteStatsWriter(config.time_dimension)
+                if not sqlite_writer.write(
+                    provider_client_manager.get_providers(),
+                    provider_client_manager.get_clients(),
+                    config.sqlite
+                ):
+                    self.logger.error("Failed to write SQLite database")
+                    return 1
+
             self.logger.info("Processing completed successfully")
             return 0
 
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from process_data_file_for_metadata_health_api import DataCiteAPIClient
+
+
+class RegistryHandler(BaseHTTPRequestHandler):
+    """Serves paged /providers with a strong ETag per page, honouring If-None-Match."""
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        size = int(query['page[size]'][0])
+        number = int(query['page[number]'][0])
+        items = self.server.items[(number - 1) * size:number * size]
+        body = json.dumps({
+            'data': items,
+            'meta': {'totalPages': -(-len(self.server.items) // size)},
+        }).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get('If-None-Match') == etag:
+            status = 304
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+        else:
+            status = 200
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+        with self.server.lock:
+            self.server.requests.append((url.path, number, self.headers.get('If-None-Match'), status))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def registry():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RegistryHandler)
+    server.items = [
+        {'id': f'p{number}', 'type': 'providers', 'attributes': {'name': f'P{number}', 'updated': '1'}}
+        for number in range(5)
+    ]
+    server.requests = []
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(registry, cache_dir, max_age=None):
+    client = DataCiteAPIClient(cache_dir=cache_dir, max_age=max_age, base_url=registry.url)
+    return client.get_all_pages('providers', page_size=2)
+
+
+def expire(cache_dir, seconds):
+    pages_file = cache_dir / 'providers.pages.json'
+    pages_meta = json.loads(pages_file.read_text())
+    pages_meta['fetched_at'] -= seconds
+    pages_file.write_text(json.dumps(pages_meta))
+
+
+def test_fetch_writes_cache_and_sidecar(registry, tmp_path):
+    items = fetch(registry, tmp_path)
+
+    assert items == registry.items
+    assert sorted(status for _, _, _, status in registry.requests) == [200, 200, 200]
+    assert json.loads((tmp_path / 'providers.json').read_text()) == registry.items
+    pages_meta = json.loads((tmp_path / 'providers.pages.json').read_text())
+    assert pages_meta['page_size'] == 2
+    assert [page['count'] for page in pages_meta['pages']] == [2, 2, 1]
+    assert all(page['etag'] for page in pages_meta['pages'])
+
+
+def test_fresh_cache_is_reused_without_requests(registry, tmp_path):
+    fetch(registry, tmp_path)
+    registry.requests.clear()
+
+    assert fetch(registry, tmp_path, max_age=3600) == registry.items
+    assert fetch(registry, tmp_path) == registry.items
+    assert registry.requests == []
+
+
+def test_expired_cache_is_revalidated_with_conditional_requests(registry, tmp_path):
+    fetch(registry, tmp_path)
+    etags = [page['etag'] for page in json.loads((tmp_path / 'providers.pages.json').read_text())['pages']]
+    expire(tmp_path, 7200)
+    registry.requests.clear()
+    refreshed_after = time.time()
+
+    assert fetch(registry, tmp_path, max_age=3600) == registry.items
+    assert sorted(registry.requests) == [
+        ('/providers', number, etag, 304) for number, etag in enumerate(etags, 1)
+    ]
+    pages_meta = json.loads((tmp_path / 'providers.pages.json').read_text())
+    assert pages_meta['fetched_at'] >= refreshed_after
+    assert [page['etag'] for page in pages_meta['pages']] == etags
+
+
+def test_expired_cache_refetches_changed_pages(registry, tmp_path):
+    fetch(registry, tmp_path)
+    expire(tmp_path, 7200)
+    registry.items[3]['attributes']['updated'] = '2'
+    registry.items.append({'id': 'p5', 'type': 'providers', 'attributes': {'name': 'P5', 'updated': '1'}})
+    registry.requests.clear()
+
+    items = fetch(registry, tmp_path, max_age=3600)
+
+    assert items == registry.items
+    assert sorted((number, status) for _, number, _, status in registry.requests) == [
+        (1, 304), (2, 200), (3, 200)
+    ]
+    assert json.loads((tmp_path / 'providers.json').read_text()) == registry.items
+    pages_meta = json.loads((tmp_path / 'providers.pages.json').read_text())
+    assert [page['count'] for page in pages_meta['pages']] == [2, 2, 2]
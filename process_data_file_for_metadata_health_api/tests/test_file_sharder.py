@@ -0,0 +1,33 @@
+import gzip
+
+from process_data_file_for_metadata_health_api import FileSharder
+
+
+def write_data_file(path, lines=2000):
+    path.write_bytes(gzip.compress(b''.join(b'{"id": %d}\n' % number for number in range(lines))))
+    return str(path)
+
+
+def test_prune_only_removes_stale_cache_files(tmp_path):
+    shard_dir = tmp_path / 'shards'
+    sharder = FileSharder(shard_dir, shard_size=1, member_size=4096)
+    kept = write_data_file(tmp_path / 'kept.jsonl.gz')
+    removed = write_data_file(tmp_path / 'removed.jsonl.gz')
+    sharder.build(kept)
+    sharder.build(removed)
+    (shard_dir / 'notes.txt').write_text('not a shard')
+    (shard_dir / f'{"0" * 40}.csv').write_text('not a shard either')
+    (shard_dir / 'subdir').mkdir()
+    (shard_dir / 'subdir' / 'file.json').write_text('{}')
+    (shard_dir / f'{"f" * 40}.json').mkdir()
+    stale_temp = shard_dir / f'{sharder._digest(removed)}.jsonl.tmp'
+    stale_temp.write_bytes(b'')
+
+    sharder.prune([kept])
+
+    assert sharder.load_index(kept) is not None
+    assert sorted(path.name for path in shard_dir.iterdir()) == sorted(
+        [path.name for path in sharder._paths(kept)]
+        + ['notes.txt', f'{"0" * 40}.csv', 'subdir', f'{"f" * 40}.json']
+    )
+    assert (shard_dir / 'subdir' / 'file.json').exists()
@@ -0,0 +1,72 @@
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+SCRIPT = SCRIPT_DIR / 'process_data_file_for_metadata_health_api.py'
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+OUTPUT_FILES = [
+    'providers_attributes.json',
+    'providers_stats.json',
+    'clients_attributes.json',
+    'clients_stats.json',
+]
+
+
+TIMESTAMP = re.compile(rb'"timestamp":"[^"]*"')
+
+
+def load_output(path):
+    """Return the bytes of an output file with its run timestamp blanked out.
+
+    The golden files were written with --compact-output, which the tests also
+    use, so the output is compared byte for byte apart from meta.timestamp.
+    """
+    return TIMESTAMP.sub(b'"timestamp":""', path.read_bytes())
+
+
+@pytest.mark.parametrize('options', [
+    [],
+    ['--merge-mode', 'worker'],
+    ['--decoding', 'full'],
+    ['--decompression', 'gzip'],
+    ['--incremental'],
+], ids=['default', 'worker-merge', 'full-decoding', 'gzip', 'incremental'])
+def test_output_matches_golden(tmp_path, options):
+    output_dir = tmp_path / 'output'
+    command = [
+        sys.executable, str(SCRIPT),
+        '-i', str(FIXTURES / 'input'),
+        '-o', str(output_dir),
+        '-c', str(FIXTURES / 'cache'),
+        '-n', '2',
+        '-l', 'WARNING',
+        '--compact-output',
+    ] + options
+    result = subprocess.run(command, capture_output=True, text=True, timeout=300)
+    assert result.returncode == 0, result.stderr
+
+    for name in OUTPUT_FILES:
+        assert load_output(output_dir / name) == load_output(FIXTURES / 'golden' / name), name
+
+
+def test_incremental_rerun_matches_golden(tmp_path):
+    output_dir = tmp_path / 'output'
+    command = [
+        sys.executable, str(SCRIPT),
+        '-i', str(FIXTURES / 'input'),
+        '-o', str(output_dir),
+        '-c', str(FIXTURES / 'cache'),
+        '-l', 'WARNING',
+        '--compact-output',
+        '--incremental',
+    ]
+    for _ in range(2):
+        result = subprocess.run(command, capture_output=True, text=True, timeout=300)
+        assert result.returncode == 0, result.stderr
+
+    for name in OUTPUT_FILES:
+        assert load_output(output_dir / name) == load_output(FIXTURES / 'golden' / name), name
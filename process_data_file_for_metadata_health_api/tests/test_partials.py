@@ -0,0 +1,109 @@
+import gzip
+import hashlib
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import process_data_file_for_metadata_health_api as stats
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'process_data_file_for_metadata_health_api.py'
+
+
+class RecordingStore:
+    def __init__(self):
+        self.saved = []
+
+    def save(self, filepath, fingerprint, client_payload, provider_payload):
+        self.saved.append(filepath)
+
+
+def make_shard(source, number, count):
+    return stats.FileShard(source, source + '.sharded', 0, 0, 0, number, count, {'size': 1})
+
+
+def save_partials(results):
+    store = RecordingStore()
+    processor = stats.DataCiteDataFileProcessor()
+    processor.logger = stats.logging.getLogger('datacite.test')
+    payload = stats.CountsPayload.pack({})
+    results = [(task, {'size': 1}, payload, payload, succeeded) for task, succeeded in results]
+    list(processor._save_partials(results, {}, store))
+    return store.saved
+
+
+def test_process_file_reports_failure(tmp_path):
+    path = tmp_path / 'truncated.jsonl.gz'
+    path.write_bytes(gzip.compress(b'{"attributes": {"state": "findable"}}\n' * 1000)[:100])
+    processor = stats.FileProcessor(stats.StatsContainer())
+
+    filepath, client_stats, provider_stats, succeeded = processor.process_file(str(path))
+
+    assert filepath == str(path)
+    assert not succeeded
+
+
+def test_failed_file_is_not_stored():
+    assert save_partials([('a.jsonl.gz', True), ('b.jsonl.gz', False)]) == ['a.jsonl.gz']
+
+
+def test_file_with_failed_shard_is_not_stored():
+    saved = save_partials([
+        (make_shard('a.jsonl.gz', 1, 2), True),
+        (make_shard('b.jsonl.gz', 1, 2), True),
+        (make_shard('a.jsonl.gz', 2, 2), True),
+        (make_shard('b.jsonl.gz', 2, 2), False),
+    ])
+    assert saved == ['a.jsonl.gz']
+
+
+def test_presence_files_are_pruned_with_partials(tmp_path):
+    pytest.importorskip('pyarrow')
+    fixtures = Path(__file__).resolve().parent / 'fixtures'
+    input_dir = tmp_path / 'input'
+    shutil.copytree(fixtures / 'input', input_dir)
+    presence_dir = tmp_path / 'presence'
+    command = [
+        sys.executable, str(SCRIPT),
+        '-i', str(input_dir),
+        '-o', str(tmp_path / 'output'),
+        '-c', str(fixtures / 'cache'),
+        '-l', 'WARNING',
+        '--incremental',
+        '--presence-dir', str(presence_dir),
+    ]
+
+    def run():
+        result = subprocess.run(command, capture_output=True, text=True, timeout=300)
+        assert result.returncode == 0, result.stderr
+        return sorted(path.name for path in presence_dir.glob('*.parquet'))
+
+    first = run()
+    assert len(first) == 2
+    (input_dir / 'sub' / 'b.jsonl.gz').rename(input_dir / 'sub' / 'renamed.jsonl.gz')
+    second = run()
+    assert len(second) == 2
+    assert [name for name in first if name.startswith('a-')] == [name for name in second if name.startswith('a-')]
+    assert any(name.startswith('renamed-') for name in second)
+    (input_dir / 'sub' / 'renamed.jsonl.gz').unlink()
+    assert run() == [name for name in first if name.startswith('a-')]
+
+
+@pytest.mark.parametrize('backend', [
+    backend for backend in stats.GzipDecompressor.BACKENDS
+    if backend != 'auto' and stats.GzipDecompressor.is_available(backend)
+])
+def test_fingerprint_hashes_file_while_processing(backend):
+    path = Path(__file__).resolve().parent / 'fixtures' / 'input' / 'a.jsonl.gz'
+    processor = stats.FileProcessor(stats.StatsContainer(), decompressor=stats.GzipDecompressor(backend))
+
+    task, fingerprint, _, _, succeeded = processor.process_file_partial(str(path))
+
+    assert succeeded
+    assert fingerprint == {
+        'size': path.stat().st_size,
+        'mtime_ns': path.stat().st_mtime_ns,
+        'sha256': hashlib.sha256(path.read_bytes()).hexdigest(),
+    }
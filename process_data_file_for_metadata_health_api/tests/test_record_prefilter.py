@@ -0,0 +1,87 @@
+import gzip
+from pathlib import Path
+
+import orjson
+import pytest
+
+from process_data_file_for_metadata_health_api import RecordPrefilter
+
+# Lines that FileProcessor keeps, each of which the prefilter must pass
+KEPT_LINES = [
+    rb'{"attributes": {"state": "findable"}}',
+    rb'{"attributes":{"state":"findable"}}',
+    b'{"attributes": {"state" :\t "findable"}}',
+    # Escaped quotes in keys and values before the state
+    rb'{"attributes": {"ti\"tle": "x", "state": "findable"}}',
+    rb'{"attributes": {"title": "say \"state\": \"draft\"", "state": "findable"}}',
+    rb'{"attributes": {"title": "ends with a backslash\\", "state": "findable"}}',
+    # A nested "state" before the top-level one
+    rb'{"attributes": {"container": {"state": "draft"}, "state": "findable"}}',
+    rb'{"attributes": {"relatedItems": [{"state": "registered"}], "state": "findable"}}',
+    # "findable" as a value of other keys
+    rb'{"attributes": {"title": "findable", "state": "findable"}}',
+    rb'{"attributes": {"title": "state", "subjects": ["findable"], "state": "findable"}}',
+    # Keys and values spelled with \u escapes
+    rb'{"attributes": {"st\u0061te": "findable"}}',
+    rb'{"attributes": {"state": "find\u0061ble"}}',
+    rb'{"attributes": {"\u0073tate": "findable"}}',
+]
+
+# Lines that FileProcessor skips and the prefilter can tell from the bytes
+REJECTED_LINES = [
+    rb'{"attributes": {"state": "draft"}}',
+    rb'{"attributes": {"state": "registered", "title": "findable"}}',
+    rb'{"attributes": {"state": "draft", "title": "state: findable"}}',
+    rb'{"attributes": {"state": "draft", "findable": "state"}}',
+    rb'{"attributes": {"title": "no state at all"}}',
+    rb'{"attributes": {"state": "findables"}}',
+]
+
+
+def is_kept(line):
+    record = orjson.loads(line)
+    return record.get('attributes', {}).get('state') == 'findable'
+
+
+@pytest.mark.parametrize('line', KEPT_LINES)
+def test_kept_lines_pass(line):
+    assert is_kept(line)
+    assert RecordPrefilter().might_keep(line)
+
+
+@pytest.mark.parametrize('line', REJECTED_LINES)
+def test_non_findable_lines_are_rejected(line):
+    assert not is_kept(line)
+    assert not RecordPrefilter().might_keep(line)
+
+
+def test_nested_findable_state_is_a_false_positive():
+    line = rb'{"attributes": {"state": "draft", "relatedItems": [{"state": "findable"}]}}'
+    assert not is_kept(line)
+    assert RecordPrefilter().might_keep(line)
+
+
+def test_escaped_quotes_around_state_are_rejected():
+    line = rb'{"attributes": {"state": "draft", "title": "\"state\": \"findable\""}}'
+    assert not is_kept(line)
+    assert not RecordPrefilter().might_keep(line)
+
+
+def test_memoryview_lines():
+    assert RecordPrefilter().might_keep(memoryview(KEPT_LINES[0]))
+    assert not RecordPrefilter().might_keep(memoryview(REJECTED_LINES[0]))
+
+
+def test_fixture_records_are_not_rejected():
+    prefilter = RecordPrefilter()
+    fixtures = Path(__file__).resolve().parent / 'fixtures' / 'input'
+    findable = 0
+    for path in fixtures.rglob('*.jsonl.gz'):
+        for line in gzip.decompress(path.read_bytes()).splitlines():
+            try:
+                kept = is_kept(line)
+            except orjson.JSONDecodeError:
+                continue
+            findable += kept
+            assert prefilter.might_keep(line) or not kept
+    assert findable
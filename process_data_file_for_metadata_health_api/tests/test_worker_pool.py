@@ -0,0 +1,39 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import process_data_file_for_metadata_health_api as stats
+
+SCRIPT_DIR = Path(__file__).resolve().parent.parent
+
+RUN_EXECUTOR = """
+import sys
+sys.path.insert(0, {script_dir!r})
+from process_data_file_for_metadata_health_api import WorkerPool
+
+if __name__ == '__main__':
+    pool = WorkerPool(processes=2, backend='executor', max_tasks_per_child=1)
+    print(sorted(pool.imap_unordered(abs, list(range(-200, 0)))))
+"""
+
+
+def test_executor_with_max_tasks_per_child_completes():
+    # Runs in a subprocess so that a deadlocked pool fails the test instead of hanging it
+    result = subprocess.run(
+        [sys.executable, '-c', RUN_EXECUTOR.format(script_dir=str(SCRIPT_DIR))],
+        capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == str(list(range(1, 201)))
+
+
+def test_executor_with_max_tasks_per_child_falls_back_before_312():
+    pool = stats.WorkerPool(processes=2, backend='executor', max_tasks_per_child=5)
+    expected = 'executor' if sys.version_info >= (3, 12) else 'pool'
+    assert pool.backend == expected
+    assert pool.max_tasks_per_child == 5
+
+
+def test_executor_without_max_tasks_per_child_is_kept():
+    pool = stats.WorkerPool(processes=2, backend='executor')
+    assert pool.backend == 'executor'
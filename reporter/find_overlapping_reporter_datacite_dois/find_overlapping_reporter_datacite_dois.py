@@ -1,11 +1,24 @@
 import csv
 import sys
 import gzip
+import shutil
 import orjson
 import logging
 import argparse
+import subprocess
 import ahocorasick
 from pathlib import Path
+from contextlib import contextmanager
+
+try:
+    from isal import igzip
+except ImportError:
+    igzip = None
+
+try:
+    from zlib_ng import gzip_ng
+except ImportError:
+    gzip_ng = None
 
 logging.basicConfig(
     level=logging.INFO,
@@ -13,6 +26,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger("large-scale-substring-match")
 
+DECOMPRESSION_BACKENDS = ('auto', 'isal', 'zlib-ng', 'pigz', 'gzip')
+
 
 def parse_arguments():
     parser = argparse.ArgumentParser(
@@ -24,6 +39,8 @@ def parse_arguments():
                         help='Directory containing .jsonl.gz DataCite records.')
     parser.add_argument('-o', '--output-csv', required=True,
                         help='Path to output CSV with match results.')
+    parser.add_argument('-z', '--decompression', choices=DECOMPRESSION_BACKENDS, default='auto',
+                        help='Gzip decompression backend (default: auto, the first available of zlib-ng, isal and gzip).')
     return parser.parse_args()
 
 
@@ -61,10 +78,53 @@ def build_aho_corasick_automaton(mappings):
     return A
 
 
-def iter_datacite_records(jsonl_gz_path, chunk_size=2**24):
+def resolve_decompression_backend(backend):
+    available = {
+        'isal': igzip is not None,
+        'zlib-ng': gzip_ng is not None,
+        'pigz': shutil.which('pigz') is not None,
+        'gzip': True,
+    }
+    if backend == 'auto':
+        return next(name for name in ('zlib-ng', 'isal', 'gzip') if available[name])
+    if not available.get(backend):
+        raise ValueError(f"Decompression backend '{backend}' is not installed")
+    return backend
+
+
+@contextmanager
+def open_gzip(path, backend='gzip'):
+    if backend == 'isal':
+        with igzip.open(path, 'rb') as gz_file:
+            yield gz_file
+    elif backend == 'zlib-ng':
+        with gzip_ng.open(path, 'rb') as gz_file:
+            yield gz_file
+    elif backend == 'pigz':
+        process = subprocess.Popen(['pigz', '-dc', str(path)],
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            yield process.stdout
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            process.stdout.close()
+            stderr = process.stderr.read()
+            process.stderr.close()
+            process.wait()
+        if process.returncode != 0:
+            raise OSError(f"pigz exited with status {process.returncode}: "
+                          f"{stderr.decode(errors='replace').strip()}")
+    else:
+        with gzip.open(path, 'rb') as gz_file:
+            yield gz_file
+
+
+def iter_datacite_records(jsonl_gz_path, chunk_size=2**24, backend='gzip'):
     buffer = bytearray()
     try:
-        with gzip.open(jsonl_gz_path, 'rb') as gz_file:
+        with open_gzip(jsonl_gz_path, backend) as gz_file:
             while True:
                 chunk = gz_file.read(chunk_size)
                 if not chunk:
@@ -156,10 +216,12 @@ def main():
         if not gz_files:
             logger.warning(f"No .jsonl.gz files found in {input_dir}")
             sys.exit(0)
+        backend = resolve_decompression_backend(args.decompression)
+        logger.info(f"Using {backend} decompression backend.")
         total_matches = 0
         for gzfile in gz_files:
             logger.info(f"Processing {gzfile} ...")
-            for record in iter_datacite_records(gzfile):
+            for record in iter_datacite_records(gzfile, backend=backend):
                 match_rows = find_matches_in_record(record, automaton)
                 if match_rows:
                     for row in match_rows: